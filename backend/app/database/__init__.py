@@ -1,11 +1,40 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from . import profiling
 
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# async def 路由使用异步引擎，查询不阻塞事件循环；后台线程和脚本继续使用同步会话
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+
+def _enable_sqlite_savepoints(sync_engine):
+    """
+    SQLite(测试环境)：pysqlite 只在 DML 前隐式 BEGIN，事务外的 SAVEPOINT 会自成事务，
+    RELEASE 时直接提交，begin_nested 的回滚因此失效；SAVEPOINT 前先显式 BEGIN
+    """
+    @event.listens_for(sync_engine, "savepoint")
+    def _savepoint(conn, name):
+        dbapi_connection = conn.connection.dbapi_connection
+        # aiosqlite 适配器把原始连接放在 _connection 上
+        if not getattr(dbapi_connection, "_connection", dbapi_connection).in_transaction:
+            conn.exec_driver_sql("BEGIN")
+
+
+if engine.dialect.name == "sqlite":
+    _enable_sqlite_savepoints(engine)
+    _enable_sqlite_savepoints(async_engine.sync_engine)
+
+if settings.QUERY_PROFILING:
+    profiling.install(engine)
+    profiling.install(async_engine.sync_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -13,4 +42,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,43 +1,60 @@
-from sqlalchemy.orm import Session
-from app.database.models import User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.models import User, StorageQuota
 from app.schemas.user import UserCreate
 from app.utils.security import get_password_hash
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    return await db.scalar(select(User).where(User.username == username))
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(User).where(User.email == email))
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: UserCreate, password_hash: str | None = None):
     db_user = User(
         username=user.username,
         email=user.email,
-        password_hash=hashed_password,
+        password_hash=password_hash or get_password_hash(user.password),
         role="member"  # 默认注册为普通成员
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-from sqlalchemy.orm import Session
-from app.database.models import User, StorageQuota
-
-def get_pending_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(User).filter(User.role == 'pending').offset(skip).limit(limit).all()
+async def get_pending_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.scalars(select(User).where(User.role == 'pending').offset(skip).limit(limit))
+    return result.all()
 
-def update_user_role(db: Session, user_id: int, role: str, approved_by: int):
-    user = db.query(User).filter(User.id == user_id).first()
+async def update_user_role(db: AsyncSession, user_id: int, role: str, approved_by: int):
+    user = await db.get(User, user_id)
     if not user:
         return None
     user.role = role
     user.is_active = True
     user.approved_by = approved_by
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+async def update_user(db: AsyncSession, user_id: int, role: str | None = None, is_active: bool | None = None,
+                      storage_quota: int | None = None):
+    """修改角色、启用状态或个人配额，未提供的字段保持不变"""
+    user = await db.get(User, user_id)
+    if not user:
+        return None
+    if role is not None:
+        user.role = role
+    if is_active is not None:
+        user.is_active = is_active
+    if storage_quota is not None:
+        user.storage_quota = storage_quota
+    await db.commit()
+    await db.refresh(user)
     return user
 
-def set_storage_quota(db: Session, quota_type: str, quota_limit: int, updated_by: int):
-    quota = db.query(StorageQuota).filter(StorageQuota.quota_type == quota_type).first()
+async def set_storage_quota(db: AsyncSession, quota_type: str, quota_limit: int, updated_by: int):
+    quota = await db.scalar(select(StorageQuota).where(StorageQuota.quota_type == quota_type))
     if quota:
         quota.quota_limit = quota_limit
         quota.updated_by = updated_by
@@ -48,8 +65,9 @@ def set_storage_quota(db: Session, quota_type: str, quota_limit: int, updated_by
             updated_by=updated_by
         )
         db.add(quota)
-    db.commit()
+    await db.commit()
     return quota
 
-def get_user_storage_usage(db: Session, user_id: int):
-    return db.query(User.used_storage, User.storage_quota).filter(User.id == user_id).first()
\ No newline at end of file
+async def get_user_storage_usage(db: AsyncSession, user_id: int):
+    result = await db.execute(select(User.used_storage, User.storage_quota).where(User.id == user_id))
+    return result.first()
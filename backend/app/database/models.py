@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Enum, BigInteger, ForeignKey, TIMESTAMP, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Enum, BigInteger, ForeignKey, TIMESTAMP, DateTime, Float, Index, Text, VARBINARY, BINARY
 from sqlalchemy.orm import relationship
 from app.database import Base
 from sqlalchemy.sql import func
@@ -25,6 +25,25 @@ class StorageQuota(Base):
     updated_by = Column(Integer, ForeignKey('users.id'))
     updated_at = Column(TIMESTAMP, server_default=func.now())
 
+class StorageUsage(Base):
+    """按归属统计的已用空间，随文件记录在同一事务中原子增减，定期与 SUM(size) 对账"""
+    __tablename__ = "storage_usage"
+
+    owner_type = Column(Enum('public', 'group', 'user', name='quota_types'), primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    used = Column(BigInteger, nullable=False, default=0)
+
+class Blob(Base):
+    """按 SHA-256 去重存储的文件内容，多个 File 记录可共享同一个 Blob"""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    md5 = Column(String(32), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    storage_path = Column(String(512), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
 class FileStatus(str, PyEnum):
     pending = "pending"
     approved = "approved"
@@ -52,6 +71,102 @@ class File(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
     md5 = Column(String(32), nullable=True)
+    sha256 = Column(String(64), ForeignKey('blobs.sha256'), nullable=True, index=True)  # 服务端计算的内容哈希
     # 关系定义
     parent = relationship("File", remote_side=[id], back_populates="children")
-    children = relationship("File", back_populates="parent")
\ No newline at end of file
+    children = relationship("File", back_populates="parent")
+    blob = relationship("Blob")
+
+class TrackMetadata(Base):
+    """从音频标签中提取的曲目信息，用于按艺术家/专辑/流派浏览"""
+    __tablename__ = "track_metadata"
+
+    file_id = Column(String(36), ForeignKey('files.id', ondelete='CASCADE'), primary_key=True)
+    title = Column(String(255))
+    artist = Column(String(255), index=True)
+    album_artist = Column(String(255))
+    album = Column(String(255), index=True)
+    genre = Column(String(100), index=True)
+    track_number = Column(Integer)
+    disc_number = Column(Integer)
+    year = Column(Integer)
+    duration = Column(Float)  # 秒
+    bitrate = Column(Integer)
+    sample_rate = Column(Integer)
+    channels = Column(Integer)
+    extracted_at = Column(TIMESTAMP, server_default=func.now())
+
+    file = relationship("File")
+
+    __table_args__ = (
+        Index('ix_track_album_order', 'album', 'disc_number', 'track_number', 'file_id'),
+    )
+
+
+class SearchDocument(Base):
+    """文件名与标签规范化后的检索文本，用于校验三元组命中的候选"""
+    __tablename__ = "search_documents"
+
+    file_id = Column(String(36), ForeignKey('files.id', ondelete='CASCADE'), primary_key=True)
+    content = Column(Text, nullable=False)
+
+
+class SearchTrigram(Base):
+    """三元组倒排索引；以 UTF-8 字节存储，避免大小写/重音不敏感排序规则合并不同三元组"""
+    __tablename__ = "search_trigrams"
+
+    trigram = Column(VARBINARY(12), primary_key=True)
+    file_id = Column(String(36), ForeignKey('files.id', ondelete='CASCADE'), primary_key=True, index=True)
+
+
+class FileClosure(Base):
+    """文件树的闭包表：每个节点与其所有祖先(含自身, depth=0)各一行"""
+    __tablename__ = "file_closure"
+
+    ancestor_id = Column(String(36), ForeignKey('files.id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(String(36), ForeignKey('files.id', ondelete='CASCADE'), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('ix_file_closure_descendant', 'descendant_id', 'depth'),
+    )
+
+
+class FolderVersion(Base):
+    """文件夹内容版本号：子项新增/移动/重命名/状态变化时递增，驱动列表缓存与 ETag"""
+    __tablename__ = "folder_versions"
+
+    folder_id = Column(String(36), primary_key=True)  # 根目录使用 "root"
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+class RefreshToken(Base):
+    """
+    刷新令牌：只保存令牌的 SHA-256 摘要
+    每次刷新作废旧令牌并在同一 family 中签发新令牌；已作废的令牌被重放时整个 family 作废
+    """
+    __tablename__ = "refresh_tokens"
+
+    token_hash = Column(BINARY(32), primary_key=True)
+    family_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
+    revoked = Column(Boolean, nullable=False, default=False)
+
+
+class UploadSession(Base):
+    """分片上传会话：开始时检查权限并预留配额(计入已用空间)，完成时转为文件记录，取消或过期时释放"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    identifier = Column(String(32), nullable=False)  # 客户端计算的 MD5
+    filename = Column(String(255), nullable=False)
+    space_type = Column(Enum('public', 'group', 'user', name='quota_types'), nullable=False)
+    owner_id = Column(Integer, nullable=False)
+    parent_id = Column(String(36))
+    total_size = Column(BigInteger, nullable=False)
+    chunk_size = Column(BigInteger, nullable=False)
+    total_chunks = Column(Integer, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
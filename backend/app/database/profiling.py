@@ -0,0 +1,91 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的查询统计；同步路由在线程池中执行时 anyio 会复制上下文，异步会话的事件也在请求任务中触发
+# 后台线程没有设置该变量，不做统计
+_current: ContextVar["QueryStats | None"] = ContextVar("query_stats", default=None)
+
+_WHITESPACE = re.compile(r"\s+")
+# IN (?, ?, ?) 等展开后的参数列表折叠成一个占位符，参数个数不同的同一查询归为同一形状
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    return _PLACEHOLDER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _redact(parameters) -> str:
+    """只记录参数个数，不记录取值(可能含密码哈希、令牌等)"""
+    if isinstance(parameters, (dict, list, tuple)):
+        return f"<{len(parameters)} params redacted>"
+    return "<params redacted>"
+
+
+class QueryStats:
+    """一次请求内执行的查询数、总耗时和各形状的次数"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """同一形状的 SELECT 执行次数达到阈值，通常是循环里逐条查询(N+1)"""
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= threshold and shape[:6].upper() == "SELECT"
+        ]
+
+    def header(self, threshold: int) -> str:
+        return f"count={self.count}; time_ms={self.seconds * 1000:.2f}; repeated={len(self.repeated(threshold))}"
+
+
+def start_request() -> tuple[QueryStats, object]:
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def install(engine):
+    """在同步引擎(异步引擎传 async_engine.sync_engine)上注册计时钩子"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        seconds = time.perf_counter() - starts.pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.record(statement, seconds)
+        if settings.SLOW_QUERY_MS and seconds * 1000 >= settings.SLOW_QUERY_MS:
+            logger.warning(
+                "Slow query (%.1f ms): %s %s",
+                seconds * 1000, _WHITESPACE.sub(" ", statement).strip(), _redact(parameters)
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        # 出错时 after_cursor_execute 不会触发，弹出对应的开始时间
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
@@ -1,30 +1,37 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
-from app.database import get_db
+from app.database import get_async_db
 from app.database.models import User
 from app.services.auth import decode_token
 from app.database.crud import get_user_by_username
+from app.services.auth_cache import token_cache, UserSnapshot
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # 稳态下命中缓存，不查数据库也不重复验签
+    snapshot = token_cache.get(token)
+    if snapshot is not None:
+        return snapshot
     try:
         token_data = decode_token(token)
-        user = get_user_by_username(db, username=token_data.username)
+        user = await get_user_by_username(db, username=token_data.username)
         if user is None:
             raise credentials_exception
-        return user
+        snapshot = UserSnapshot.from_user(user)
+        token_cache.put(token, snapshot, token_data.exp)
+        return snapshot
     except JWTError:
         raise credentials_exception
 
@@ -1,7 +1,15 @@
 from fastapi import FastAPI
-from app.routers import auth, files, admin, moderation
+from app.routers import auth, files, admin, moderation, library, metrics
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
+from app.database import Base, engine, async_engine
+from app.services.merge_queue import merge_queue
+from app.services import password_pool
+from app.services.storage import usage_reconciler
+from app.services.chunk_gc import chunk_sweeper
+from app.services.moderation import file_mover
+from app.services.metrics import MetricsMiddleware
+from app.services.query_profiler import QueryProfilerMiddleware
+from app.config import settings
 
 Base.metadata.create_all(bind=engine)
 
@@ -18,8 +26,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Query-Stats"],
 )
 
+if settings.QUERY_PROFILING:
+    app.add_middleware(QueryProfilerMiddleware)
+# 最外层，延迟包含 CORS 处理；未开启时不挂载
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 # 后续添加其他路由
 # app.include_router(files.router, prefix="/files")
@@ -28,6 +43,23 @@ app.include_router(auth.router)
 app.include_router(files.router)
 app.include_router(admin.router)
 app.include_router(moderation.router)
+app.include_router(library.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+
+@app.on_event("startup")
+def start_workers():
+    usage_reconciler.start()
+    chunk_sweeper.start()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    usage_reconciler.shutdown()
+    chunk_sweeper.shutdown()
+    merge_queue.shutdown()
+    file_mover.shutdown()
+    password_pool.shutdown()
+    await async_engine.dispose()
 
 @app.get("/")
 def read_root():
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.database.crud import (
     get_pending_users,
     update_user_role,
+    update_user,
     set_storage_quota,
     get_user_storage_usage
 )
 from app.schemas.user import UserOut, UserUpdate, QuotaSetting
 from app.dependencies import get_current_active_user
 from app.services.permission import check_admin
+from app.services.auth_cache import token_cache
+from app.services.chunk_gc import chunk_sweeper
 from app.database.models import User
 
 router = APIRouter(
@@ -18,47 +21,76 @@ router = APIRouter(
 )
 
 @router.get("/pending-users", response_model=list[UserOut])
-def list_pending_users(
-    db: Session = Depends(get_db),
+async def list_pending_users(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     check_admin(current_user)
-    return get_pending_users(db)
+    return await get_pending_users(db)
 
 @router.post("/approve-user/{user_id}")
-def approve_user(
+async def approve_user(
     user_id: int,
     update_data: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     check_admin(current_user)
-    user = update_user_role(db, user_id, update_data.role, current_user.id)
+    user = await update_user_role(db, user_id, update_data.role, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    token_cache.invalidate_user(user.id)
+    return user
+
+@router.post("/update-user/{user_id}", response_model=UserOut)
+async def modify_user(
+    user_id: int,
+    update_data: UserUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    check_admin(current_user)
+    user = await update_user(
+        db, user_id,
+        role=update_data.role,
+        is_active=update_data.is_active,
+        storage_quota=update_data.storage_quota
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    # 角色、停用、配额变更立即生效，不等缓存过期
+    token_cache.invalidate_user(user.id)
     return user
 
 @router.post("/set-quota", response_model=QuotaSetting)
-def set_quota(
+async def set_quota(
     quota: QuotaSetting,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     check_admin(current_user)
-    return set_storage_quota(db, quota.quota_type, quota.quota_limit, current_user.id)
+    result = await set_storage_quota(db, quota.quota_type, quota.quota_limit, current_user.id)
+    token_cache.clear()
+    return result
 
 @router.get("/storage-usage/{user_id}")
-def get_storage_usage(
+async def get_storage_usage(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     check_admin(current_user)
-    usage = get_user_storage_usage(db, user_id)
+    usage = await get_user_storage_usage(db, user_id)
     if not usage:
         raise HTTPException(status_code=404, detail="User not found")
     return {
         "used": usage[0],
         "quota": usage[1],
         "percentage": round((usage[0] / usage[1]) * 100, 2)
-    }
\ No newline at end of file
+    }
+
+@router.get("/chunk-gc")
+async def get_chunk_gc_stats(current_user: User = Depends(get_current_active_user)):
+    """分片临时目录回收指标：累计回收字节数/目录数，以及当前未完成的上传"""
+    check_admin(current_user)
+    return chunk_sweeper.stats()
@@ -1,67 +1,85 @@
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.database.models import User
 from app.config import settings
-from app.database import get_db
-from app.database.crud import get_user_by_username, create_user
-from app.schemas.user import UserCreate, UserOut, Token
-from app.services.auth import (
-    verify_password,
-    create_access_token,
-    get_password_hash
+from app.database import get_db, get_async_db
+from app.database.crud import get_user_by_username, get_user_by_email
+from app.schemas.user import UserCreate, UserOut, Token, RefreshRequest
+from app.services.auth import create_access_token
+from app.services.password_pool import hash_password, verify_password
+from app.services.refresh_tokens import (
+    issue_refresh_token,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    purge_expired
 )
 
 router = APIRouter(tags=["Authentication"])
 
+def _start_session(db: Session, user_id: int) -> str:
+    purge_expired(db, user_id)
+    refresh_token = issue_refresh_token(db, user_id)
+    db.commit()
+    return refresh_token
+
+def _token_response(user: User, refresh_token: str) -> dict:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=access_token_expires
+    )
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+# bcrypt 在独立进程池中计算，数据库走异步会话，登录高峰不会占满请求线程
 @router.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # 检查用户名和邮箱是否已存在
-    db_user = get_user_by_username(db, username=user.username)
-    if db_user:
+    if await get_user_by_username(db, username=user.username):
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_email = db.query(User).filter(User.email == user.email).first()
-    if db_email:
+    if await get_user_by_email(db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # 新用户默认为pending状态
-    hashed_password = get_password_hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
-        password_hash=hashed_password,
+        password_hash=await hash_password(user.password),
         role="pending",  # 需要管理员审核
         is_active=False  # 未激活
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    #print(f"Received login attempt - username: {form_data.username}, password: {form_data.password}")
-    user = get_user_by_username(db, username=form_data.username)
-    #print(user.password_hash,form_data.password)
-    if not user or not verify_password(form_data.password, user.password_hash):
+    user = await get_user_by_username(db, username=form_data.username)
+    if not user or not await verify_password(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = await db.run_sync(_start_session, user.id)
+    return _token_response(user, refresh_token)
+
+@router.post("/refresh", response_model=Token)
+def refresh(body: RefreshRequest, db: Session = Depends(get_db)):
+    # 旧刷新令牌立即作废，客户端需保存新返回的令牌
+    user, refresh_token = rotate_refresh_token(db, body.refresh_token)
+    return _token_response(user, refresh_token)
 
 @router.post("/logout")
-def logout():
-    # 前端应删除存储的token
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+def logout(body: Optional[RefreshRequest] = None, db: Session = Depends(get_db)):
+    # 作废刷新令牌；访问令牌在过期前仍有效，前端应删除存储的token
+    if body is not None:
+        revoke_refresh_token(db, body.refresh_token)
+    return {"message": "Successfully logged out"}
@@ -1,16 +1,27 @@
-from fastapi import APIRouter, Depends, UploadFile,Form , HTTPException, status
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.database.models import User, File
+from fastapi import APIRouter, Depends, UploadFile,Form , Header, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.database.models import User, File, SearchDocument, FileClosure, FolderVersion
 from app.schemas.file import FileOut, FileMove
-from app.schemas.file import FileCreate, FileOut, FileMove, FileStatus
+from app.schemas.file import FileCreate, FileOut, FileMove, FileStatus, FileRename, FolderUsage, MergeJobOut
+from app.schemas.file import UploadSessionCreate, UploadSessionOut, UploadProgress, BatchRequest, BatchResult
 from app.dependencies import get_current_active_user
-from app.services.file_service import move_file,handle_merge_chunks
-from app.services.permission import check_file_permission
+from app.services.file_service import move_file,handle_merge_chunks,instant_upload,rename_file,create_folder
+from app.services import hierarchy, listing
+from app.services.blob_store import find_blob
+from app.services.merge_queue import merge_queue, MergeJob
+from app.services.chunk_store import save_chunk, write_chunk_at, list_chunks, get_chunk_dir
+from app.services import upload_hash, waveform, search_index, chunk_bitmap, upload_session, zip_stream, file_batch, cover_art, metadata
+from starlette.concurrency import run_in_threadpool
+from app.services.permission import check_file_permission, visible_files_filter
 from app.config import settings
-from typing import Optional
+from app.utils.file_helpers import make_etag, etag_matches, RangeFileResponse
+from typing import Literal, Optional
+import hashlib
 import os
+from urllib.parse import quote
 
 router = APIRouter(prefix="/files", tags=["Files"])
 
@@ -27,23 +38,20 @@ async def upload_chunkupload_chunk(
     relativePath: str = Form(...),
     space_type: str = Form(...),
     parent_id: str = Form(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """上传文件分片"""
     # 检查权限
     if parent_id:
-        parent = db.query(File).filter(File.id == parent_id).first()
+        parent = await db.get(File, parent_id)
         if not parent or not check_file_permission(current_user, parent.owner_type, parent.owner_id):
             raise HTTPException(403, "No permission")
 
     # 保存分片到以MD5命名的目录
-    chunk_dir = os.path.join(settings.CHUNKTEMP, identifier)
-    os.makedirs(chunk_dir, exist_ok=True)
-    chunk_path = os.path.join(chunk_dir, str(chunkNumber))
-
-    with open(chunk_path, "wb") as buffer:
-        buffer.write(await file.read())
+    await save_chunk(file, identifier, chunkNumber, currentChunkSize)
+    # 趁分片还在页缓存中，增量计算整文件哈希
+    await run_in_threadpool(upload_hash.advance, identifier, get_chunk_dir(identifier))
 
     return {"message": "Chunk uploaded"}
 
@@ -59,33 +67,19 @@ async def check_chunk(
     relativePath: str,  # 相对路径（可选）
     totalChunks: int,  # 总分片数
     space_type: str,  # 空间类型（public/group/user）
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """检查分片是否已上传，支持断点续传"""
-    # 1. 检查是否已有完整文件（秒传）
-    existing_file = db.query(File).filter(
-        File.md5 == identifier,
-        File.size == totalSize,
-        File.status == FileStatus.approved
-    ).first()
-
-    if existing_file:
+    # 1. 检查是否已有相同内容（秒传）；只读检查，文件记录由 POST /upload/session 创建
+    if await db.run_sync(find_blob, identifier.lower(), totalSize, current_user):
         return {
             "skipUpload": True,  # 告诉前端可以秒传
             "uploaded": list(range(1, totalChunks + 1))  # 所有分片都已"上传"
         }
 
     # 2. 检查已上传的分片（断点续传）
-    chunk_dir = os.path.join(settings.CHUNKTEMP, identifier)
-    uploaded_chunks = []
-
-    if os.path.exists(chunk_dir):
-        uploaded_chunks = [
-            int(chunk) 
-            for chunk in os.listdir(chunk_dir) 
-            if chunk.isdigit()
-        ]
+    uploaded_chunks = list_chunks(get_chunk_dir(identifier))
 
     # 3. 返回已上传的分片编号
     return {
@@ -94,24 +88,160 @@ async def check_chunk(
     }
 
 
-@router.post("/upload/merge")
+@router.post("/upload/merge", response_model=MergeJobOut, status_code=status.HTTP_202_ACCEPTED)
 async def merge_chunks(
     identifier: str = Form(...),
     filename: str = Form(...),
     space_type: str = Form(...),
     parent_id: str = Form(...),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    return handle_merge_chunks(identifier,filename,space_type,parent_id,db,current_user)
+    """提交合并任务，立即返回任务ID"""
+    job = merge_queue.submit(MergeJob(identifier, filename, space_type, parent_id, current_user.id))
+    return MergeJobOut(job_id=job.id, status=job.status, progress=job.progress)
+
+
+@router.get("/upload/merge/{job_id}", response_model=MergeJobOut)
+async def merge_status(
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """查询合并任务进度，完成后返回文件记录"""
+    job = merge_queue.get(job_id)
+    if not job or (job.user_id != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Merge job not found")
+
+    file = None
+    if job.file_id:
+        file = await db.get(File, job.file_id)
+    return MergeJobOut(
+        job_id=job.id,
+        status=job.status,
+        progress=job.progress,
+        error=job.error,
+        file=file
+    )
+
+@router.post("/upload/session", response_model=UploadSessionOut)
+async def start_upload_session(
+    data: UploadSessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    开始上传：一次性检查父文件夹权限并预留配额，返回授权后续分片请求的上传令牌
+    已有相同内容时直接秒传
+    """
+    if data.parent_id:
+        parent = await db.get(File, data.parent_id)
+        if not parent or not parent.is_folder or not check_file_permission(current_user, parent.owner_type, parent.owner_id):
+            raise HTTPException(403, "No permission")
+
+    instant_file = await instant_upload(
+        db, data.identifier, data.total_size, data.filename, data.space_type, data.parent_id, current_user
+    )
+    if instant_file:
+        await db.refresh(instant_file)
+        return UploadSessionOut(skip_upload=True, file=instant_file)
+
+    session = await db.run_sync(upload_session.create_session, current_user, data)
+    try:
+        # 预分配可能要写满整个文件，不能在事件循环线程中执行
+        await run_in_threadpool(upload_session.prepare_files, session.id, session.total_chunks, session.total_size)
+    except Exception:
+        await db.run_sync(upload_session.release_session, session)
+        raise
+    return UploadSessionOut(
+        session_id=session.id,
+        upload_token=upload_session.issue_token(session),
+        chunk_size=session.chunk_size,
+        total_chunks=session.total_chunks,
+        expires_at=session.expires_at
+    )
+
+
+def _upload_claims(session_id: str, x_upload_token: str = Header(...)) -> dict:
+    return upload_session.verify_token(x_upload_token, session_id)
+
+
+@router.post("/upload/session/{session_id}/chunk")
+async def upload_session_chunk(
+    session_id: str,
+    file: UploadFile,
+    chunkNumber: int = Form(...),
+    claims: dict = Depends(_upload_claims)
+):
+    """
+    上传会话中的一个分片；只校验上传令牌，不访问数据库
+    分片按 (chunkNumber-1)*chunk_size 直接写入预分配的目标文件，完成时无需再拼接
+    已收到的分片可能已计入增量哈希，不允许覆盖，返回 409
+    """
+    total_chunks, chunk_size, total_size = claims["chunks"], claims["chunk"], claims["size"]
+    if not 1 <= chunkNumber <= total_chunks:
+        raise HTTPException(status_code=400, detail="Invalid chunk number")
+    expected = upload_session.chunk_length(total_size, chunk_size, total_chunks, chunkNumber)
+
+    bitmap_path = chunk_bitmap.get_bitmap_path(get_chunk_dir(session_id))
+    with upload_session.chunk_write(session_id, chunkNumber):
+        bitmap = await run_in_threadpool(chunk_bitmap.load, bitmap_path)
+        if chunk_bitmap.has(bitmap, chunkNumber):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Chunk already uploaded")
+        await write_chunk_at(
+            file, upload_session.get_staging_path(session_id), (chunkNumber - 1) * chunk_size, expected
+        )
+        await run_in_threadpool(chunk_bitmap.mark, bitmap_path, chunkNumber)
+        await run_in_threadpool(upload_session.hash_received, session_id, chunk_size, total_chunks, total_size)
+    return {"message": "Chunk uploaded"}
+
+
+@router.get("/upload/session/{session_id}", response_model=UploadProgress)
+async def upload_session_progress(
+    session_id: str,
+    claims: dict = Depends(_upload_claims)
+):
+    """已收到的分片，按区间返回，用于断点续传"""
+    received, ranges = await run_in_threadpool(upload_session.progress, session_id, claims["chunks"])
+    return UploadProgress(session_id=session_id, total_chunks=claims["chunks"], received=received, uploaded=ranges)
+
+
+@router.post("/upload/session/{session_id}/complete", response_model=MergeJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def finish_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """分片齐全后提交合并任务"""
+    session = await db.run_sync(upload_session.get_user_session, session_id, current_user)
+    job = merge_queue.submit(MergeJob(
+        session.identifier, session.filename, session.space_type, session.parent_id,
+        current_user.id, session_id=session.id
+    ))
+    return MergeJobOut(job_id=job.id, status=job.status, progress=job.progress)
+
+
+@router.delete("/upload/session/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """取消上传并退还预留的配额"""
+    session = await db.run_sync(upload_session.get_user_session, session_id, current_user)
+    await db.run_sync(upload_session.release_session, session)
+    await run_in_threadpool(upload_session.discard_chunks, session_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-@router.get("/download/{file_id}")
+
+@router.api_route("/download/{file_id}", methods=["GET", "HEAD"])
 async def download_file(
     file_id: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    file = db.query(File).filter(File.id == file_id).first()
+    """下载文件，支持 Range/多段 Range、ETag 与条件请求（If-None-Match / If-Range）"""
+    file = await db.get(File, file_id)
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
@@ -121,28 +251,253 @@ async def download_file(
     if file.status != FileStatus.approved:
         raise HTTPException(status_code=403, detail="File not approved")
     
+    headers = {"Cache-Control": "private, no-cache"}
+    if file.sha256:
+        # 内容寻址存储，哈希即强 ETag；FileResponse 用它判断 If-Range
+        etag = make_etag(file.sha256)
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     if not os.path.exists(file.storage_path):
         raise HTTPException(status_code=404, detail="File not found on disk")
     
-    return FileResponse(
+    # Range 解析与分段发送由 FileResponse 完成，权限和记录查询每个请求只做一次
+    return RangeFileResponse(
         file.storage_path,
         filename=file.name,
-        media_type=file.mime_type
+        media_type=file.mime_type,
+        headers=headers
+    )
+
+@router.get("/download-folder/{folder_id}")
+async def download_folder(
+    folder_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    整个文件夹打包为 ZIP 流式下载
+    子树通过闭包表一次查出，权限与审核状态在同一查询中过滤，不逐个文件检查
+    """
+    folder = await _get_visible_node(db, folder_id, current_user)
+    if not folder.is_folder:
+        raise HTTPException(status_code=400, detail="Not a folder")
+    if folder.status != FileStatus.approved:
+        raise HTTPException(status_code=403, detail="File not approved")
+
+    nodes = await db.run_sync(_visible_descendants, folder_id, None, current_user)
+    entries = zip_stream.build_entries(folder, nodes)
+    # 打包期间不再占用数据库连接
+    await db.close()
+
+    filename = f"{folder.name}.zip"
+    quoted = quote(filename)
+    disposition = (
+        f'attachment; filename="{filename}"' if quoted == filename
+        else f"attachment; filename*=utf-8''{quoted}"
     )
+    return StreamingResponse(
+        zip_stream.stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": disposition, "Cache-Control": "private, no-cache"}
+    )
+
+@router.get("/{file_id}/peaks")
+async def get_peaks(
+    file_id: str,
+    request: Request,
+    resolution: int = waveform.DEFAULT_RESOLUTION,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    波形峰值：每个点 3 个小端 int16 (min, max, rms)，元数据放在响应头中
+    resolution 为每个点覆盖的采样帧数
+    """
+    if resolution not in waveform.RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported resolution, choose from {list(waveform.RESOLUTIONS)}"
+        )
+
+    file = await db.get(File, file_id)
+    if not file or file.is_folder:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not check_file_permission(current_user, file.owner_type, file.owner_id):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if file.status != FileStatus.approved:
+        raise HTTPException(status_code=403, detail="File not approved")
+    if not file.sha256 or not waveform.is_waveform_candidate(file.name, file.mime_type):
+        raise HTTPException(status_code=404, detail="Waveform not available for this file")
+
+    etag = make_etag(f"{file.sha256}-{resolution}")
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    peaks_path = waveform.get_peaks_path(file.sha256)
+    if not os.path.exists(peaks_path):
+        # 旧文件或尚未计算完成，排队生成
+        waveform.submit(file.sha256, file.storage_path)
+        raise HTTPException(status_code=404, detail="Waveform is being generated")
+
+    level = await run_in_threadpool(waveform.read_peaks, peaks_path, resolution)
+    if level is None:
+        raise HTTPException(status_code=404, detail="Waveform not available for this file")
+    sample_rate, frames, rms_dbfs, body = level
+    headers.update({
+        "X-Sample-Rate": str(sample_rate),
+        "X-Frames": str(frames),
+        "X-Samples-Per-Peak": str(resolution),
+        "X-RMS-dBFS": f"{rms_dbfs:.2f}",
+    })
+    return Response(content=body, media_type="application/octet-stream", headers=headers)
+
+@router.get("/{file_id}/cover")
+async def get_cover(
+    file_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """内嵌封面缩略图(JPEG)；图片按哈希去重，ETag 即图片哈希，可长期缓存"""
+    file = await db.get(File, file_id)
+    if not file or file.is_folder:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not check_file_permission(current_user, file.owner_type, file.owner_id):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    if file.status != FileStatus.approved:
+        raise HTTPException(status_code=403, detail="File not approved")
+    if not file.sha256 or not metadata.is_audio_candidate(file.name, file.mime_type):
+        raise HTTPException(status_code=404, detail="Cover not available for this file")
+
+    cover_hash = await run_in_threadpool(cover_art.lookup, file.sha256)
+    if cover_hash is None:
+        # 旧文件或尚未提取完成，排队提取
+        cover_art.submit(file.sha256, file.storage_path)
+        raise HTTPException(status_code=404, detail="Cover is being extracted")
+    if not cover_hash:
+        raise HTTPException(status_code=404, detail="No embedded cover")
+
+    etag = make_etag(cover_hash)
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(cover_art.get_cover_path(cover_hash), media_type="image/jpeg", headers=headers)
+
+@router.get("/search", response_model=list[FileOut])
+async def search_files(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """按文件名和曲目标签搜索，三元组索引筛选候选，权限过滤在同一条 SQL 中完成"""
+    query = search_index.normalize(q)
+    if not query:
+        raise HTTPException(status_code=400, detail="Empty query")
+
+    result = await db.scalars(select(File).join(
+        SearchDocument, SearchDocument.file_id == File.id
+    ).where(
+        *search_index.search_filters(query),
+        File.status == FileStatus.approved,
+        visible_files_filter(current_user)
+    ).order_by(File.name, File.id).limit(limit))
+    return result.all()
+
+@router.patch("/{file_id}/rename", response_model=FileOut)
+async def rename(
+    file_id: str,
+    rename_data: FileRename,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    return await rename_file(db, file_id, rename_data.new_name, current_user)
+
+async def _get_visible_node(db: AsyncSession, file_id: str, user: User) -> File:
+    node = await db.get(File, file_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not check_file_permission(user, node.owner_type, node.owner_id):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return node
+
+def _visible_descendants(db, file_id: str, max_depth: Optional[int], user: User) -> list[File]:
+    return hierarchy.descendants_query(db, file_id, max_depth).filter(
+        File.status == FileStatus.approved,
+        visible_files_filter(user)
+    ).order_by(FileClosure.depth, File.name).all()
+
+@router.get("/{file_id}/ancestors", response_model=list[FileOut])
+async def get_ancestors(
+    file_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """面包屑：从根目录到当前节点（含自身）"""
+    await _get_visible_node(db, file_id, current_user)
+    return await db.run_sync(hierarchy.ancestors, file_id)
+
+@router.get("/{file_id}/descendants", response_model=list[FileOut])
+async def get_descendants(
+    file_id: str,
+    max_depth: Optional[int] = Query(None, ge=1),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """递归列出子树中当前用户可见的已审核文件"""
+    await _get_visible_node(db, file_id, current_user)
+    return await db.run_sync(_visible_descendants, file_id, max_depth, current_user)
+
+@router.get("/{file_id}/usage", response_model=FolderUsage)
+async def get_folder_usage(
+    file_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """文件夹总大小与文件/子文件夹数量"""
+    node = await _get_visible_node(db, file_id, current_user)
+    if not node.is_folder:
+        raise HTTPException(status_code=400, detail="Not a folder")
+    size, files, folders = await db.run_sync(hierarchy.subtree_usage, file_id)
+    return FolderUsage(size=size, files=files, folders=folders)
 
 @router.post("/move/{file_id}", response_model=FileOut)
-async def move_file(
+async def move(
     file_id: str,
     move_data: FileMove,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    return move_file(db, file_id, move_data.target_parent_id, current_user)
+    return await move_file(db, file_id, move_data.target_parent_id, current_user)
+
+@router.post("/batch", response_model=BatchResult)
+async def batch_operations(
+    batch: BatchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    批量移动/重命名/删除，按顺序执行并在一个事务中提交，逐项返回结果
+    atomic=false 时失败项被跳过，其余照常提交
+    """
+    results, orphaned = await db.run_sync(file_batch.apply_batch, batch.operations, current_user)
+    failed = sum(1 for item in results if not item.ok)
+    if batch.atomic and failed:
+        await db.rollback()
+        return BatchResult(applied=False, succeeded=0, failed=failed, results=results)
+
+    await db.commit()
+    if orphaned:
+        await db.run_sync(file_batch.remove_orphaned_blobs, orphaned)
+    return BatchResult(applied=True, succeeded=len(results) - failed, failed=failed, results=results)
 
 @router.post("/create-folder", response_model=FileOut)
-async def create_folder(
+async def make_folder(
     folder_data: FileCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """创建新文件夹"""
@@ -152,61 +507,48 @@ async def create_folder(
             detail="Use this endpoint only for folder creation"
         )
     
-    return create_folder(db, folder_data, current_user)
+    return await create_folder(db, folder_data, current_user)
 
 @router.get("/list", response_model=list[FileOut])
 async def list_files(
+    request: Request,
     parent_id: Optional[str] = None,
-    db: Session = Depends(get_db),
+    sort: Literal["name", "size", "created_at"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """列出目录内容"""
-    # 根目录特殊处理
+    """
+    列出目录内容
+    传 limit 时分页返回，下一页游标放在 X-Next-Cursor 响应头中；
+    不传 limit 时从数据库游标流式输出全部子项；format=ndjson 时每行一个 JSON 对象
+    """
+    cache_headers = {"Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+
+    # 根目录特殊处理：一次查询，按角色和用户缓存
     if parent_id is None:
-        root_folders = []
-        
-        # 所有用户都能看到公共文件夹
-        public_folder = db.query(File).filter(
-            File.parent_id.is_(None),
-            File.owner_type == "PUBLIC",
-            File.status == FileStatus.approved
-        ).first()
-        
-        if public_folder:
-            root_folders.append(public_folder)
-        
-        # 成员和管理员能看到社团文件夹
-        if current_user.role in ("member", "admin"):
-            group_folder = db.query(File).filter(
-                File.parent_id.is_(None),
-                File.owner_type == "GROUP",
-                File.status == FileStatus.approved
-            ).first()
-            
-            if group_folder:
-                root_folders.append(group_folder)
-        
-        # 个人文件夹（所有登录用户）
-        personal_folder = db.query(File).filter(
-            File.parent_id.is_(None),
-            File.owner_type == "USER",
-            File.owner_id == current_user.id,
-            File.status == FileStatus.approved
-        ).first()
-        
-        if personal_folder:
-            root_folders.append(personal_folder)
-            
-        return root_folders
-    
-    # 非根目录正常查询
-    query = db.query(File).filter(
-        File.parent_id == parent_id,
-        File.status == FileStatus.approved
-    )
+        version = await db.run_sync(listing.get_folder_version, None)
+        etag = make_etag(f"root-{version}-{current_user.role}-{current_user.id}")
+        headers = {**cache_headers, "ETag": etag}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        cache_key = (listing.ROOT_KEY, version, current_user.role, current_user.id)
+        body = listing.listing_cache.get(cache_key)
+        if body is None:
+            rows = await db.run_sync(listing.root_rows, current_user)
+            body = "[" + ",".join(listing.dumps(row) for row in rows) + "]"
+            listing.listing_cache.put(cache_key, body)
+        return Response(content=body, media_type="application/json", headers=headers)
     
-    # 添加权限检查
-    parent = db.query(File).filter(File.id == parent_id).first()
+    # 添加权限检查（父文件夹与其版本号一次查出）
+    parent = (await db.execute(select(File.owner_type, File.owner_id, FolderVersion.version).outerjoin(
+        FolderVersion, FolderVersion.folder_id == File.id
+    ).where(File.id == parent_id))).first()
     if not parent:
         raise HTTPException(status_code=404, detail="Parent not found")
     
@@ -215,5 +557,38 @@ async def list_files(
     
     if parent.owner_type == "group" and current_user.role not in ("member", "admin"):
         raise HTTPException(status_code=403, detail="Group access requires member role")
+
+    # 同一版本、同一组参数的响应内容相同
+    version = parent.version or 0
+    params = f"{sort}:{order}:{limit}:{cursor}:{format}"
+    etag = make_etag(f"{parent_id}-{version}-{hashlib.md5(params.encode()).hexdigest()[:12]}")
+    headers = {**cache_headers, "ETag": etag}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    return query.all()
\ No newline at end of file
+    # 非根目录正常查询
+    try:
+        stmt = listing.children_query(parent_id, sort, order, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    if limit is None:
+        # 整个目录流式输出，不进缓存
+        return StreamingResponse(listing.stream_rows(stmt, format == "ndjson"), media_type=media_type, headers=headers)
+
+    cache_key = (parent_id, version, params)
+    cached = listing.listing_cache.get(cache_key)
+    if cached is None:
+        rows, next_cursor = await db.run_sync(listing.fetch_page, stmt, limit, sort)
+        if format == "ndjson":
+            body = "".join(listing.dumps(row) + "\n" for row in rows)
+        else:
+            body = "[" + ",".join(listing.dumps(row) for row in rows) + "]"
+        cached = (body, next_cursor)
+        listing.listing_cache.put(cache_key, cached)
+
+    body, next_cursor = cached
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,139 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.database.models import User, File, TrackMetadata
+from app.schemas.file import FileStatus
+from app.schemas.library import BrowsePage, TrackPage
+from app.dependencies import get_current_active_user
+from app.services.permission import visible_files_filter
+from app.utils.pagination import encode_cursor, decode_cursor
+from typing import Optional
+
+router = APIRouter(prefix="/library", tags=["Library"])
+
+
+def _visible_tracks(db: Session, user: User):
+    """当前用户可见、已审核的曲目，权限过滤在 SQL 中完成"""
+    return db.query(TrackMetadata).join(File, File.id == TrackMetadata.file_id).filter(
+        File.status == FileStatus.approved,
+        visible_files_filter(user)
+    )
+
+
+def _cursor_values(cursor: str, types: tuple) -> list:
+    """游标必须与排序键一一对应，格式不符时返回 400，而不是在 SQL 中出错"""
+    values = decode_cursor(cursor)
+    if len(values) != len(types) or not all(isinstance(value, t) for value, t in zip(values, types)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _after(columns: tuple, values: list):
+    """
+    键集分页条件：排序键在 values 之后的行，直接比较原始列以便走索引
+    NULL 按最小值处理(与 MySQL/SQLite 升序时 NULL 在前一致)，不用 coalesce 包装列
+    """
+    def greater(column, value):
+        return column.isnot(None) if value is None else column > value
+
+    def equal(column, value):
+        return column.is_(None) if value is None else column == value
+
+    return or_(*(
+        and_(*(equal(c, v) for c, v in zip(columns[:i], values[:i])), greater(column, value))
+        for i, (column, value) in enumerate(zip(columns, values))
+    ))
+
+
+def _browse(db: Session, user: User, column, cursor: Optional[str], limit: int, **filters):
+    """按某一列去重分页，游标为上一页最后一个值"""
+    query = _visible_tracks(db, user).filter(column.isnot(None))
+    for name, value in filters.items():
+        if value is not None:
+            query = query.filter(getattr(TrackMetadata, name) == value)
+    if cursor:
+        query = query.filter(column > _cursor_values(cursor, (str,))[0])
+
+    rows = query.with_entities(column, func.count()).group_by(column).order_by(column).limit(limit + 1).all()
+    next_cursor = encode_cursor([rows[limit - 1][0]]) if len(rows) > limit else None
+    return {
+        "items": [{"name": name, "tracks": count} for name, count in rows[:limit]],
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/artists", response_model=BrowsePage)
+def list_artists(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    genre: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """按艺术家浏览"""
+    return _browse(db, current_user, TrackMetadata.artist, cursor, limit, genre=genre)
+
+
+@router.get("/albums", response_model=BrowsePage)
+def list_albums(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    artist: Optional[str] = None,
+    genre: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """按专辑浏览，可限定艺术家或流派"""
+    return _browse(db, current_user, TrackMetadata.album, cursor, limit, artist=artist, genre=genre)
+
+
+@router.get("/genres", response_model=BrowsePage)
+def list_genres(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """按流派浏览"""
+    return _browse(db, current_user, TrackMetadata.genre, cursor, limit)
+
+
+@router.get("/tracks", response_model=TrackPage)
+def list_tracks(
+    artist: Optional[str] = None,
+    album: Optional[str] = None,
+    genre: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """曲目列表，按 专辑/碟号/音轨号 排序，使用键集分页"""
+    query = _visible_tracks(db, current_user)
+    if artist is not None:
+        query = query.filter(TrackMetadata.artist == artist)
+    if album is not None:
+        query = query.filter(TrackMetadata.album == album)
+    if genre is not None:
+        query = query.filter(TrackMetadata.genre == genre)
+
+    # 与 ix_track_album_order 的列顺序一致
+    sort_key = (TrackMetadata.album, TrackMetadata.disc_number, TrackMetadata.track_number, TrackMetadata.file_id)
+    if cursor:
+        optional_str, optional_int = (str, type(None)), (int, type(None))
+        query = query.filter(_after(sort_key, _cursor_values(cursor, (optional_str, optional_int, optional_int, str))))
+
+    rows = query.with_entities(TrackMetadata, File.name, File.size, File.mime_type).order_by(*sort_key).limit(limit + 1).all()
+
+    items = []
+    for track, name, size, mime_type in rows[:limit]:
+        item = {column.name: getattr(track, column.name) for column in TrackMetadata.__table__.columns}
+        item.update(name=name, size=size, mime_type=mime_type)
+        items.append(item)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1][0]
+        next_cursor = encode_cursor([last.album, last.disc_number, last.track_number, last.file_id])
+    return {"items": items, "next_cursor": next_cursor}
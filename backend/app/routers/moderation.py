@@ -1,43 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.database.models import File, User
-from app.schemas.file import FileOut, FileStatus
+from app.schemas.file import FileOut, FileStatus, PendingPage, ModerationBatch, ModerationResult
 from app.dependencies import get_current_active_user
 from app.services.permission import check_admin
-import os
+from app.services.moderation import set_status, file_mover
+from app.utils.pagination import encode_cursor, decode_cursor
+from datetime import datetime
+from typing import Optional
 
 router = APIRouter(prefix="/moderation", tags=["Moderation"])
 
-@router.get("/pending-files", response_model=list[FileOut])
+@router.get("/pending-files", response_model=PendingPage)
 async def get_pending_files(
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
+    """待审核队列，按 (created_at, id) 键集分页，先上传的先审"""
     check_admin(current_user)
-    return db.query(File).filter(File.status == FileStatus.pending).all()
+    sort_key = (File.created_at, File.id)
+    stmt = select(File).where(File.status == FileStatus.pending)
+    if cursor:
+        try:
+            created_at, file_id = decode_cursor(cursor)
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(*sort_key) > tuple_(created_at, file_id))
+    rows = (await db.scalars(stmt.order_by(*sort_key).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
+    return PendingPage(items=rows[:limit], next_cursor=next_cursor)
+
+async def _moderate(db: AsyncSession, file_ids: list[str], status: FileStatus) -> ModerationResult:
+    """同一批文件的状态在一个事务中变更；需要搬移的文件提交后交给后台线程"""
+    updated, moves = await db.run_sync(set_status, file_ids, status)
+    await db.commit()
+    for src, dest in moves:
+        file_mover.submit(src, dest)
+    done = set(updated)
+    skipped = [file_id for file_id in dict.fromkeys(file_ids) if file_id not in done]
+    return ModerationResult(updated=updated, skipped=skipped, relocations=len(moves))
+
+@router.post("/batch", response_model=ModerationResult)
+async def moderate_batch(
+    batch: ModerationBatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """批量通过或驳回"""
+    check_admin(current_user)
+    status = FileStatus.approved if batch.action == "approve" else FileStatus.rejected
+    return await _moderate(db, batch.file_ids, status)
 
 @router.post("/approve/{file_id}", response_model=FileOut)
 async def approve_file(
     file_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     check_admin(current_user)
-    file = db.query(File).filter(File.id == file_id).first()
+    file = await db.get(File, file_id)
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
     if file.status != FileStatus.pending:
         raise HTTPException(status_code=400, detail="File is not pending approval")
     
-    # 移动文件到正式目录
-    new_path = file.storage_path.replace('/temp/', '/approved/')
-    os.makedirs(os.path.dirname(new_path), exist_ok=True)
-    os.rename(file.storage_path, new_path)
-    
-    # 更新数据库
-    file.status = FileStatus.approved
-    file.storage_path = new_path
-    db.commit()
-    return file
\ No newline at end of file
+    await _moderate(db, [file_id], FileStatus.approved)
+    await db.refresh(file)
+    return file
@@ -1,7 +1,7 @@
 from enum import Enum
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 class FileStatus(str, Enum):
     pending = "pending"
@@ -39,4 +39,95 @@ class FileMove(BaseModel):
         ..., 
         example="b2c3d4e5-f6g7-8901-h2i3-j4k5l6m7n8o9",
         description="目标文件夹ID"
-    )
\ No newline at end of file
+    )
+
+class FileRename(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    new_name: str = Field(..., alias="newName", min_length=1, max_length=255, example="track01.flac")
+
+
+class FolderUsage(BaseModel):
+    size: int = Field(..., ge=0, description="子树内文件总大小(字节)")
+    files: int = Field(..., ge=0)
+    folders: int = Field(..., ge=0)
+
+
+class MergeJobOut(BaseModel):
+    job_id: str
+    status: str = Field(..., example="running", description="queued / running / done / failed")
+    progress: float = Field(0, ge=0, le=1)
+    error: Optional[str] = None
+    file: Optional[FileOut] = None
+
+
+class BatchOperation(BaseModel):
+    op: Literal["move", "rename", "delete"]
+    file_id: str
+    target_parent_id: Optional[str] = Field(None, description="move：目标文件夹ID")
+    new_name: Optional[str] = Field(None, min_length=1, max_length=255, description="rename：新名称")
+
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_length=1, max_length=5000)
+    atomic: bool = Field(False, description="为 true 时任一操作失败则全部不生效")
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    op: str
+    file_id: str
+    ok: bool
+    status_code: int = 200
+    detail: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    applied: bool = Field(..., description="是否已提交；atomic 且有失败项时为 false")
+    succeeded: int
+    failed: int
+    results: list[BatchItemResult]
+
+
+class PendingPage(BaseModel):
+    items: list[FileOut]
+    next_cursor: Optional[str] = None
+
+
+class ModerationBatch(BaseModel):
+    file_ids: list[str] = Field(..., min_length=1, max_length=1000)
+    action: Literal["approve", "reject"]
+
+
+class ModerationResult(BaseModel):
+    updated: list[str] = Field(..., description="状态已变更的文件")
+    skipped: list[str] = Field(default_factory=list, description="不存在或已不在待审核状态")
+    relocations: int = Field(0, description="已加入后台搬移队列的文件数")
+
+
+class UploadSessionCreate(BaseModel):
+    identifier: str = Field(..., pattern="^[0-9a-fA-F]{32}$", description="文件 MD5")
+    filename: str = Field(..., min_length=1, max_length=255)
+    total_size: int = Field(..., ge=0)
+    chunk_size: int = Field(..., gt=0)
+    total_chunks: int = Field(..., ge=1)
+    space_type: str = Field(..., pattern="^(public|group|user)$")
+    parent_id: Optional[str] = None
+
+
+class UploadProgress(BaseModel):
+    session_id: str
+    total_chunks: int
+    received: int = Field(..., ge=0, description="已收到的分片数")
+    uploaded: list[list[int]] = Field(default_factory=list, description="已收到的分片区间(闭区间)，如 [[1, 5], [8, 8]]")
+
+
+class UploadSessionOut(BaseModel):
+    skip_upload: bool = Field(False, description="已有相同内容，服务端直接创建了文件记录(秒传)")
+    file: Optional[FileOut] = None
+    session_id: Optional[str] = None
+    upload_token: Optional[str] = None
+    chunk_size: Optional[int] = None
+    total_chunks: Optional[int] = None
+    expires_at: Optional[datetime] = None
+    uploaded: list[list[int]] = Field(default_factory=list)
@@ -0,0 +1,36 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class BrowseEntry(BaseModel):
+    name: str = Field(..., example="Radiohead")
+    tracks: int = Field(..., ge=0)
+
+
+class BrowsePage(BaseModel):
+    items: list[BrowseEntry]
+    next_cursor: Optional[str] = None
+
+
+class TrackOut(BaseModel):
+    file_id: str
+    name: str
+    size: int
+    mime_type: Optional[str] = None
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    album_artist: Optional[str] = None
+    album: Optional[str] = None
+    genre: Optional[str] = None
+    track_number: Optional[int] = None
+    disc_number: Optional[int] = None
+    year: Optional[int] = None
+    duration: Optional[float] = Field(None, description="时长(秒)")
+    bitrate: Optional[int] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+
+class TrackPage(BaseModel):
+    items: list[TrackOut]
+    next_cursor: Optional[str] = None
@@ -35,7 +35,12 @@ class QuotaSetting(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: str | None = None
-    role: str | None = None  # 添加角色信息
\ No newline at end of file
+    role: str | None = None  # 添加角色信息
+    exp: float | None = None  # 过期时间(Unix 时间戳)
\ No newline at end of file
@@ -33,7 +33,7 @@ def decode_token(token: str) -> TokenData:
         role: str = payload.get("role")
         if username is None:
             raise JWTError
-        return TokenData(username=username, role=role)
+        return TokenData(username=username, role=role, exp=payload.get("exp"))
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from app.config import settings
+from app.database.models import User
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """鉴权后的用户快照，提供路由和权限检查用到的字段，不绑定数据库会话"""
+    id: int
+    username: str
+    email: str | None
+    role: str
+    is_active: bool
+    storage_quota: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            role=user.role,
+            is_active=bool(user.is_active),
+            storage_quota=user.storage_quota,
+        )
+
+
+class TokenCache:
+    """
+    已验证 token -> 用户快照 的有界 TTL 缓存
+    条目在 token 过期或 TTL 到期时失效；管理员修改用户时按用户立即失效
+    多进程部署时失效只作用于当前进程，其余进程最多滞后一个 TTL
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._items: OrderedDict[str, tuple[UserSnapshot, float]] = OrderedDict()
+        self._by_user: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> UserSnapshot | None:
+        with self._lock:
+            entry = self._items.get(token)
+            if entry is None:
+                return None
+            snapshot, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+            self._items.move_to_end(token)
+            return snapshot
+
+    def put(self, token: str, snapshot: UserSnapshot, token_exp: float | None = None):
+        expires_at = time.time() + self._ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._items[token] = (snapshot, expires_at)
+            self._items.move_to_end(token)
+            self._by_user.setdefault(snapshot.id, set()).add(token)
+            while len(self._items) > self._maxsize:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in list(self._by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._by_user.clear()
+
+    def _remove(self, token: str):
+        entry = self._items.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._by_user.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._by_user[entry[0].id]
+
+
+token_cache = TokenCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
@@ -0,0 +1,171 @@
+import errno
+import os
+import shutil
+import time
+from uuid import uuid4
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.models import Blob, File, FileStatus
+from .permission import visible_files_filter
+
+
+def get_blob_path(sha256: str) -> str:
+    """BLOB_ROOT/ab/cd/<sha256>，两级目录避免单目录文件过多"""
+    return os.path.join(settings.BLOB_ROOT, sha256[:2], sha256[2:4], sha256)
+
+
+def get_incoming_dir() -> str:
+    return os.path.join(settings.BLOB_ROOT, ".incoming")
+
+
+def get_incoming_path(name: str | None = None) -> str:
+    """
+    新内容先写到 BLOB_ROOT 下的临时位置，确认后原子重命名为正式路径
+    上传会话以会话ID命名，分片直接按偏移写入该文件
+    """
+    incoming = get_incoming_dir()
+    os.makedirs(incoming, exist_ok=True)
+    return os.path.join(incoming, name or uuid4().hex)
+
+
+def preallocate(path: str, size: int):
+    """按最终大小创建文件并预分配磁盘空间；文件系统不支持 fallocate 时退回稀疏文件"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        if size > 0:
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL):
+                    raise
+                os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def acquire_blob(db: Session, sha256: str) -> Blob | None:
+    """
+    已存在相同内容时原子地增加引用计数并返回该 Blob，否则返回 None
+    引用变更随调用方的事务一起提交
+    """
+    result = db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(ref_count=Blob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    return db.query(Blob).filter(Blob.sha256 == sha256).populate_existing().first()
+
+
+def release_blob(db: Session, sha256: str, count: int = 1) -> str | None:
+    """
+    引用计数减 count，随调用方的事务提交
+    计数归零时删除 Blob 记录并返回其存储路径，由调用方在提交后删除文件
+    """
+    db.execute(
+        update(Blob)
+        .where(Blob.sha256 == sha256)
+        .values(ref_count=Blob.ref_count - count)
+        .execution_options(synchronize_session=False)
+    )
+    blob = db.query(Blob).filter(Blob.sha256 == sha256).populate_existing().first()
+    if not blob or blob.ref_count > 0:
+        return None
+    path = blob.storage_path
+    db.delete(blob)
+    return path
+
+
+def remove_unreferenced(db: Session, sha256: str, path: str):
+    """提交后删除内容文件；期间有相同内容重新上传并登记时保留"""
+    if db.query(Blob.sha256).filter(Blob.sha256 == sha256).first():
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def find_blob(db: Session, md5: str, size: int, user) -> Blob | None:
+    """
+    按客户端提供的 MD5 + 大小查找可秒传的内容
+    MD5 只是客户端的声明，不能证明持有内容：只复用该用户可见且已审核通过的文件所引用的内容
+    """
+    visible = select(File.id).where(
+        File.sha256 == Blob.sha256, File.status == FileStatus.approved, visible_files_filter(user)
+    ).exists()
+    return db.query(Blob).filter(Blob.md5 == md5, Blob.size == size, visible).first()
+
+
+def sweep_unregistered(db: Session, min_age: int) -> tuple[int, int]:
+    """
+    删除 Blob 目录中没有对应记录的内容文件(store_blob 重命名到位后登记事务回滚时遗留)，返回 (文件数, 字节数)
+    回滚时不能直接删除：并发登记相同内容的事务可能正指向同一路径；
+    这里只处理 min_age 秒内没有重命名或写入过的文件(rename 会更新 ctime)，尚未提交的登记不受影响
+    """
+    cutoff = time.time() - min_age
+    removed = freed = 0
+    try:
+        prefixes = sorted(os.listdir(settings.BLOB_ROOT))
+    except FileNotFoundError:
+        return 0, 0
+    for prefix in prefixes:
+        top = os.path.join(settings.BLOB_ROOT, prefix)
+        # 跳过 .incoming 等非两级哈希目录
+        if len(prefix) != 2 or not os.path.isdir(top):
+            continue
+        for sub in sorted(os.listdir(top)):
+            directory = os.path.join(top, sub)
+            candidates = {}
+            for entry in os.scandir(directory):
+                stat = entry.stat(follow_symlinks=False)
+                if entry.is_file(follow_symlinks=False) and max(stat.st_mtime, stat.st_ctime) < cutoff:
+                    candidates[entry.name] = (entry.path, stat.st_size)
+            if not candidates:
+                continue
+            names = list(candidates)
+            registered = set()
+            for i in range(0, len(names), 1000):
+                registered.update(db.scalars(select(Blob.sha256).where(Blob.sha256.in_(names[i:i + 1000]))))
+            for name in set(names) - registered:
+                path, size = candidates[name]
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += size
+    return removed, freed
+
+
+def store_blob(db: Session, src_path: str, sha256: str, md5: str, size: int) -> Blob:
+    """
+    把 src_path 登记为内容 sha256，引用计数 +1
+    内容已存在时删除 src_path；否则把它重命名到 Blob 正式路径
+    调用方的事务回滚时文件留在正式路径上，由 sweep_unregistered 回收
+    """
+    blob = acquire_blob(db, sha256)
+    if blob:
+        os.remove(src_path)
+        return blob
+
+    blob_path = get_blob_path(sha256)
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    try:
+        os.replace(src_path, blob_path)
+    except OSError:
+        # 跨文件系统时退回复制
+        shutil.move(src_path, blob_path)
+
+    blob = Blob(sha256=sha256, md5=md5, size=size, storage_path=blob_path, ref_count=1)
+    try:
+        with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        # 并发合并了相同内容，改为引用对方已登记的 Blob
+        blob = acquire_blob(db, sha256)
+    return blob
@@ -0,0 +1,64 @@
+import fcntl
+import os
+
+# 每个上传会话一个位图文件，第 n 个分片对应第 n-1 位；
+# 多个分片请求并发写同一字节时用 flock 串行化读改写
+BITMAP_NAME = "bitmap"
+
+
+def get_bitmap_path(chunk_dir: str) -> str:
+    return os.path.join(chunk_dir, BITMAP_NAME)
+
+
+def create(path: str, total_chunks: int):
+    with open(path, "wb") as f:
+        f.truncate((total_chunks + 7) // 8)
+
+
+def mark(path: str, chunk_number: int):
+    index = chunk_number - 1
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        current = os.pread(fd, 1, index // 8)
+        value = (current[0] if current else 0) | (1 << (index % 8))
+        os.pwrite(fd, bytes([value]), index // 8)
+    finally:
+        os.close(fd)
+
+
+def load(path: str) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return b""
+
+
+def has(bitmap: bytes, chunk_number: int) -> bool:
+    index = chunk_number - 1
+    return index // 8 < len(bitmap) and bool(bitmap[index // 8] >> (index % 8) & 1)
+
+
+def received(bitmap: bytes, total_chunks: int) -> list[int]:
+    return [n for n in range(1, total_chunks + 1) if has(bitmap, n)]
+
+
+def to_ranges(bitmap: bytes, total_chunks: int) -> list[list[int]]:
+    """已收到的分片编号压缩为闭区间列表，如 [[1, 5], [8, 8]]"""
+    ranges = []
+    for n in received(bitmap, total_chunks):
+        if ranges and ranges[-1][1] == n - 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return ranges
+
+
+def is_complete(bitmap: bytes, total_chunks: int) -> bool:
+    if len(bitmap) < (total_chunks + 7) // 8:
+        return False
+    full, rest = divmod(total_chunks, 8)
+    if bitmap[:full] != b"\xff" * full:
+        return False
+    return rest == 0 or bitmap[full] & ((1 << rest) - 1) == (1 << rest) - 1
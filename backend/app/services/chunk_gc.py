@@ -0,0 +1,219 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import UploadSession
+from . import upload_hash
+from .blob_store import get_incoming_dir
+from .merge_queue import merge_queue
+from .upload_session import release_session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PartialUpload:
+    """CHUNKTEMP 下一个未完成上传的分片目录"""
+    name: str
+    path: str
+    size: int
+    last_write: float
+
+
+def _scan_dir(name: str, path: str, incoming_root: str | None) -> PartialUpload:
+    # 新分片以重命名方式落盘会更新目录 mtime，位图原地写只更新自身 mtime
+    size = 0
+    last_write = os.stat(path).st_mtime
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            size += st.st_size
+            last_write = max(last_write, st.st_mtime)
+    # 上传会话的数据按偏移写在 .incoming 下的目标文件中
+    if incoming_root:
+        try:
+            st = os.stat(os.path.join(incoming_root, name))
+            size += st.st_size
+            last_write = max(last_write, st.st_mtime)
+        except FileNotFoundError:
+            pass
+    return PartialUpload(name, path, size, last_write)
+
+
+def scan(root: str, incoming_root: str | None = None) -> list[PartialUpload]:
+    """列出所有分片目录，按最后写入时间从旧到新排序"""
+    partials = []
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        try:
+            partials.append(_scan_dir(entry.name, entry.path, incoming_root))
+        except FileNotFoundError:
+            # 扫描期间刚好合并完成被删除
+            continue
+    partials.sort(key=lambda p: p.last_write)
+    return partials
+
+
+class ChunkSweeper:
+    """
+    后台线程，定期清理分片临时目录:
+    - 最后一次写入超过 CHUNK_GC_TTL 的目录直接回收
+    - 剩余空间低于 CHUNK_GC_MIN_FREE_BYTES 时，从最旧的未完成上传开始淘汰
+    属于上传会话的目录同时删除会话、.incoming 下的目标文件，并退还预留的配额；
+    正在合并的上传不会被回收
+    """
+
+    def __init__(self, root: str, interval: int, ttl: int, min_free_bytes: int, incoming_root: str | None = None):
+        self._root = root
+        self._incoming_root = incoming_root
+        self._interval = interval
+        self._ttl = ttl
+        self._min_free_bytes = min_free_bytes
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._sweep_lock = threading.Lock()
+        # 指标
+        self.reclaimed_bytes = 0
+        self.reclaimed_uploads = 0
+        self.live_uploads = 0
+        self.live_bytes = 0
+        self.skipped_active = 0
+        self.last_sweep: float | None = None
+
+    def start(self):
+        if self._interval <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chunk-sweeper", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "reclaimed_uploads": self.reclaimed_uploads,
+            "live_uploads": self.live_uploads,
+            "live_bytes": self.live_bytes,
+            "skipped_active": self.skipped_active,
+            "last_sweep": self.last_sweep,
+        }
+
+    def _free_bytes(self) -> int:
+        """分片目录和目标文件可能在不同的卷上，取两者中较小的剩余空间"""
+        free = []
+        for root in filter(None, (self._root, self._incoming_root)):
+            try:
+                free.append(shutil.disk_usage(root).free)
+            except FileNotFoundError:
+                continue
+        return min(free, default=self._min_free_bytes)
+
+    def _remove_incoming(self, name: str):
+        if not self._incoming_root:
+            return
+        try:
+            os.remove(os.path.join(self._incoming_root, name))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, db, partial: PartialUpload, reason: str) -> bool:
+        """回收一个分片目录；合并任务可能在扫描之后才入队，删除前再确认一次，正在合并时返回 False"""
+        if partial.name in merge_queue.active_uploads():
+            return False
+        session = db.get(UploadSession, partial.name)
+        if session:
+            release_session(db, session)
+        shutil.rmtree(partial.path, ignore_errors=True)
+        self._remove_incoming(partial.name)
+        upload_hash.discard(partial.name)
+        self.reclaimed_bytes += partial.size
+        self.reclaimed_uploads += 1
+        logger.info("Reclaimed chunk dir %s (%s bytes, %s)", partial.name, partial.size, reason)
+        return True
+
+    def _release_expired_sessions(self, db, now: datetime) -> int:
+        """目录已不存在(或仍在)但已过期的会话，同样退还配额"""
+        expired = db.query(UploadSession).filter(UploadSession.expires_at < now).all()
+        released = 0
+        for session in expired:
+            if session.id in merge_queue.active_uploads():
+                continue
+            session_id = session.id
+            release_session(db, session)
+            shutil.rmtree(os.path.join(self._root, session_id), ignore_errors=True)
+            self._remove_incoming(session_id)
+            upload_hash.discard(session_id)
+            released += 1
+        return released
+
+    def run_once(self) -> int:
+        """执行一次清理，返回回收的目录数"""
+        with self._sweep_lock:
+            db = SessionLocal()
+            reclaimed = 0
+            try:
+                reclaimed += self._release_expired_sessions(db, datetime.utcnow())
+
+                now = time.time()
+                live = []
+                skipped = set()
+                for partial in scan(self._root, self._incoming_root):
+                    if now - partial.last_write <= self._ttl:
+                        live.append(partial)
+                    elif self._evict(db, partial, "expired"):
+                        reclaimed += 1
+                    else:
+                        live.append(partial)
+                        skipped.add(partial.name)
+
+                # 空间不足时按最后写入时间从旧到新淘汰；正在合并的上传保留并仍计入存活
+                for partial in list(live):
+                    if self._free_bytes() >= self._min_free_bytes:
+                        break
+                    if self._evict(db, partial, "disk pressure"):
+                        live.remove(partial)
+                        reclaimed += 1
+                    else:
+                        skipped.add(partial.name)
+
+                self.live_uploads = len(live)
+                self.live_bytes = sum(p.size for p in live)
+                self.skipped_active = len(skipped)
+                self.last_sweep = now
+            except Exception:
+                db.rollback()
+                logger.exception("Chunk temp sweep failed")
+            finally:
+                db.close()
+            return reclaimed
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.run_once()
+
+
+chunk_sweeper = ChunkSweeper(
+    settings.CHUNKTEMP,
+    settings.CHUNK_GC_INTERVAL,
+    settings.CHUNK_GC_TTL,
+    settings.CHUNK_GC_MIN_FREE_BYTES,
+    get_incoming_dir()
+)
@@ -0,0 +1,106 @@
+import filecmp
+import os
+import re
+from uuid import uuid4
+from fastapi import UploadFile, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+def get_chunk_dir(identifier: str) -> str:
+    """分片目录 CHUNKTEMP/<identifier>，identifier 由客户端提供，需防止路径穿越"""
+    if not _IDENTIFIER_RE.match(identifier):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid identifier")
+    return os.path.join(settings.CHUNKTEMP, identifier)
+
+
+def list_chunks(chunk_dir: str) -> list[int]:
+    """已完整写入的分片编号（临时 .part 文件不计入）"""
+    if not os.path.exists(chunk_dir):
+        return []
+    return sorted(int(name) for name in os.listdir(chunk_dir) if name.isdigit())
+
+
+async def save_chunk(upload: UploadFile, identifier: str, chunk_number: int, expected_size: int) -> int:
+    """
+    按固定块大小把分片流式写入临时文件，写完后以硬链接原子地发布为分片文件
+    已收到的分片不可覆盖(增量哈希可能已经读过它)：内容相同视为重传，直接成功；内容不同返回 409
+    参数:
+        upload: 上传的分片
+        identifier: 文件标识(MD5)
+        chunk_number: 分片编号(从1开始)
+        expected_size: 客户端声明的分片大小(currentChunkSize)
+    """
+    chunk_dir = get_chunk_dir(identifier)
+    await run_in_threadpool(os.makedirs, chunk_dir, exist_ok=True)
+    chunk_path = os.path.join(chunk_dir, str(chunk_number))
+    tmp_path = f"{chunk_path}.{uuid4().hex[:8]}.part"
+
+    written = 0
+    out = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        while written <= expected_size:
+            block = await upload.read(settings.CHUNK_IO_BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            await run_in_threadpool(out.write, block)
+    finally:
+        await run_in_threadpool(out.close)
+
+    if written != expected_size:
+        await run_in_threadpool(os.remove, tmp_path)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk size mismatch (expected {expected_size}, got {written} bytes)"
+        )
+
+    try:
+        # link 在目标已存在时失败，不会像 replace 那样覆盖
+        await run_in_threadpool(os.link, tmp_path, chunk_path)
+    except FileExistsError:
+        if not await run_in_threadpool(filecmp.cmp, tmp_path, chunk_path, False):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Chunk already uploaded")
+    finally:
+        await run_in_threadpool(os.remove, tmp_path)
+    return written
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        n = os.pwrite(fd, view, offset)
+        view = view[n:]
+        offset += n
+
+
+async def write_chunk_at(upload: UploadFile, path: str, offset: int, expected_size: int) -> int:
+    """
+    把分片按偏移直接写入预分配的目标文件(pwrite)，不经过分片目录
+    超出声明大小的数据不会写入；大小不符时抛出 400，该分片需要重传
+    """
+    try:
+        fd = await run_in_threadpool(os.open, path, os.O_WRONLY)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+
+    written = 0
+    try:
+        while written <= expected_size:
+            block = await upload.read(settings.CHUNK_IO_BLOCK_SIZE)
+            if not block:
+                break
+            if written + len(block) <= expected_size:
+                await run_in_threadpool(_pwrite_all, fd, block, offset + written)
+            written += len(block)
+    finally:
+        await run_in_threadpool(os.close, fd)
+
+    if written != expected_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk size mismatch (expected {expected_size}, got {written} bytes)"
+        )
+    return written
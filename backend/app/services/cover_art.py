@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import mutagen
+from mutagen.flac import Picture
+from PIL import Image, UnidentifiedImageError
+from app.config import settings
+
+# 封面按两级索引存放:
+#   COVER_ROOT/blobs/ab/<音频 sha256>   内容为封面图片哈希；空文件表示该音频没有内嵌封面
+#   COVER_ROOT/ab/<图片哈希>.jpg        缩略图，同一张专辑封面只存一份
+_FRONT_COVER = 3  # APIC / PICTURE 的图片类型：封面(正面)
+
+_executor = ThreadPoolExecutor(max_workers=settings.COVER_WORKERS, thread_name_prefix="cover")
+_inflight: set[str] = set()
+_inflight_lock = threading.Lock()
+
+
+def get_ref_path(sha256: str) -> str:
+    return os.path.join(settings.COVER_ROOT, "blobs", sha256[:2], sha256)
+
+
+def get_cover_path(cover_hash: str) -> str:
+    return os.path.join(settings.COVER_ROOT, cover_hash[:2], f"{cover_hash}.jpg")
+
+
+def _pick(pictures) -> bytes | None:
+    """优先取封面类型的图片，没有时取第一张"""
+    pictures = [p for p in pictures if getattr(p, "data", None)]
+    if not pictures:
+        return None
+    front = [p for p in pictures if getattr(p, "type", None) == _FRONT_COVER]
+    return (front or pictures)[0].data
+
+
+def extract_cover(path: str) -> bytes | None:
+    """读取 ID3 APIC、FLAC PICTURE、Vorbis METADATA_BLOCK_PICTURE 或 MP4 covr 中的内嵌图片"""
+    try:
+        audio = mutagen.File(path)
+    except (mutagen.MutagenError, OSError, ValueError):
+        return None
+    if audio is None:
+        return None
+
+    if getattr(audio, "pictures", None):
+        return _pick(audio.pictures)
+
+    tags = audio.tags
+    if tags is None:
+        return None
+    if hasattr(tags, "getall"):
+        return _pick(tags.getall("APIC"))
+    if "covr" in tags:
+        return bytes(tags["covr"][0]) if tags["covr"] else None
+    blocks = tags.get("metadata_block_picture") if hasattr(tags, "get") else None
+    if blocks:
+        pictures = []
+        for block in blocks:
+            try:
+                pictures.append(Picture(base64.b64decode(block)))
+            except (ValueError, mutagen.MutagenError):
+                continue
+        return _pick(pictures)
+    return None
+
+
+def make_thumbnail(data: bytes) -> bytes | None:
+    """缩放到 COVER_MAX_SIZE 以内并统一编码为 JPEG，无法解码时返回 None"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.thumbnail((settings.COVER_MAX_SIZE, settings.COVER_MAX_SIZE))
+            out = io.BytesIO()
+            image.convert("RGB").save(out, "JPEG", quality=85, optimize=True)
+            return out.getvalue()
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def _write_atomic(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def generate_cover(sha256: str, storage_path: str):
+    """提取一次并写入索引；相同图片(按原始图片字节的哈希)只生成一份缩略图"""
+    ref_path = get_ref_path(sha256)
+    try:
+        if os.path.exists(ref_path):
+            return
+        data = extract_cover(storage_path)
+        thumbnail = make_thumbnail(data) if data else None
+        if thumbnail is None:
+            _write_atomic(ref_path, b"")
+            return
+        cover_hash = hashlib.sha256(data).hexdigest()
+        cover_path = get_cover_path(cover_hash)
+        if not os.path.exists(cover_path):
+            _write_atomic(cover_path, thumbnail)
+        _write_atomic(ref_path, cover_hash.encode())
+    finally:
+        with _inflight_lock:
+            _inflight.discard(sha256)
+
+
+def lookup(sha256: str) -> str | None:
+    """
+    返回封面图片哈希；没有内嵌封面时返回 ""，尚未提取时返回 None
+    """
+    try:
+        with open(get_ref_path(sha256), "rb") as f:
+            return f.read().decode()
+    except FileNotFoundError:
+        return None
+
+
+def submit(sha256: str, storage_path: str):
+    """在后台线程池中提取封面，同一内容不会重复排队"""
+    with _inflight_lock:
+        if sha256 in _inflight:
+            return
+        _inflight.add(sha256)
+    _executor.submit(generate_cover, sha256, storage_path)
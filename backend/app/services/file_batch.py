@@ -0,0 +1,203 @@
+import os
+from collections import Counter, defaultdict
+from sqlalchemy import select, delete, or_
+from sqlalchemy.orm import Session
+from app.database.models import File, FileClosure, TrackMetadata
+from app.schemas.file import BatchOperation, BatchItemResult
+from .blob_store import release_blob, remove_unreferenced
+from .file_service import sanitize_filename, _relocate_node, _reindex_node
+from .hierarchy import is_descendant
+from .listing import touch_folders
+from .permission import check_file_permission, check_file_write_permission
+from .search_index import remove_files
+from .storage import release_storage
+from .waveform import get_peaks_path
+from .cover_art import get_ref_path
+
+_BATCH = 1000
+
+
+class _Rejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _load_files(db: Session, ids: set[str]) -> dict[str, File]:
+    ids = list(ids)
+    files = {}
+    for i in range(0, len(ids), _BATCH):
+        for node in db.scalars(select(File).where(File.id.in_(ids[i:i + _BATCH]))):
+            files[node.id] = node
+    return files
+
+
+def _subtrees(db: Session, root_ids: set[str]) -> dict[str, dict[str, int]]:
+    """{根ID: {子孙ID: depth}}(含自身)，一次查询"""
+    root_ids = list(root_ids)
+    result = defaultdict(dict)
+    for i in range(0, len(root_ids), _BATCH):
+        rows = db.execute(
+            select(FileClosure.ancestor_id, FileClosure.descendant_id, FileClosure.depth)
+            .where(FileClosure.ancestor_id.in_(root_ids[i:i + _BATCH]))
+        )
+        for ancestor_id, descendant_id, depth in rows:
+            result[ancestor_id][descendant_id] = depth
+    return result
+
+
+class _Batch:
+    """
+    按顺序执行一批移动/重命名/删除
+    涉及的文件、目标文件夹和被移动/删除的子树在开始时各用一次查询载入，
+    权限与环路检查在内存中完成；所有修改在调用方的同一个事务中
+    """
+
+    def __init__(self, db: Session, operations: list[BatchOperation], user):
+        self.db = db
+        self.user = user
+        self.operations = operations
+        self.files = _load_files(db, {op.file_id for op in operations} | {
+            op.target_parent_id for op in operations if op.op == "move" and op.target_parent_id
+        })
+        self.subtrees = _subtrees(db, {op.file_id for op in operations if op.op in ("move", "delete")})
+        # 被移动子树中的节点，祖先链会在本批次中改变，环路检查需要读取最新的闭包表
+        self.moved_nodes = {
+            node_id
+            for op in operations if op.op == "move"
+            for node_id in self.subtrees.get(op.file_id, ())
+        }
+        # 本批次是否已执行过移动：移入/移出都会让开始时的子树快照失效
+        self.moved = False
+        self.deleted: set[str] = set()
+        self.orphaned_blobs: list[tuple[str, str]] = []
+
+    def _get(self, file_id: str) -> File:
+        node = self.files.get(file_id)
+        if not node or file_id in self.deleted:
+            raise _Rejected(404, "File not found")
+        if not check_file_write_permission(self.user, node.owner_type, node.owner_id, node.created_by):
+            raise _Rejected(403, "Permission denied")
+        return node
+
+    def move(self, op: BatchOperation):
+        node = self._get(op.file_id)
+        if not op.target_parent_id:
+            raise _Rejected(400, "target_parent_id is required")
+        target = self.files.get(op.target_parent_id)
+        if not target or not target.is_folder or target.id in self.deleted:
+            raise _Rejected(404, "Target folder not found")
+        if not check_file_permission(self.user, target.owner_type, target.owner_id):
+            raise _Rejected(403, "No permission to target folder")
+
+        if target.id in self.moved_nodes:
+            self.db.flush()
+            cycle = is_descendant(self.db, node.id, target.id)
+        else:
+            cycle = target.id in self.subtrees.get(node.id, ())
+        if cycle:
+            raise _Rejected(400, "Cannot move a folder into itself or its descendant")
+        if node.parent_id == target.id:
+            return
+        _relocate_node(self.db, node, target.id)
+        self.moved = True
+
+    def rename(self, op: BatchOperation):
+        node = self._get(op.file_id)
+        name = (op.new_name or "").strip() if node.is_folder else sanitize_filename(op.new_name or "").strip()
+        if not name:
+            raise _Rejected(400, "Invalid name")
+        node.name = name
+        _reindex_node(self.db, node)
+
+    def delete(self, op: BatchOperation):
+        node = self._get(op.file_id)
+        # 公共/社团空间的顶层文件夹是共用入口，只有管理员可以删除；个人空间不受限
+        owner_type = getattr(node.owner_type, "value", node.owner_type)
+        if node.is_folder and node.parent_id is None and owner_type != 'user' and self.user.role != 'admin':
+            raise _Rejected(403, "Cannot delete a root folder")
+        subtree = self.subtrees.get(node.id) or {node.id: 0}
+        # 之前的移动可能把节点移入或移出了该子树，删除前读取最新的闭包表
+        if self.moved:
+            self.db.flush()
+            subtree = _subtrees(self.db, {node.id})[node.id]
+        subtree = {node_id: depth for node_id, depth in subtree.items() if node_id not in self.deleted}
+        nodes = _load_files(self.db, set(subtree) - set(self.files))
+        nodes.update({node_id: self.files[node_id] for node_id in subtree if node_id in self.files})
+        for child in nodes.values():
+            if not check_file_write_permission(self.user, child.owner_type, child.owner_id, child.created_by):
+                raise _Rejected(403, f"Permission denied for {child.name}")
+
+        self.db.flush()
+        self._release(nodes.values())
+        ids = list(subtree)
+        for i in range(0, len(ids), _BATCH):
+            part = ids[i:i + _BATCH]
+            remove_files(self.db, part)
+            self.db.execute(delete(TrackMetadata).where(TrackMetadata.file_id.in_(part)))
+            self.db.execute(delete(FileClosure).where(or_(
+                FileClosure.descendant_id.in_(part), FileClosure.ancestor_id.in_(part)
+            )))
+        # 先删最深的节点，parent_id 外键始终有效
+        for depth in sorted(set(subtree.values()), reverse=True):
+            level = [node_id for node_id, d in subtree.items() if d == depth]
+            for i in range(0, len(level), _BATCH):
+                self.db.execute(
+                    delete(File).where(File.id.in_(level[i:i + _BATCH]))
+                    .execution_options(synchronize_session=False)
+                )
+        for removed in nodes.values():
+            self.db.expunge(removed)
+        self.deleted.update(subtree)
+        touch_folders(self.db, node.parent_id)
+
+    def _release(self, nodes):
+        """退还已用空间(按上传者和归属方合并)并释放内容引用"""
+        by_uploader, by_owner, by_blob = Counter(), Counter(), Counter()
+        for node in nodes:
+            if node.is_folder:
+                continue
+            owner_type = getattr(node.owner_type, "value", node.owner_type)
+            by_uploader[(node.created_by, owner_type, node.owner_id)] += node.size or 0
+            if node.sha256:
+                by_blob[node.sha256] += 1
+        for (user_id, owner_type, owner_id), size in by_uploader.items():
+            release_storage(self.db, user_id, size, owner_type, owner_id)
+        for sha256, count in by_blob.items():
+            path = release_blob(self.db, sha256, count)
+            if path:
+                self.orphaned_blobs.append((sha256, path))
+
+    def run(self) -> list[BatchItemResult]:
+        results = []
+        for index, op in enumerate(self.operations):
+            try:
+                with self.db.begin_nested():
+                    getattr(self, op.op)(op)
+                results.append(BatchItemResult(index=index, op=op.op, file_id=op.file_id, ok=True))
+            except _Rejected as e:
+                results.append(BatchItemResult(
+                    index=index, op=op.op, file_id=op.file_id, ok=False,
+                    status_code=e.status_code, detail=e.detail
+                ))
+        return results
+
+
+def apply_batch(db: Session, operations: list[BatchOperation], user) -> tuple[list[BatchItemResult], list[tuple[str, str]]]:
+    """
+    执行批量操作但不提交，返回 (逐项结果, 引用归零的内容)
+    单项失败只回滚该项(SAVEPOINT)，其余照常生效；提交后调用 remove_orphaned_blobs 删除内容文件
+    """
+    batch = _Batch(db, operations, user)
+    return batch.run(), batch.orphaned_blobs
+
+
+def remove_orphaned_blobs(db: Session, blobs: list[tuple[str, str]]):
+    for sha256, path in blobs:
+        remove_unreferenced(db, sha256, path)
+        # 封面缩略图可能被其他内容共用，只删除索引
+        for sidecar in (get_peaks_path(sha256), get_ref_path(sha256)):
+            try:
+                os.remove(sidecar)
+            except FileNotFoundError:
+                pass
@@ -2,12 +2,23 @@ import os
 import shutil
 from uuid import uuid4
 from fastapi import UploadFile, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database.models import File, User
+from app.database.models import File, User, Blob, UploadSession
 from app.schemas.file import FileStatus,FileCreate
-from .storage import check_storage_quota, update_storage_usage
-from .permission import check_file_permission
+from .storage import check_storage_quota, charge_storage
+from .permission import check_file_permission, check_file_write_permission
+from .chunk_store import get_chunk_dir, list_chunks
+from . import upload_hash, metadata, chunk_bitmap
+from .upload_session import (
+    get_user_session, get_staging_path, hash_received, release_session, discard_chunks, completing
+)
+from .search_index import index_file
+from .hierarchy import add_node, is_descendant, move_subtree
+from .listing import touch_folders
+from .blob_store import acquire_blob, find_blob, store_blob, get_incoming_path
 import mimetypes 
 
 def sanitize_filename(filename: str) -> str:
@@ -31,88 +42,293 @@ def get_file_storage_path(space_type: str, user_id: int, filename: str) -> str:
 
 def check_chunk(identifier: str, chunk_number: int):
     """检查分片是否存在"""
-    chunk_path = os.path.join(settings.CHUNKTEMP, identifier, str(chunk_number))
+    chunk_path = os.path.join(get_chunk_dir(identifier), str(chunk_number))
     return os.path.exists(chunk_path)
 
+def _append_file(outfile, src_path: str) -> int:
+    """把 src_path 追加到 outfile，优先走内核零拷贝(copy_file_range/sendfile)"""
+    copied = 0
+    with open(src_path, "rb") as infile:
+        size = os.fstat(infile.fileno()).st_size
+        out_fd, in_fd = outfile.fileno(), infile.fileno()
+        try:
+            if hasattr(os, "copy_file_range"):
+                while copied < size:
+                    n = os.copy_file_range(in_fd, out_fd, size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            else:
+                while copied < size:
+                    n = os.sendfile(out_fd, in_fd, copied, size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+        except OSError:
+            # 跨文件系统或不支持时退回普通拷贝
+            infile.seek(copied)
+            shutil.copyfileobj(infile, outfile, 1024 * 1024)
+            outfile.flush()
+            return size
+    return copied
+
+
 def handle_merge_chunks(
     identifier: str,
     filename: str,
     space_type: str,
     parent_id: str,
     db: Session,
-    current_user: User
+    current_user: User,
+    progress=None
 ):
-    """合并分片"""
-    temp_dir = os.path.join(settings.CHUNKTEMP, identifier)
+    """合并分片（在合并队列的工作线程中执行，progress(已完成, 总数) 用于汇报进度）"""
+    temp_dir = get_chunk_dir(identifier)
     if not os.path.exists(temp_dir):
         raise HTTPException(404, "Chunks not found")
 
     # 检查完整性和排序
-    chunks = sorted(os.listdir(temp_dir), key=lambda x: int(x))
-    if len(chunks) != int(len(chunks)):
-        shutil.rmtree(temp_dir)
+    chunk_numbers = list_chunks(temp_dir)
+    if chunk_numbers != list(range(1, len(chunk_numbers) + 1)):
         raise HTTPException(400, "Invalid chunks")
 
-    # 生成最终文件路径
-    file_id = str(uuid4())
-    safe_name = sanitize_filename(filename)
-    final_path = get_file_storage_path(space_type, current_user.id, f"{file_id}_{safe_name}")
-    # 合并文件
-    with open(final_path, "wb") as outfile:
-        for chunk in chunks:
-            with open(os.path.join(temp_dir, chunk), "rb") as infile:
-                outfile.write(infile.read())
-    
+    # 校验服务端增量计算的哈希与客户端声明的 MD5 是否一致
+    digests = upload_hash.finalize(identifier, temp_dir, len(chunk_numbers))
+    if digests is None or digests[0] != identifier.lower():
+        shutil.rmtree(temp_dir)
+        upload_hash.discard(identifier)
+        raise HTTPException(400, "Checksum mismatch")
+    file_size = sum(os.path.getsize(os.path.join(temp_dir, str(n))) for n in chunk_numbers)
+    check_storage_quota(db, current_user.id, file_size, space_type)
+
+    db_file = _store_chunks(
+        db, temp_dir, len(chunk_numbers), digests, file_size,
+        filename, space_type, parent_id, current_user, progress
+    )
+
     # 清理临时目录
     shutil.rmtree(temp_dir)
+    upload_hash.discard(identifier)
+    return db_file
 
-    # 创建数据库记录（与原有逻辑保持一致）
-    file_size = os.path.getsize(final_path)
-    check_storage_quota(db, current_user.id, file_size, space_type)
 
-    db_file = File(
-        id=file_id,
-        name=safe_name,
-        parent_id=parent_id,
-        is_folder=False,
-        owner_type=space_type,
-        owner_id=1 if space_type == 'group' else current_user.id,
-        storage_path=final_path,
-        size=file_size,
-        mime_type=mimetypes.guess_type(filename)[0],
-        status=FileStatus.pending if space_type == 'public' else FileStatus.approved,
-        created_by=current_user.id,
-        md5=identifier
-    )
+def complete_upload_session(db: Session, session_id: str, current_user: User, progress=None):
+    """
+    完成上传会话：位图确认分片齐全后，把已写好的目标文件登记为 Blob，不再拼接分片
+    配额在会话开始时已经计入，这里删除会话记录，使预留在同一事务中转为文件占用
+    """
+    session = get_user_session(db, session_id, current_user)
+    # 完成期间不接受新的分片写入，也不会有写入中的分片
+    with completing(session.id):
+        return _complete_session(db, session, current_user, progress)
+
+
+def _complete_session(db: Session, session: UploadSession, current_user: User, progress=None):
+    bitmap = chunk_bitmap.load(chunk_bitmap.get_bitmap_path(get_chunk_dir(session.id)))
+    if not chunk_bitmap.is_complete(bitmap, session.total_chunks):
+        raise HTTPException(400, "Missing chunks")
+
+    staging_path = get_staging_path(session.id)
+    if not os.path.exists(staging_path):
+        raise HTTPException(404, "Upload data not found")
+    hashed = hash_received(session.id, session.chunk_size, session.total_chunks, session.total_size)
+    md5, sha256 = upload_hash.digests(session.id)
+    if hashed != session.total_chunks or md5 != session.identifier:
+        # 内容与声明不符，整个会话作废并退还配额
+        release_session(db, session)
+        discard_chunks(session.id)
+        raise HTTPException(400, "Checksum mismatch")
 
     try:
+        # 预留的配额随会话删除转为文件占用
+        db.delete(session)
+        blob = store_blob(db, staging_path, sha256, md5, session.total_size)
+        db_file = _new_file_record(blob, session.filename, session.space_type, session.parent_id, current_user)
         db.add(db_file)
+        _register_node(db, db_file)
         db.commit()
-        update_storage_usage(db, current_user.id, file_size, 'add')
     except Exception as e:
-        os.remove(final_path)
+        db.rollback()
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(500, f"Database error: {str(e)}")
+    if progress:
+        progress(session.total_chunks, session.total_chunks)
+    discard_chunks(session.id)
+    return db_file
 
+
+def _store_chunks(
+    db: Session,
+    temp_dir: str,
+    total_chunks: int,
+    digests: tuple[str, str],
+    file_size: int,
+    filename: str,
+    space_type: str,
+    parent_id: str,
+    current_user: User,
+    progress=None
+) -> File:
+    """把分片 1..total_chunks 拼接后登记为 Blob 并创建文件记录"""
+    md5, sha256 = digests
+    staging_path = None
+    try:
+        # 相同内容已存在时直接引用，不再写盘
+        blob = acquire_blob(db, sha256)
+        if not blob:
+            staging_path = get_incoming_path()
+            with open(staging_path, "wb") as outfile:
+                for i in range(1, total_chunks + 1):
+                    _append_file(outfile, os.path.join(temp_dir, str(i)))
+                    if progress:
+                        progress(i, total_chunks)
+
+        # 计数器在拼接完成后才加锁扣减，与文件记录一起提交
+        charge_storage(db, current_user.id, file_size, space_type)
+        if not blob:
+            blob = store_blob(db, staging_path, sha256, md5, file_size)
+
+        db_file = _new_file_record(blob, filename, space_type, parent_id, current_user)
+        db.add(db_file)
+        _register_node(db, db_file)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if staging_path and os.path.exists(staging_path):
+            os.remove(staging_path)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(500, f"Database error: {str(e)}")
     return db_file
 
-def move_file(db: Session, file_id: str, target_parent_id: str, user: User):
+
+async def instant_upload(
+    db: AsyncSession,
+    identifier: str,
+    total_size: int,
+    filename: str,
+    space_type: str,
+    parent_id: str,
+    current_user: User
+):
+    """
+    秒传：用户可见的已审核文件中有相同内容(MD5+大小)时，直接新建引用该 Blob 的文件记录
+    没有可复用的内容时返回 None
+    """
+    blob = await db.run_sync(find_blob, identifier.lower(), total_size, current_user)
+    if not blob:
+        return None
+
+    # 同一请求重试时不重复创建
+    existing = await db.scalar(select(File).where(
+        File.sha256 == blob.sha256,
+        File.parent_id == parent_id,
+        File.name == sanitize_filename(filename),
+        File.created_by == current_user.id
+    ))
+    if existing:
+        return existing
+
+    await db.run_sync(check_storage_quota, current_user.id, blob.size, space_type)
+    try:
+        blob = await db.run_sync(acquire_blob, blob.sha256)
+        if not blob:
+            return None
+        await db.run_sync(charge_storage, current_user.id, blob.size, space_type)
+        db_file = _new_file_record(blob, filename, space_type, parent_id, current_user)
+        db.add(db_file)
+        await db.run_sync(_register_node, db_file)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(500, f"Database error: {str(e)}")
+
+    metadata.submit(db_file.id, db_file.name, db_file.mime_type)
+    return db_file
+
+
+def _new_file_record(blob: Blob, filename: str, space_type: str, parent_id: str, user: User) -> File:
+    return File(
+        id=str(uuid4()),
+        name=sanitize_filename(filename),
+        parent_id=parent_id,
+        is_folder=False,
+        owner_type=space_type,
+        owner_id=1 if space_type == 'group' else user.id,
+        storage_path=blob.storage_path,
+        size=blob.size,
+        mime_type=mimetypes.guess_type(filename)[0],
+        status=FileStatus.pending if space_type == 'public' else FileStatus.approved,
+        created_by=user.id,
+        md5=blob.md5,
+        sha256=blob.sha256
+    )
+
+
+# 闭包表、检索索引和文件夹版本号的维护逻辑与合并线程共用同步实现，
+# 异步路径通过 AsyncSession.run_sync 在异步连接上执行，不阻塞事件循环
+def _register_node(db: Session, node: File):
+    """新节点写入闭包表和检索索引，并递增父文件夹版本号"""
+    add_node(db, node.id, node.parent_id)
+    index_file(db, node)
+    touch_folders(db, node.parent_id)
+
+
+def _relocate_node(db: Session, node: File, target_parent_id: str):
+    touch_folders(db, node.parent_id, target_parent_id)
+    node.parent_id = target_parent_id
+    move_subtree(db, node.id, target_parent_id)
+
+
+def _reindex_node(db: Session, node: File):
+    index_file(db, node)
+    touch_folders(db, node.parent_id)
+
+async def move_file(db: AsyncSession, file_id: str, target_parent_id: str, user: User):
     # 获取文件和目标文件夹
-    file = db.query(File).filter(File.id == file_id).first()
-    target_folder = db.query(File).filter(File.id == target_parent_id, File.is_folder == True).first()
+    file = await db.get(File, file_id)
+    target_folder = await db.scalar(select(File).where(File.id == target_parent_id, File.is_folder == True))
 
     if not file or not target_folder:
         raise HTTPException(status_code=404, detail="File or folder not found")
 
     # 检查权限
-    if not check_file_permission(user, file.owner_type, file.owner_id):
+    if not check_file_write_permission(user, file.owner_type, file.owner_id, file.created_by):
         raise HTTPException(status_code=403, detail="Permission denied")
 
     if not check_file_permission(user, target_folder.owner_type, target_folder.owner_id):
         raise HTTPException(status_code=403, detail="No permission to target folder")
 
+    # 不能移动到自身或自己的子文件夹中
+    if await db.run_sync(is_descendant, file.id, target_folder.id):
+        raise HTTPException(status_code=400, detail="Cannot move a folder into itself or its descendant")
+
     # 更新文件位置
-    file.parent_id = target_parent_id
-    db.commit()
+    await db.run_sync(_relocate_node, file, target_parent_id)
+    await db.commit()
+    await db.refresh(file)
+    return file
+
+async def rename_file(db: AsyncSession, file_id: str, new_name: str, user: User) -> File:
+    """重命名文件或文件夹，并同步更新检索索引"""
+    file = await db.get(File, file_id)
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    if not check_file_write_permission(user, file.owner_type, file.owner_id, file.created_by):
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    name = new_name.strip() if file.is_folder else sanitize_filename(new_name).strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Invalid name")
+
+    file.name = name
+    await db.run_sync(_reindex_node, file)
+    await db.commit()
+    await db.refresh(file)
     return file
 
 from enum import Enum
@@ -121,8 +337,8 @@ class FileStatus(str, Enum):
     approved = "approved"
     rejected = "rejected"
 
-def create_folder(
-    db: Session,
+async def create_folder(
+    db: AsyncSession,
     folder_data: FileCreate,
     user: User
 ) -> File:
@@ -135,7 +351,7 @@ def create_folder(
     
     # 检查父文件夹权限
     if folder_data.parent_id:
-        parent = db.query(File).filter(File.id == folder_data.parent_id).first()
+        parent = await db.get(File, folder_data.parent_id)
         if not parent or not parent.is_folder:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -166,10 +382,12 @@ def create_folder(
     
     try:
         db.add(folder)
-        db.commit()
+        await db.run_sync(_register_node, folder)
+        await db.commit()
+        await db.refresh(folder)
         return folder
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create folder: {str(e)}"
@@ -0,0 +1,99 @@
+from sqlalchemy import select, delete, func, literal, case, true
+from sqlalchemy.orm import Session, aliased, join
+from app.database.models import File, FileClosure
+
+_BATCH = 1000
+
+
+def add_node(db: Session, file_id: str, parent_id: str | None):
+    """新节点：自身一行，再继承父节点的全部祖先，随调用方的事务提交"""
+    db.flush()
+    db.add(FileClosure(ancestor_id=file_id, descendant_id=file_id, depth=0))
+    db.flush()
+    if parent_id:
+        db.execute(
+            FileClosure.__table__.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(FileClosure.ancestor_id, literal(file_id), FileClosure.depth + 1)
+                .where(FileClosure.descendant_id == parent_id)
+            )
+        )
+
+
+def is_descendant(db: Session, ancestor_id: str, node_id: str) -> bool:
+    """node_id 是否在 ancestor_id 的子树中（含自身）"""
+    return db.query(FileClosure).filter(
+        FileClosure.ancestor_id == ancestor_id,
+        FileClosure.descendant_id == node_id
+    ).first() is not None
+
+
+def move_subtree(db: Session, node_id: str, new_parent_id: str | None):
+    """
+    把 node_id 整棵子树挂到 new_parent_id 下：
+    删除子树与旧祖先之间的路径，再用新父节点的祖先 x 子树 生成新路径
+    """
+    subtree = [
+        row[0] for row in db.query(FileClosure.descendant_id).filter(FileClosure.ancestor_id == node_id)
+    ]
+    old_ancestors = [
+        row[0] for row in db.query(FileClosure.ancestor_id).filter(
+            FileClosure.descendant_id == node_id,
+            FileClosure.depth > 0
+        )
+    ]
+    if old_ancestors:
+        for i in range(0, len(subtree), _BATCH):
+            db.execute(delete(FileClosure).where(
+                FileClosure.ancestor_id.in_(old_ancestors),
+                FileClosure.descendant_id.in_(subtree[i:i + _BATCH])
+            ))
+
+    if new_parent_id:
+        above = aliased(FileClosure)
+        below = aliased(FileClosure)
+        db.execute(
+            FileClosure.__table__.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+                .select_from(join(above, below, true()))
+                .where(above.descendant_id == new_parent_id, below.ancestor_id == node_id)
+            )
+        )
+
+
+def ancestors(db: Session, node_id: str) -> list[File]:
+    """从根到当前节点的路径（面包屑），一次查询"""
+    return db.query(File).join(
+        FileClosure, FileClosure.ancestor_id == File.id
+    ).filter(
+        FileClosure.descendant_id == node_id
+    ).order_by(FileClosure.depth.desc()).all()
+
+
+def descendants_query(db: Session, node_id: str, max_depth: int | None = None):
+    """子树中的全部节点（不含自身），调用方可继续追加过滤条件"""
+    query = db.query(File).join(
+        FileClosure, FileClosure.descendant_id == File.id
+    ).filter(
+        FileClosure.ancestor_id == node_id,
+        FileClosure.depth > 0
+    )
+    if max_depth is not None:
+        query = query.filter(FileClosure.depth <= max_depth)
+    return query
+
+
+def subtree_usage(db: Session, node_id: str) -> tuple[int, int, int]:
+    """子树的 (总大小, 文件数, 文件夹数)，一次聚合查询"""
+    size, files, folders = db.query(
+        func.coalesce(func.sum(File.size), 0),
+        func.coalesce(func.sum(case((File.is_folder == False, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((File.is_folder == True, 1), else_=0)), 0)
+    ).join(
+        FileClosure, FileClosure.descendant_id == File.id
+    ).filter(
+        FileClosure.ancestor_id == node_id,
+        FileClosure.depth > 0
+    ).one()
+    return int(size), int(files), int(folders)
@@ -0,0 +1,170 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import select, tuple_, update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import File, FolderVersion, OwnerType
+from app.schemas.file import FileStatus
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# 列表只取 FileOut 需要的列，逐行转成 dict，不构造 ORM 对象和 Pydantic 模型
+LIST_COLUMNS = (
+    File.id, File.name, File.parent_id, File.is_folder, File.owner_type, File.owner_id,
+    File.size, File.mime_type, File.status, File.created_at, File.updated_at, File.created_by,
+)
+SORT_COLUMNS = {
+    "name": File.name,
+    "size": File.size,
+    "created_at": File.created_at,
+}
+STREAM_BATCH = 500
+
+
+def row_to_dict(row) -> dict:
+    item = dict(row._mapping)
+    item["owner_type"] = getattr(item["owner_type"], "value", item["owner_type"])
+    item["status"] = getattr(item["status"], "value", item["status"])
+    for key in ("created_at", "updated_at"):
+        if item[key] is not None:
+            item[key] = item[key].isoformat()
+    return item
+
+
+def dumps(item: dict) -> str:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+
+
+def children_query(parent_id: str, sort: str, order: str, cursor: str | None):
+    """子项查询：按 (排序列, id) 键集分页，排序稳定且不依赖 OFFSET"""
+    column = SORT_COLUMNS[sort]
+    stmt = select(*LIST_COLUMNS).where(
+        File.parent_id == parent_id,
+        File.status == FileStatus.approved
+    )
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise ValueError("Invalid cursor")
+        value, last_id = values
+        if sort == "created_at" and value is not None:
+            value = datetime.fromisoformat(value)
+        key = tuple_(column, File.id)
+        stmt = stmt.where(key > tuple_(value, last_id) if order == "asc" else key < tuple_(value, last_id))
+
+    if order == "asc":
+        return stmt.order_by(column.asc(), File.id.asc())
+    return stmt.order_by(column.desc(), File.id.desc())
+
+
+def next_cursor(item: dict, sort: str) -> str:
+    return encode_cursor([item[sort], item["id"]])
+
+
+def fetch_page(db, stmt, limit: int, sort: str) -> tuple[list[dict], str | None]:
+    """多取一行判断是否还有下一页"""
+    rows = [row_to_dict(row) for row in db.execute(stmt.limit(limit + 1))]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, next_cursor(rows[-1], sort)
+    return rows, None
+
+
+def stream_rows(stmt, ndjson: bool):
+    """
+    从数据库游标逐批读取并逐行输出，内存占用与目录大小无关
+    请求的会话在响应开始前就已关闭，这里使用独立会话
+    同步生成器，由 Starlette 放到线程池中迭代
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=STREAM_BATCH))
+        if ndjson:
+            for row in result:
+                yield dumps(row_to_dict(row)) + "\n"
+        else:
+            yield "["
+            first = True
+            for row in result:
+                yield ("" if first else ",") + dumps(row_to_dict(row))
+                first = False
+            yield "]"
+    finally:
+        db.close()
+
+
+ROOT_KEY = "root"
+
+
+def touch_folders(db, *folder_ids):
+    """子项变化后递增所在文件夹的版本号（None 表示根目录），随调用方的事务提交"""
+    for key in sorted({folder_id or ROOT_KEY for folder_id in folder_ids}):
+        stmt = update(FolderVersion).where(FolderVersion.folder_id == key).values(version=FolderVersion.version + 1)
+        if db.execute(stmt).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.add(FolderVersion(folder_id=key, version=1))
+        except IntegrityError:
+            # 并发插入了同一行，改为递增
+            db.execute(stmt)
+
+
+def get_folder_version(db, folder_id: str | None) -> int:
+    version = db.query(FolderVersion.version).filter(FolderVersion.folder_id == (folder_id or ROOT_KEY)).scalar()
+    return version or 0
+
+
+class ListingCache:
+    """
+    进程内 LRU 缓存，键中包含文件夹版本号，版本变化后旧条目自然失效
+    多进程部署时各进程独立缓存，版本号从数据库读取，不会读到过期内容
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+
+listing_cache = ListingCache(settings.LISTING_CACHE_SIZE)
+
+
+def root_query(user):
+    """根目录视图一次查询：公共、社团(成员/管理员)和本人的个人文件夹"""
+    conditions = [
+        File.owner_type == OwnerType.public,
+        and_(File.owner_type == OwnerType.user, File.owner_id == user.id),
+    ]
+    if user.role in ("member", "admin"):
+        conditions.append(File.owner_type == OwnerType.group)
+    return select(*LIST_COLUMNS).where(
+        File.parent_id.is_(None),
+        File.status == FileStatus.approved,
+        or_(*conditions)
+    ).order_by(File.created_at, File.id)
+
+
+def root_rows(db, user) -> list[dict]:
+    """每种空间只保留一个根文件夹，顺序为 公共 / 社团 / 个人"""
+    first = {}
+    for row in db.execute(root_query(user)):
+        item = row_to_dict(row)
+        first.setdefault(item["owner_type"], item)
+    return [first[t.value] for t in (OwnerType.public, OwnerType.group, OwnerType.user) if t.value in first]
@@ -0,0 +1,176 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+from fastapi import HTTPException, status
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import User
+from app.services import waveform, metadata, cover_art
+
+logger = logging.getLogger(__name__)
+
+
+class MergeJob:
+    """一次分片合并任务的状态"""
+
+    def __init__(self, identifier: str, filename: str, space_type: str, parent_id: str, user_id: int,
+                 session_id: str | None = None):
+        self.id = str(uuid4())
+        self.identifier = identifier
+        self.filename = filename
+        self.space_type = space_type
+        self.parent_id = parent_id
+        self.user_id = user_id
+        self.session_id = session_id  # 通过上传会话提交时使用会话的分片和预留配额
+        self.status = "queued"  # queued / running / done / failed
+        self.progress = 0.0
+        self.file_id = None
+        self.error = None
+        self.error_code = None
+        self.finished_at = None
+
+    def set_progress(self, done: int, total: int):
+        self.progress = round(done / total, 4) if total else 1.0
+
+    @property
+    def key(self) -> tuple[int, str]:
+        return self.user_id, self.session_id or self.identifier
+
+
+class MergeQueue:
+    """有界合并队列 + 固定数量的工作线程，合并不再占用事件循环"""
+
+    def __init__(self, workers: int, maxsize: int):
+        self._workers = workers
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._jobs: dict[str, MergeJob] = {}
+        self._active: dict[tuple[int, str], str] = {}  # (user_id, 会话ID或identifier) -> job_id
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self._workers):
+                t = threading.Thread(target=self._run, name=f"merge-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def shutdown(self):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for t in threads:
+            t.join(timeout=5)
+
+    def submit(self, job: MergeJob) -> MergeJob:
+        self.start()
+        with self._lock:
+            self._prune()
+            # 同一文件重复提交时直接返回已有任务
+            existing = self._active.get(job.key)
+            if existing:
+                return self._jobs[existing]
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Merge queue is full, retry later"
+                )
+            self._jobs[job.id] = job
+            self._active[job.key] = job.id
+        return job
+
+    def get(self, job_id: str) -> MergeJob | None:
+        return self._jobs.get(job_id)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def counts(self) -> Counter:
+        """按状态统计仍在保留期内的任务数"""
+        with self._lock:
+            return Counter(job.status for job in self._jobs.values())
+
+    def active_uploads(self) -> set[str]:
+        """排队或正在合并的分片目录名(会话ID或identifier)，这些目录不能回收"""
+        with self._lock:
+            return {key[1] for key in self._active}
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at and now - job.finished_at > settings.MERGE_JOB_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            try:
+                self._execute(job)
+            finally:
+                with self._lock:
+                    self._active.pop(job.key, None)
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    def _execute(self, job: MergeJob):
+        # 延迟导入，避免与 file_service 循环依赖
+        from app.services.file_service import handle_merge_chunks, complete_upload_session
+
+        job.status = "running"
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.id == job.user_id).first()
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+            if job.session_id:
+                db_file = complete_upload_session(db, job.session_id, user, progress=job.set_progress)
+            else:
+                db_file = handle_merge_chunks(
+                    job.identifier, job.filename, job.space_type, job.parent_id,
+                    db, user, progress=job.set_progress
+                )
+            job.file_id = db_file.id
+            job.progress = 1.0
+            job.status = "done"
+        except HTTPException as e:
+            db.rollback()
+            job.status = "failed"
+            job.error_code = e.status_code
+            job.error = e.detail
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error_code = 500
+            job.error = str(e)
+        else:
+            try:
+                self._after_merge(db_file)
+            except Exception:
+                # 文件已经提交，后续处理(如关闭期间线程池拒绝任务)失败只记录日志，不改变任务状态
+                logger.exception("Post-merge processing failed for file %s", db_file.id)
+        finally:
+            db.close()
+
+    def _after_merge(self, db_file):
+        """合并成功后的后续处理，均在各自的线程池中异步执行"""
+        if db_file.sha256 and waveform.is_waveform_candidate(db_file.name, db_file.mime_type):
+            waveform.submit(db_file.sha256, db_file.storage_path)
+        if db_file.sha256 and metadata.is_audio_candidate(db_file.name, db_file.mime_type):
+            cover_art.submit(db_file.sha256, db_file.storage_path)
+        metadata.submit(db_file.id, db_file.name, db_file.mime_type)
+
+
+merge_queue = MergeQueue(settings.MERGE_WORKERS, settings.MERGE_QUEUE_SIZE)
@@ -0,0 +1,129 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import mutagen
+from mutagen.id3 import ID3
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import File, TrackMetadata
+from app.services.search_index import index_file
+
+AUDIO_EXTENSIONS = (".mp3", ".flac", ".ogg", ".oga", ".opus", ".m4a", ".wav", ".aif", ".aiff", ".wma", ".ape", ".wv")
+
+_executor = ThreadPoolExecutor(max_workers=settings.METADATA_WORKERS, thread_name_prefix="metadata")
+
+
+def is_audio_candidate(name: str, mime_type: str | None) -> bool:
+    return (mime_type or "").startswith("audio/") or name.lower().endswith(AUDIO_EXTENSIONS)
+
+
+# WAV/AIFF 等容器中的 ID3 标签不经过 easy 映射，按帧 ID 取值
+_ID3_FRAMES = {
+    "title": "TIT2",
+    "artist": "TPE1",
+    "albumartist": "TPE2",
+    "album": "TALB",
+    "genre": "TCON",
+    "tracknumber": "TRCK",
+    "discnumber": "TPOS",
+    "date": "TDRC",
+}
+
+
+def _normalize(tags) -> dict:
+    if isinstance(tags, ID3):
+        return {
+            key: tags[frame].text
+            for key, frame in _ID3_FRAMES.items()
+            if frame in tags
+        }
+    return tags
+
+
+def _first(tags, key: str, limit: int = 255) -> str | None:
+    values = tags.get(key) if tags else None
+    if not values:
+        return None
+    value = str(values[0]).strip()
+    return value[:limit] or None
+
+
+def _number(tags, key: str) -> int | None:
+    """'3/12' -> 3, '2001-05-01' -> 2001"""
+    value = _first(tags, key)
+    match = re.match(r"\d+", value) if value else None
+    return int(match.group()) if match else None
+
+
+def extract_tags(path: str) -> dict | None:
+    """
+    解析 ID3v2 / Vorbis Comment / FLAC 等标签与时长
+    无法识别的格式返回 None；模块级函数，可在进程池中调用
+    """
+    try:
+        audio = mutagen.File(path, easy=True)
+    except (mutagen.MutagenError, OSError, ValueError):
+        return None
+    if audio is None:
+        return None
+
+    tags = _normalize(audio.tags)
+    info = audio.info
+    return {
+        "title": _first(tags, "title"),
+        "artist": _first(tags, "artist"),
+        "album_artist": _first(tags, "albumartist"),
+        "album": _first(tags, "album"),
+        "genre": _first(tags, "genre", 100),
+        "track_number": _number(tags, "tracknumber"),
+        "disc_number": _number(tags, "discnumber"),
+        "year": _number(tags, "date"),
+        "duration": getattr(info, "length", None),
+        "bitrate": getattr(info, "bitrate", None) or None,
+        "sample_rate": getattr(info, "sample_rate", None),
+        "channels": getattr(info, "channels", None),
+    }
+
+
+def save_metadata(db, file: File, tags: dict | None):
+    """写入(或覆盖)文件的曲目信息，调用方负责提交"""
+    if tags is None:
+        return None
+    return db.merge(TrackMetadata(file_id=file.id, **tags))
+
+
+def process_file(file_id: str):
+    """解析单个文件的标签；相同内容已解析过时直接复制结果"""
+    db = SessionLocal()
+    try:
+        file = db.query(File).filter(File.id == file_id).first()
+        if not file or file.is_folder:
+            return
+
+        tags = None
+        if file.sha256:
+            sibling = db.query(TrackMetadata).join(File).filter(
+                File.sha256 == file.sha256,
+                File.id != file.id
+            ).first()
+            if sibling:
+                tags = {
+                    column.name: getattr(sibling, column.name)
+                    for column in TrackMetadata.__table__.columns
+                    if column.name not in ("file_id", "extracted_at")
+                }
+        if tags is None and os.path.exists(file.storage_path):
+            tags = extract_tags(file.storage_path)
+
+        track = save_metadata(db, file, tags)
+        if track is not None:
+            index_file(db, file, track)
+            db.commit()
+    finally:
+        db.close()
+
+
+def submit(file_id: str, name: str, mime_type: str | None):
+    """在后台线程池中解析标签，不阻塞请求处理"""
+    if is_audio_candidate(name, mime_type):
+        _executor.submit(process_file, file_id)
@@ -0,0 +1,202 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+# 进程内的 Prometheus 文本格式指标；多 worker 部署时每个进程各自暴露、由 Prometheus 汇总
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+UNMATCHED_ROUTE = "<unmatched>"  # 未匹配到路由的请求归为一类，避免任意路径撑爆标签数
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class HttpMetrics:
+    """按 (方法, 路由模板) 记录请求数、状态码、延迟直方图和收发字节数"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._requests = defaultdict(int)  # (method, route, status) -> 次数
+        self._histograms: dict[tuple, list] = {}  # (method, route) -> [各桶计数..., 总和]
+        self._received = defaultdict(int)
+        self._sent = defaultdict(int)
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(self, method: str, route: str, status: int, seconds: float, received: int, sent: int):
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            self._requests[(method, route, status)] += 1
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self._buckets) + 1) + [0.0]
+            # 只累加落入的桶，输出时再求累计值
+            histogram[bisect.bisect_left(self._buckets, seconds)] += 1
+            histogram[-1] += seconds
+            self._received[key] += received
+            self._sent[key] += sent
+
+    def render(self) -> list[str]:
+        with self._lock:
+            requests = dict(self._requests)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+            received, sent = dict(self._received), dict(self._sent)
+            in_flight = self.in_flight
+
+        lines = [
+            "# HELP cms_http_requests_in_flight Requests currently being served",
+            "# TYPE cms_http_requests_in_flight gauge",
+            f"cms_http_requests_in_flight {in_flight}",
+            "# HELP cms_http_requests_total Completed requests by route and status",
+            "# TYPE cms_http_requests_total counter",
+        ]
+        for key, count in sorted(requests.items()):
+            lines.append(f"cms_http_requests_total{_labels(('method', 'route', 'status'), key)} {count}")
+
+        lines += [
+            "# HELP cms_http_request_duration_seconds Time until the last response byte was sent",
+            "# TYPE cms_http_request_duration_seconds histogram",
+        ]
+        names = ("method", "route")
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), histogram):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"cms_http_request_duration_seconds_bucket{_labels(names, key, le)} {cumulative}")
+            lines.append(f"cms_http_request_duration_seconds_sum{_labels(names, key)} {histogram[-1]!r}")
+            lines.append(f"cms_http_request_duration_seconds_count{_labels(names, key)} {cumulative}")
+
+        for name, help_text, values in (
+            ("cms_http_request_bytes_total", "Request body bytes received", received),
+            ("cms_http_response_bytes_total", "Response body bytes sent", sent),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for key, value in sorted(values.items()):
+                lines.append(f"{name}{_labels(names, key)} {value}")
+        return lines
+
+
+http_metrics = HttpMetrics()
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件：包装 receive/send 统计字节数，不缓冲请求体和流式响应
+    路由标签取 FastAPI 匹配后写入 scope 的路由模板，如 /files/download/{file_id}
+    """
+
+    def __init__(self, app, metrics: HttpMetrics = http_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        received = sent = 0
+        status = 500
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal sent, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.started()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.metrics.finished(
+                scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status,
+                time.perf_counter() - start, received, sent
+            )
+
+
+def _gauge(name: str, help_text: str, samples: list[tuple[str, float]]) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{labels} {_number(value)}" for labels, value in samples]
+    return lines
+
+
+def _pool_samples(engines: dict) -> dict[str, list]:
+    """QueuePool 的连接数；NullPool/StaticPool 等没有这些计数的连接池跳过"""
+    samples = defaultdict(list)
+    for engine_name, engine in engines.items():
+        pool = engine.pool
+        labels = _labels(("engine",), (engine_name,))
+        for metric, attr in (("size", "size"), ("checked_out", "checkedout"),
+                             ("checked_in", "checkedin"), ("overflow", "overflow")):
+            getter = getattr(pool, attr, None)
+            if getter is not None:
+                samples[metric].append((labels, getter()))
+    return samples
+
+
+def render() -> str:
+    """/metrics 的完整输出，后台服务的计数在抓取时读取"""
+    # 延迟导入，避免与各服务模块循环依赖
+    from app.database import engine, async_engine
+    from app.services.chunk_gc import chunk_sweeper
+    from app.services.merge_queue import merge_queue
+    from app.services.moderation import file_mover
+
+    lines = http_metrics.render()
+
+    chunk = chunk_sweeper.stats()
+    lines += _gauge("cms_chunk_store_live_uploads", "Unfinished uploads holding chunk storage",
+                    [("", chunk["live_uploads"])])
+    lines += _gauge("cms_chunk_store_live_bytes", "Bytes held by unfinished uploads", [("", chunk["live_bytes"])])
+    lines += _gauge("cms_chunk_store_skipped_active", "Uploads the last chunk sweep left alone because they were merging",
+                    [("", chunk["skipped_active"])])
+    lines += _gauge("cms_chunk_store_reclaimed_bytes", "Bytes reclaimed by the chunk sweeper since start",
+                    [("", chunk["reclaimed_bytes"])])
+    lines += _gauge("cms_chunk_store_reclaimed_uploads", "Uploads reclaimed by the chunk sweeper since start",
+                    [("", chunk["reclaimed_uploads"])])
+    lines += _gauge("cms_chunk_store_last_sweep_timestamp_seconds", "Unix time of the last chunk sweep",
+                    [("", chunk["last_sweep"] or 0)])
+
+    lines += _gauge("cms_merge_queue_pending", "Merge jobs waiting for a worker", [("", merge_queue.pending())])
+    lines += _gauge("cms_merge_jobs", "Tracked merge jobs by status", [
+        (_labels(("status",), (job_status,)), count) for job_status, count in sorted(merge_queue.counts().items())
+    ])
+    lines += _gauge("cms_moderation_moves_pending", "Approved files waiting to be moved", [("", file_mover.pending())])
+
+    pools = _pool_samples({"sync": engine, "async": async_engine.sync_engine})
+    for metric, help_text in (("size", "Configured pool size"), ("checked_out", "Connections in use"),
+                              ("checked_in", "Idle connections in the pool"),
+                              ("overflow", "Connections above pool size")):
+        if pools.get(metric):
+            lines += _gauge(f"cms_db_pool_{metric}", help_text, pools[metric])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,119 @@
+import errno
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import File
+from app.schemas.file import FileStatus
+from .listing import touch_folders
+
+logger = logging.getLogger(__name__)
+
+
+def relocation_target(storage_path: str) -> str | None:
+    """
+    审核通过后需要搬到正式目录的路径(旧版按 temp/approved 目录存放的文件)
+    按内容寻址存放的 Blob 被多个文件共享，位置不随审核状态变化，返回 None
+    """
+    if "/temp/" not in storage_path:
+        return None
+    return storage_path.replace("/temp/", "/approved/")
+
+
+def _copy_into_place(src: str, dest: str):
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    try:
+        os.link(src, dest)
+        return
+    except FileExistsError:
+        return
+    except OSError as e:
+        # 跨文件系统时只能复制
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+    tmp = f"{dest}.{uuid4().hex[:8]}.part"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class FileMover:
+    """
+    在固定数量的后台线程中搬移审核通过的文件，不占用事件循环
+    先在新位置生成完整文件，再更新 storage_path，最后删除旧文件，搬移过程中下载不会中断
+    """
+
+    def __init__(self, workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-mover")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, src: str, dest: str):
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._move, src, dest)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _move(self, src: str, dest: str):
+        db = SessionLocal()
+        try:
+            if not os.path.exists(src):
+                return
+            _copy_into_place(src, dest)
+            db.execute(
+                update(File).where(File.storage_path == src).values(storage_path=dest)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            os.remove(src)
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to relocate %s", src)
+        finally:
+            db.close()
+            with self._lock:
+                self._pending -= 1
+
+
+file_mover = FileMover(settings.MODERATION_MOVE_WORKERS)
+
+
+def set_status(db: Session, file_ids: list[str], status: FileStatus) -> tuple[list[str], list[tuple[str, str]]]:
+    """
+    把仍在待审核状态的文件一次性改为 status，随调用方的事务提交
+    返回 (实际更新的ID, 需要搬移的 [(旧路径, 新路径)])；其余ID(不存在或已处理)被跳过
+    """
+    rows = db.execute(
+        select(File.id, File.parent_id, File.storage_path)
+        .where(File.id.in_(file_ids), File.status == FileStatus.pending)
+        .with_for_update()
+    ).all()
+    if not rows:
+        return [], []
+
+    ids = [row.id for row in rows]
+    db.execute(
+        update(File)
+        .where(File.id.in_(ids), File.status == FileStatus.pending)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    touch_folders(db, *{row.parent_id for row in rows})
+
+    moves = []
+    if status == FileStatus.approved:
+        for row in rows:
+            dest = relocation_target(row.storage_path)
+            if dest and (row.storage_path, dest) not in moves:
+                moves.append((row.storage_path, dest))
+    return ids, moves
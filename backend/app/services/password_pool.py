@@ -0,0 +1,52 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from app.config import settings
+from app.utils import security
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_semaphore: asyncio.Semaphore | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # 服务进程里已有合并/解析等线程，用 spawn 避免 fork 继承被占用的锁
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_CONCURRENCY)
+    return _semaphore
+
+
+async def _run(func, *args):
+    """bcrypt 在独立进程中计算；超过并发上限的请求在事件循环上等待，不占用线程池"""
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(security.get_password_hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(security.verify_password, plain_password, hashed_password)
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,6 @@
 from fastapi import HTTPException, status
-from app.database.models import User
+from sqlalchemy import and_, or_, true
+from app.database.models import User, File
 
 def check_admin(user: User):
     if user.role != 'admin':
@@ -25,4 +26,32 @@ def check_file_permission(user: User, file_owner_type: str, file_owner_id: int):
     if file_owner_type == 'public' and user.is_active:
         return True
     
-    return False
\ No newline at end of file
+    return False
+
+def check_file_write_permission(user: User, file_owner_type: str, file_owner_id: int, created_by: int | None):
+    """移动、重命名、删除：公共文件对所有人可读，但只有上传者和管理员可以修改"""
+    if user.role == 'admin':
+        return True
+
+    if file_owner_type == 'user' and file_owner_id == user.id:
+        return True
+
+    if file_owner_type == 'group' and user.role == 'member':
+        return True
+
+    if file_owner_type == 'public' and user.is_active and created_by == user.id:
+        return True
+
+    return False
+
+def visible_files_filter(user: User):
+    """check_file_permission 的 SQL 版本，用于在查询中直接过滤无权限的文件"""
+    if user.role == 'admin':
+        return true()
+
+    conditions = [and_(File.owner_type == 'user', File.owner_id == user.id)]
+    if user.role == 'member':
+        conditions.append(File.owner_type == 'group')
+    if user.is_active:
+        conditions.append(File.owner_type == 'public')
+    return or_(*conditions)
@@ -0,0 +1,42 @@
+import logging
+from app.config import settings
+from app.database import profiling
+from app.services.metrics import UNMATCHED_ROUTE
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilerMiddleware:
+    """
+    为每个请求建立查询统计，结束时对重复的 SELECT 记录 N+1 警告
+    QUERY_DEBUG_HEADER 开启时在响应头 X-Query-Stats 中返回统计；
+    响应头在开始发送响应时确定，流式响应后续产生的查询只计入日志
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = profiling.start_request()
+        threshold = settings.REPEATED_QUERY_THRESHOLD
+
+        async def send_wrapper(message):
+            if settings.QUERY_DEBUG_HEADER and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-stats", stats.header(threshold).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiling.end_request(token)
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            for shape, count in stats.repeated(threshold):
+                logger.warning(
+                    "Possible N+1 in %s %s: %d identical queries: %s", scope["method"], route, count, shape
+                )
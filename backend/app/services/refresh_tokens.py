@@ -0,0 +1,93 @@
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from sqlalchemy import update, delete
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.models import RefreshToken, User
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def _invalid_token():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def issue_refresh_token(db: Session, user_id: int, family_id: str | None = None) -> str:
+    """签发新的刷新令牌，调用方负责提交"""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=_digest(token),
+        family_id=family_id or secrets.token_hex(16),
+        user_id=user_id,
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        revoked=False
+    ))
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> tuple[User, str]:
+    """
+    作废旧令牌并签发同一 family 的新令牌，返回 (用户, 新令牌)
+    作废用条件 UPDATE 完成，同一令牌并发刷新时只有一个请求成功
+    """
+    digest = _digest(token)
+    now = datetime.utcnow()
+    result = db.execute(
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == digest,
+            RefreshToken.revoked == False,
+            RefreshToken.expires_at > now
+        )
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    )
+    record = db.query(RefreshToken).filter(RefreshToken.token_hash == digest).first()
+    if result.rowcount == 0:
+        if record is not None and record.revoked and record.expires_at > now:
+            # 已用过的令牌被重放，视为泄露，作废整个 family
+            revoke_family(db, record.family_id)
+            db.commit()
+        raise _invalid_token()
+
+    user = db.query(User).filter(User.id == record.user_id).first()
+    if user is None or not user.is_active:
+        db.rollback()
+        raise _invalid_token()
+    new_token = issue_refresh_token(db, user.id, record.family_id)
+    db.commit()
+    return user, new_token
+
+
+def revoke_family(db: Session, family_id: str):
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id)
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def revoke_refresh_token(db: Session, token: str):
+    """注销：作废该令牌所在的整个 family"""
+    record = db.query(RefreshToken).filter(RefreshToken.token_hash == _digest(token)).first()
+    if record is not None:
+        revoke_family(db, record.family_id)
+        db.commit()
+
+
+def purge_expired(db: Session, user_id: int):
+    """清理用户已过期的令牌，作废记录保留到过期以便识别重放"""
+    db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.expires_at <= datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,96 @@
+import re
+import unicodedata
+from sqlalchemy import select, func, delete
+from sqlalchemy.orm import Session
+from app.database.models import File, TrackMetadata, SearchDocument, SearchTrigram
+
+_SPACES = re.compile(r"\s+")
+_TAG_FIELDS = ("title", "artist", "album_artist", "album", "genre")
+
+
+def normalize(text: str) -> str:
+    """NFKC + casefold，并压缩空白"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def trigrams(text: str) -> set[bytes]:
+    """首尾各补一个空格，这样任意 1~2 个字符的查询都是某个三元组的前缀"""
+    padded = f" {text} "
+    return {padded[i:i + 3].encode() for i in range(len(padded) - 2)}
+
+
+def _document(file: File, track: TrackMetadata | None) -> str:
+    parts = [file.name]
+    if track is not None:
+        parts.extend(getattr(track, field) for field in _TAG_FIELDS if getattr(track, field))
+    return normalize(" ".join(parts))
+
+
+def index_file(db: Session, file: File, track: TrackMetadata | None = None):
+    """
+    增量更新单个文件的索引（文件名 + 曲目标签），随调用方的事务提交
+    track 为空时从数据库读取
+    """
+    db.flush()  # 先写入 File，三元组外键依赖它
+    if track is None:
+        track = db.query(TrackMetadata).filter(TrackMetadata.file_id == file.id).first()
+    content = _document(file, track)
+
+    db.execute(delete(SearchTrigram).where(SearchTrigram.file_id == file.id))
+    db.merge(SearchDocument(file_id=file.id, content=content))
+    grams = trigrams(content)
+    if grams:
+        db.execute(
+            SearchTrigram.__table__.insert(),
+            [{"trigram": gram, "file_id": file.id} for gram in grams]
+        )
+
+
+def remove_file(db: Session, file_id: str):
+    db.execute(delete(SearchTrigram).where(SearchTrigram.file_id == file_id))
+    db.execute(delete(SearchDocument).where(SearchDocument.file_id == file_id))
+
+
+def remove_files(db: Session, file_ids: list[str]):
+    db.execute(delete(SearchTrigram).where(SearchTrigram.file_id.in_(file_ids)))
+    db.execute(delete(SearchDocument).where(SearchDocument.file_id.in_(file_ids)))
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def candidate_ids(query: str):
+    """
+    返回包含查询全部三元组的 file_id 子查询
+    少于 3 个字符时按三元组前缀做范围扫描
+    """
+    if len(query) >= 3:
+        grams = {query[i:i + 3].encode() for i in range(len(query) - 2)}
+        return (
+            select(SearchTrigram.file_id)
+            .where(SearchTrigram.trigram.in_(grams))
+            .group_by(SearchTrigram.file_id)
+            .having(func.count() == len(grams))
+        )
+    # UTF-8 中不会出现 0xFF，前缀 p 的范围是 [p, p + 0xFF)
+    prefix = query.encode()
+    return (
+        select(SearchTrigram.file_id)
+        .where(SearchTrigram.trigram >= prefix, SearchTrigram.trigram < prefix + b"\xff")
+        .distinct()
+    )
+
+
+def content_matches(query: str):
+    """对候选做最终校验，排除三元组都命中但不连续的情况"""
+    return SearchDocument.content.like(f"%{_escape_like(query)}%", escape="\\")
+
+
+def search_filters(query: str, max_terms: int = 8) -> list:
+    """按空格拆分查询词，每个词都需命中（AND），返回可直接用于 filter 的条件"""
+    conditions = []
+    for term in query.split(" ")[:max_terms]:
+        conditions.append(File.id.in_(candidate_ids(term)))
+        conditions.append(content_matches(term))
+    return conditions
@@ -1,61 +1,258 @@
+import logging
+import threading
+from collections import Counter
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database.models import User, StorageQuota, File
-from app.dependencies import get_db
+from sqlalchemy import func, select, update, case
+from sqlalchemy.exc import IntegrityError
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import User, StorageQuota, StorageUsage, File, UploadSession
+from .blob_store import sweep_unregistered
+
+logger = logging.getLogger(__name__)
+
+GROUP_OWNER_ID = 1  # 固定社团ID
+
+
+def _owner_id(owner_type: str, user_id: int) -> int:
+    return GROUP_OWNER_ID if owner_type == 'group' else user_id
+
+
+def _group_limit(db: Session) -> int | None:
+    return db.query(StorageQuota.quota_limit).filter(StorageQuota.quota_type == 'group').scalar()
+
+
+def _personal_exceeded(user: User | None):
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Personal storage quota exceeded (Used: {user.used_storage}/{user.storage_quota} bytes)"
+    )
+
+
+def _group_exceeded(used: int, limit: int):
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Group storage quota exceeded (Used: {used}/{limit} bytes)"
+    )
+
 
 def check_storage_quota(db: Session, user_id: int, file_size: int, owner_type: str):
     """
-    检查用户和社团的存储配额
+    检查用户和社团的存储配额(只读计数器，用于合并前尽早失败)
+    真正的扣减由 charge_storage 在写入文件记录的事务中原子完成
     参数:
         db: 数据库会话
         user_id: 用户ID
         file_size: 文件大小(字节)
         owner_type: 文件归属类型 ('public', 'group', 'user')
     """
-    # 检查用户是否存在
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
     # 检查个人配额(对所有类型文件都检查)
-    if user.used_storage + file_size > user.storage_quota:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Personal storage quota exceeded (Used: {user.used_storage}/{user.storage_quota} bytes)"
-        )
-    
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user or user.used_storage + file_size > user.storage_quota:
+        raise _personal_exceeded(user)
+
     # 如果是社团文件，额外检查社团配额
     if owner_type == 'group':
-        group_quota = db.query(StorageQuota).filter(
-            StorageQuota.quota_type == 'group'
-        ).first()
-        
-        if group_quota:
-            group_usage = db.query(func.coalesce(func.sum(File.size), 0)).filter(
-                File.owner_type == 'group',
-                File.owner_id == 1  # 固定社团ID
-            ).scalar()
-            
-            if group_usage + file_size > group_quota.quota_limit:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Group storage quota exceeded (Used: {group_usage}/{group_quota.quota_limit} bytes)"
-                )
-
-def update_storage_usage(db: Session, user_id: int, file_size: int, operation: str = 'add'):
+        limit = _group_limit(db)
+        if limit is not None:
+            used = db.query(StorageUsage.used).filter(
+                StorageUsage.owner_type == 'group',
+                StorageUsage.owner_id == GROUP_OWNER_ID
+            ).scalar() or 0
+            if used + file_size > limit:
+                raise _group_exceeded(used, limit)
+
+
+def _ensure_usage_row(db: Session, owner_type: str, owner_id: int):
+    exists = db.query(StorageUsage.owner_id).filter(
+        StorageUsage.owner_type == owner_type,
+        StorageUsage.owner_id == owner_id
+    ).first()
+    if exists:
+        return
+    try:
+        with db.begin_nested():
+            db.add(StorageUsage(owner_type=owner_type, owner_id=owner_id, used=0))
+    except IntegrityError:
+        # 并发插入了同一行
+        pass
+
+
+def charge_storage(db: Session, user_id: int, file_size: int, owner_type: str):
     """
-    更新用户存储使用情况
-    参数:
-        db: 数据库会话
-        user_id: 用户ID
-        file_size: 文件大小(字节)
-        operation: 'add' 或 'remove'
+    在调用方的事务中原子地增加个人和归属方的已用空间
+    配额判断放在 UPDATE 的条件里，并发合并不会一起越过上限；超额时抛出 400
+    事务回滚时计数一并回滚
     """
-    user = db.query(User).filter(User.id == user_id).first()
-    if user:
-        if operation == 'add':
-            user.used_storage += file_size
-        elif operation == 'remove':
-            user.used_storage = max(0, user.used_storage - file_size)
-        db.commit()
\ No newline at end of file
+    result = db.execute(
+        update(User)
+        .where(User.id == user_id, User.used_storage + file_size <= User.storage_quota)
+        .values(used_storage=User.used_storage + file_size)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        raise _personal_exceeded(db.query(User).filter(User.id == user_id).first())
+
+    owner_id = _owner_id(owner_type, user_id)
+    _ensure_usage_row(db, owner_type, owner_id)
+    stmt = update(StorageUsage).where(
+        StorageUsage.owner_type == owner_type,
+        StorageUsage.owner_id == owner_id
+    ).values(used=StorageUsage.used + file_size).execution_options(synchronize_session=False)
+    limit = _group_limit(db) if owner_type == 'group' else None
+    if limit is not None:
+        stmt = stmt.where(StorageUsage.used + file_size <= limit)
+    if db.execute(stmt).rowcount == 0:
+        used = db.query(StorageUsage.used).filter(
+            StorageUsage.owner_type == owner_type,
+            StorageUsage.owner_id == owner_id
+        ).scalar() or 0
+        raise _group_exceeded(used, limit)
+
+
+def release_storage(db: Session, user_id: int, file_size: int, owner_type: str, owner_id: int):
+    """删除文件时原子地减少已用空间(不低于 0)，随调用方的事务提交"""
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(used_storage=case(
+            (User.used_storage > file_size, User.used_storage - file_size), else_=0
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(StorageUsage)
+        .where(StorageUsage.owner_type == owner_type, StorageUsage.owner_id == owner_id)
+        .values(used=case(
+            (StorageUsage.used > file_size, StorageUsage.used - file_size), else_=0
+        ))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_usage(db: Session) -> list[tuple[str, int, int, int]]:
+    """
+    用 SUM(size) + 未完成会话的预留量校正计数器，返回 [(类型, ID, 计数器值, 实际值)] 差异列表
+    读取在同一事务快照中完成，修正按差值增量写回，不会覆盖对账期间并发提交的增减
+    """
+    drift = []
+
+    # 未完成的上传会话已预留配额，同样计入
+    actual_users = Counter()
+    for user_id, size in db.execute(
+        select(File.created_by, func.sum(File.size))
+        .where(File.is_folder == False, File.created_by.is_not(None))
+        .group_by(File.created_by)
+    ).all():
+        actual_users[user_id] += int(size or 0)
+    for user_id, size in db.execute(
+        select(UploadSession.user_id, func.sum(UploadSession.total_size)).group_by(UploadSession.user_id)
+    ).all():
+        actual_users[user_id] += int(size or 0)
+    for user_id, used in db.execute(select(User.id, User.used_storage)).all():
+        actual = actual_users[user_id]
+        if (used or 0) != actual:
+            drift.append(("uploader", user_id, used or 0, actual))
+
+    actual_owners = Counter()
+    for owner_type, owner_id, size in db.execute(
+        select(File.owner_type, File.owner_id, func.sum(File.size))
+        .where(File.is_folder == False)
+        .group_by(File.owner_type, File.owner_id)
+    ).all():
+        actual_owners[(getattr(owner_type, "value", owner_type), owner_id)] += int(size or 0)
+    for owner_type, owner_id, size in db.execute(
+        select(UploadSession.space_type, UploadSession.owner_id, func.sum(UploadSession.total_size))
+        .group_by(UploadSession.space_type, UploadSession.owner_id)
+    ).all():
+        actual_owners[(getattr(owner_type, "value", owner_type), owner_id)] += int(size or 0)
+    counters = {
+        (owner_type, owner_id): used
+        for owner_type, owner_id, used in db.execute(
+            select(StorageUsage.owner_type, StorageUsage.owner_id, StorageUsage.used)
+        ).all()
+    }
+    for key in sorted(set(actual_owners) | set(counters)):
+        used = counters.get(key, 0)
+        actual = actual_owners.get(key, 0)
+        if used != actual:
+            drift.append((key[0], key[1], used, actual))
+
+    for kind, owner_id, used, actual in drift:
+        delta = actual - used
+        if kind == "uploader":
+            db.execute(
+                update(User).where(User.id == owner_id)
+                .values(used_storage=func.coalesce(User.used_storage, 0) + delta)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            _ensure_usage_row(db, kind, owner_id)
+            db.execute(
+                update(StorageUsage)
+                .where(StorageUsage.owner_type == kind, StorageUsage.owner_id == owner_id)
+                .values(used=StorageUsage.used + delta)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    return drift
+
+
+class UsageReconciler:
+    """后台线程，按 USAGE_RECONCILE_INTERVAL 定期对账并记录修正的差异，同时回收没有记录的内容文件"""
+
+    def __init__(self, interval: int):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._interval <= 0 or self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-reconciler", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def run_once(self) -> list:
+        db = SessionLocal()
+        try:
+            drift = reconcile_usage(db)
+        except Exception:
+            db.rollback()
+            logger.exception("Storage usage reconciliation failed")
+            return []
+        finally:
+            db.close()
+        for kind, owner_id, used, actual in drift:
+            logger.warning("Repaired storage usage drift %s/%s: %s -> %s", kind, owner_id, used, actual)
+        self.sweep_blobs()
+        return drift
+
+    def sweep_blobs(self) -> tuple[int, int]:
+        db = SessionLocal()
+        try:
+            removed, freed = sweep_unregistered(db, settings.BLOB_ORPHAN_GRACE)
+        except Exception:
+            logger.exception("Unregistered blob sweep failed")
+            return 0, 0
+        finally:
+            db.close()
+        if removed:
+            logger.warning("Removed %d unregistered blob files (%d bytes)", removed, freed)
+        return removed, freed
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.run_once()
+
+
+usage_reconciler = UsageReconciler(settings.USAGE_RECONCILE_INTERVAL)
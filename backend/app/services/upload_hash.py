@@ -0,0 +1,110 @@
+import hashlib
+import os
+import threading
+from app.config import settings
+
+
+class UploadHashState:
+    """单个上传的增量哈希状态：按分片顺序把已落盘的连续分片喂给 MD5/SHA-256"""
+
+    def __init__(self):
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.next_chunk = 1
+        self.hashed_bytes = 0
+        self.lock = threading.Lock()
+
+
+_states: dict[str, UploadHashState] = {}
+_states_lock = threading.Lock()
+
+
+def _get_state(identifier: str) -> UploadHashState:
+    with _states_lock:
+        state = _states.get(identifier)
+        if state is None:
+            state = _states[identifier] = UploadHashState()
+        return state
+
+
+def _feed(state: UploadHashState, path: str):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(settings.CHUNK_IO_BLOCK_SIZE)
+            if not block:
+                break
+            state.md5.update(block)
+            state.sha256.update(block)
+            state.hashed_bytes += len(block)
+
+
+def advance(identifier: str, chunk_dir: str) -> int:
+    """
+    把从 next_chunk 开始、已经落盘的连续分片计入哈希
+    分片乱序到达时先落盘，等前面的分片到齐后再一起计入
+    返回已计入哈希的分片数
+    """
+    state = _get_state(identifier)
+    with state.lock:
+        while True:
+            path = os.path.join(chunk_dir, str(state.next_chunk))
+            if not os.path.exists(path):
+                break
+            _feed(state, path)
+            state.next_chunk += 1
+        return state.next_chunk - 1
+
+
+def _feed_range(state: UploadHashState, fd: int, offset: int, length: int):
+    end = offset + length
+    while offset < end:
+        block = os.pread(fd, min(settings.CHUNK_IO_BLOCK_SIZE, end - offset), offset)
+        if not block:
+            break
+        state.md5.update(block)
+        state.sha256.update(block)
+        state.hashed_bytes += len(block)
+        offset += len(block)
+
+
+def advance_file(identifier: str, path: str, received, chunk_size: int, total_chunks: int, total_size: int) -> int:
+    """
+    按偏移写入模式：received(n) 为真的连续分片从目标文件对应区间读出计入哈希
+    最后一个分片包含余数，与 simple-uploader 的分片方式一致
+    """
+    state = _get_state(identifier)
+    with state.lock:
+        if state.next_chunk > total_chunks or not received(state.next_chunk):
+            return state.next_chunk - 1
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            while state.next_chunk <= total_chunks and received(state.next_chunk):
+                offset = (state.next_chunk - 1) * chunk_size
+                length = chunk_size if state.next_chunk < total_chunks else total_size - offset
+                _feed_range(state, fd, offset, length)
+                state.next_chunk += 1
+        finally:
+            os.close(fd)
+        return state.next_chunk - 1
+
+
+def finalize(identifier: str, chunk_dir: str, total_chunks: int) -> tuple[str, str] | None:
+    """
+    补齐尚未计入的分片并返回 (md5, sha256)
+    只有在进程重启、状态丢失时才需要从头读取分片
+    分片不连续时返回 None
+    """
+    if advance(identifier, chunk_dir) != total_chunks:
+        return None
+    return digests(identifier)
+
+
+def discard(identifier: str):
+    with _states_lock:
+        _states.pop(identifier, None)
+
+
+def digests(identifier: str) -> tuple[str, str]:
+    state = _get_state(identifier)
+    with state.lock:
+        return state.md5.hexdigest(), state.sha256.hexdigest()
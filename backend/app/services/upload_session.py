@@ -0,0 +1,203 @@
+import errno
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from uuid import uuid4
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database.models import UploadSession, User
+from app.schemas.file import UploadSessionCreate
+from . import chunk_bitmap, upload_hash
+from .blob_store import get_incoming_path, preallocate
+from .chunk_store import get_chunk_dir
+from .storage import charge_storage, release_storage
+
+# 上传令牌与访问令牌共用密钥，用 typ 区分，且不带 sub，不能当作访问令牌使用
+_TOKEN_TYPE = "upload"
+
+
+def expected_chunk_count(total_size: int, chunk_size: int) -> int:
+    """与 simple-uploader(forceChunkSize=false) 一致：余数并入最后一个分片"""
+    return max(total_size // chunk_size, 1)
+
+
+def chunk_length(total_size: int, chunk_size: int, total_chunks: int, chunk_number: int) -> int:
+    if chunk_number < total_chunks:
+        return chunk_size
+    return total_size - (total_chunks - 1) * chunk_size
+
+
+def get_staging_path(session_id: str) -> str:
+    """会话的目标文件 BLOB_ROOT/.incoming/<会话ID>，与 Blob 同一文件系统，完成时直接重命名"""
+    return get_incoming_path(session_id)
+
+
+class _WriteState:
+    """会话内正在写入的分片，以及是否正在完成"""
+
+    def __init__(self):
+        self.writing: set[int] = set()
+        self.completing = False
+
+
+_writes: dict[str, _WriteState] = {}
+_writes_lock = threading.Lock()
+
+
+def _release_state(session_id: str, state: _WriteState):
+    if not state.writing and not state.completing and _writes.get(session_id) is state:
+        del _writes[session_id]
+
+
+@contextmanager
+def chunk_write(session_id: str, chunk_number: int):
+    """
+    登记正在写入的分片，写入期间会话不能完成(否则 pwrite 会写进已重命名为 Blob 的文件)
+    会话正在完成或同一分片正在写入时返回 409
+    """
+    with _writes_lock:
+        state = _writes.setdefault(session_id, _WriteState())
+        if state.completing:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload session is being completed")
+        if chunk_number in state.writing:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Chunk is already being uploaded")
+        state.writing.add(chunk_number)
+    try:
+        yield
+    finally:
+        with _writes_lock:
+            state.writing.discard(chunk_number)
+            _release_state(session_id, state)
+
+
+@contextmanager
+def completing(session_id: str):
+    """完成期间拒绝新的分片写入；仍有分片在写入时返回 409，由客户端稍后重试"""
+    with _writes_lock:
+        state = _writes.setdefault(session_id, _WriteState())
+        if state.writing or state.completing:
+            _release_state(session_id, state)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Chunks are still being uploaded")
+        state.completing = True
+    try:
+        yield
+    finally:
+        with _writes_lock:
+            state.completing = False
+            _release_state(session_id, state)
+
+
+def create_session(db: Session, user: User, data: UploadSessionCreate) -> UploadSession:
+    """
+    预留配额并创建会话记录(只访问数据库)，目标文件和位图由 prepare_files 在线程池中创建
+    配额按 total_size 立即计入已用空间，超额时直接返回 400，不会分配任何磁盘空间
+    """
+    if data.total_chunks != expected_chunk_count(data.total_size, data.chunk_size):
+        raise HTTPException(status_code=400, detail="total_chunks does not match total_size / chunk_size")
+
+    session = UploadSession(
+        id=uuid4().hex,
+        user_id=user.id,
+        identifier=data.identifier.lower(),
+        filename=data.filename,
+        space_type=data.space_type,
+        owner_id=1 if data.space_type == 'group' else user.id,
+        parent_id=data.parent_id or None,
+        total_size=data.total_size,
+        chunk_size=data.chunk_size,
+        total_chunks=data.total_chunks,
+        expires_at=datetime.utcnow() + timedelta(seconds=settings.UPLOAD_SESSION_TTL)
+    )
+    try:
+        charge_storage(db, user.id, data.total_size, data.space_type)
+        db.add(session)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return session
+
+
+def prepare_files(session_id: str, total_chunks: int, total_size: int):
+    """
+    在分片目录中创建位图，并按 total_size 预分配目标文件
+    大文件的 fallocate 可能耗时较长，调用方应放到线程池中执行；磁盘空间不足时抛出 507
+    """
+    try:
+        chunk_dir = get_chunk_dir(session_id)
+        os.makedirs(chunk_dir, exist_ok=True)
+        chunk_bitmap.create(chunk_bitmap.get_bitmap_path(chunk_dir), total_chunks)
+        preallocate(get_staging_path(session_id), total_size)
+    except OSError as e:
+        discard_chunks(session_id)
+        if e.errno == errno.ENOSPC:
+            raise HTTPException(status_code=status.HTTP_507_INSUFFICIENT_STORAGE, detail="Insufficient disk space")
+        raise
+
+
+def issue_token(session: UploadSession) -> str:
+    """分片请求只凭该令牌授权，不再查询用户和父文件夹"""
+    return jwt.encode({
+        "typ": _TOKEN_TYPE,
+        "sid": session.id,
+        "uid": session.user_id,
+        "size": session.total_size,
+        "chunk": session.chunk_size,
+        "chunks": session.total_chunks,
+        "exp": session.expires_at,
+    }, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def verify_token(token: str, session_id: str) -> dict:
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid upload token")
+    if claims.get("typ") != _TOKEN_TYPE or claims.get("sid") != session_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Upload token does not match session")
+    return claims
+
+
+def progress(session_id: str, total_chunks: int) -> tuple[int, list[list[int]]]:
+    """(已收到分片数, 分片区间)，只读位图，不列目录"""
+    bitmap = chunk_bitmap.load(chunk_bitmap.get_bitmap_path(get_chunk_dir(session_id)))
+    ranges = chunk_bitmap.to_ranges(bitmap, total_chunks)
+    return sum(end - start + 1 for start, end in ranges), ranges
+
+
+def get_user_session(db: Session, session_id: str, user: User) -> UploadSession:
+    session = db.query(UploadSession).filter(UploadSession.id == session_id).first()
+    if not session or (session.user_id != user.id and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+def hash_received(session_id: str, chunk_size: int, total_chunks: int, total_size: int) -> int:
+    """把位图中已连续收到的分片计入增量哈希，返回已计入的分片数"""
+    bitmap = chunk_bitmap.load(chunk_bitmap.get_bitmap_path(get_chunk_dir(session_id)))
+    return upload_hash.advance_file(
+        session_id, get_staging_path(session_id),
+        lambda n: chunk_bitmap.has(bitmap, n),
+        chunk_size, total_chunks, total_size
+    )
+
+
+def discard_chunks(session_id: str):
+    """删除会话的位图目录、目标文件和哈希状态"""
+    shutil.rmtree(get_chunk_dir(session_id), ignore_errors=True)
+    try:
+        os.remove(get_staging_path(session_id))
+    except FileNotFoundError:
+        pass
+    upload_hash.discard(session_id)
+
+
+def release_session(db: Session, session: UploadSession):
+    """取消或过期：退还预留的配额并删除会话记录；分片由调用方用 discard_chunks 清理"""
+    release_storage(db, session.user_id, session.total_size, session.space_type, session.owner_id)
+    db.delete(session)
+    db.commit()
@@ -0,0 +1,203 @@
+import math
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from app.config import settings
+
+# 每个峰值点覆盖的采样帧数，相邻级别为整数倍
+RESOLUTIONS = (256, 1024, 4096, 16384, 65536)
+DEFAULT_RESOLUTION = 4096
+
+# 旁路文件格式（小端）:
+#   头部   magic, version, level_count, sample_rate, frames, rms_dbfs
+#   级别表 level_count 个 (samples_per_peak, peak_count, byte_offset)
+#   数据   每个峰值点 3 个 int16: min, max, rms
+_HEADER = struct.Struct("<4sHHIQf")
+_LEVEL = struct.Struct("<IIQ")
+_MAGIC = b"CMSP"
+_VERSION = 1
+
+_BLOCK_FRAMES = RESOLUTIONS[0] * 4096
+
+_executor = ThreadPoolExecutor(max_workers=settings.PEAKS_WORKERS, thread_name_prefix="peaks")
+_inflight: set[str] = set()
+_inflight_lock = threading.Lock()
+
+
+class UnsupportedAudio(Exception):
+    pass
+
+
+def get_peaks_path(sha256: str) -> str:
+    """峰值按内容哈希存放，去重后的相同内容只计算一次"""
+    return os.path.join(settings.PEAKS_ROOT, sha256[:2], f"{sha256}.peaks")
+
+
+def _parse_wav(path: str):
+    """解析 RIFF/WAVE 头部，返回 (格式, 声道数, 采样率, 位深, data 偏移, data 长度)"""
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise UnsupportedAudio("Not a RIFF/WAVE file")
+        fmt = None
+        while True:
+            head = f.read(8)
+            if len(head) < 8:
+                break
+            chunk_id, chunk_size = struct.unpack("<4sI", head)
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == 0xFFFE and len(body) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE，真实格式在 SubFormat GUID 的前两个字节
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, sample_rate, bits)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise UnsupportedAudio("data chunk before fmt chunk")
+                offset = f.tell()
+                size = min(chunk_size, os.fstat(f.fileno()).st_size - offset)
+                return (*fmt, offset, size)
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+        raise UnsupportedAudio("Missing fmt or data chunk")
+
+
+def _open_samples(path: str):
+    """把 PCM 数据映射为 (frames, channels) 数组，并返回转换到 [-1, 1] 的函数"""
+    tag, channels, sample_rate, bits, offset, size = _parse_wav(path)
+    width = bits // 8
+    if channels == 0 or width == 0:
+        raise UnsupportedAudio("Invalid fmt chunk")
+    frames = size // (width * channels)
+    if frames == 0:
+        raise UnsupportedAudio("No audio frames")
+
+    if tag == 1 and bits in (8, 16, 32):
+        dtype = {8: np.uint8, 16: np.dtype("<i2"), 32: np.dtype("<i4")}[bits]
+        data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames, channels))
+        if bits == 8:
+            convert = lambda x: (x.astype(np.float32) - 128.0) / 128.0
+        else:
+            scale = float(2 ** (bits - 1))
+            convert = lambda x: x.astype(np.float32) / scale
+    elif tag == 1 and bits == 24:
+        data = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(frames, channels, 3))
+
+        def convert(x):
+            x = x.astype(np.int32)
+            value = x[..., 0] | (x[..., 1] << 8) | (x[..., 2] << 16)
+            value = np.where(value >= 1 << 23, value - (1 << 24), value)
+            return value.astype(np.float32) / float(1 << 23)
+    elif tag == 3 and bits in (32, 64):
+        dtype = np.dtype("<f4") if bits == 32 else np.dtype("<f8")
+        data = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(frames, channels))
+        convert = lambda x: np.clip(x.astype(np.float32), -1.0, 1.0)
+    else:
+        raise UnsupportedAudio(f"Unsupported WAV format {tag}/{bits}bit")
+    return data, convert, sample_rate, frames
+
+
+def compute_peaks(path: str) -> bytes:
+    """
+    分块读取内存映射的 PCM 数据，计算各级别的 min/max/RMS 峰值
+    先算最细级别，较粗级别由最细级别归约得到，音频只读一遍
+    """
+    data, convert, sample_rate, frames = _open_samples(path)
+    finest = RESOLUTIONS[0]
+    mins, maxs, sums, counts = [], [], [], []
+    for start in range(0, frames, _BLOCK_FRAMES):
+        block = convert(data[start:start + _BLOCK_FRAMES])
+        low = block.min(axis=1)
+        high = block.max(axis=1)
+        power = np.square(block, dtype=np.float64).mean(axis=1)
+        idx = np.arange(0, len(block), finest)
+        mins.append(np.minimum.reduceat(low, idx))
+        maxs.append(np.maximum.reduceat(high, idx))
+        sums.append(np.add.reduceat(power, idx))
+        counts.append(np.diff(np.append(idx, len(block))))
+    mins = np.concatenate(mins)
+    maxs = np.concatenate(maxs)
+    sums = np.concatenate(sums)
+    counts = np.concatenate(counts)
+
+    total = sums.sum() / frames
+    rms_dbfs = 10 * math.log10(total) if total > 0 else -math.inf
+
+    levels = []
+    for resolution in RESOLUTIONS:
+        factor = resolution // finest
+        idx = np.arange(0, len(mins), factor)
+        level_sums = np.add.reduceat(sums, idx)
+        level_counts = np.add.reduceat(counts, idx)
+        rms = np.sqrt(level_sums / level_counts)
+        triples = np.empty((len(idx), 3), dtype="<i2")
+        triples[:, 0] = np.round(np.minimum.reduceat(mins, idx) * 32767)
+        triples[:, 1] = np.round(np.maximum.reduceat(maxs, idx) * 32767)
+        triples[:, 2] = np.round(np.minimum(rms, 1.0) * 32767)
+        levels.append((resolution, triples.tobytes()))
+
+    header = _HEADER.pack(_MAGIC, _VERSION, len(levels), sample_rate, frames, rms_dbfs)
+    offset = _HEADER.size + _LEVEL.size * len(levels)
+    table, payload = [], []
+    for resolution, body in levels:
+        table.append(_LEVEL.pack(resolution, len(body) // 6, offset))
+        payload.append(body)
+        offset += len(body)
+    return header + b"".join(table) + b"".join(payload)
+
+
+def read_peaks(path: str, resolution: int):
+    """
+    从旁路文件中读取一个级别，返回 (sample_rate, frames, rms_dbfs, 峰值数据)
+    级别不存在或文件是不支持格式留下的空标记时返回 None
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, level_count, sample_rate, frames, rms_dbfs = _HEADER.unpack(header)
+        if magic != _MAGIC or version != _VERSION:
+            return None
+        for _ in range(level_count):
+            samples_per_peak, count, offset = _LEVEL.unpack(f.read(_LEVEL.size))
+            if samples_per_peak == resolution:
+                f.seek(offset)
+                return sample_rate, frames, rms_dbfs, f.read(count * 6)
+    return None
+
+
+def generate_peaks(sha256: str, storage_path: str):
+    """计算并原子写入峰值旁路文件，非 WAV/PCM 文件写入空文件"""
+    peaks_path = get_peaks_path(sha256)
+    try:
+        if os.path.exists(peaks_path):
+            return
+        try:
+            content = compute_peaks(storage_path)
+        except UnsupportedAudio:
+            # 写入空文件作为标记，之后的请求直接返回不可用，不再反复排队
+            content = b""
+        os.makedirs(os.path.dirname(peaks_path), exist_ok=True)
+        tmp_path = f"{peaks_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, peaks_path)
+    finally:
+        with _inflight_lock:
+            _inflight.discard(sha256)
+
+
+def is_waveform_candidate(name: str, mime_type: str | None) -> bool:
+    return (mime_type or "") in ("audio/wav", "audio/x-wav", "audio/wave") or name.lower().endswith(".wav")
+
+
+def submit(sha256: str, storage_path: str):
+    """在后台线程池中生成峰值，同一内容不会重复排队"""
+    with _inflight_lock:
+        if sha256 in _inflight:
+            return
+        _inflight.add(sha256)
+    _executor.submit(generate_peaks, sha256, storage_path)
@@ -0,0 +1,146 @@
+import logging
+import os
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Iterator
+from app.config import settings
+from app.database.models import File
+
+logger = logging.getLogger(__name__)
+
+# 这些格式本身已压缩(或压缩收益很低)，直接存储，不再 deflate
+_STORED_MIME_PREFIXES = ("audio/", "video/", "image/")
+_STORED_MIME_TYPES = {
+    "application/zip", "application/gzip", "application/x-7z-compressed",
+    "application/x-rar-compressed", "application/x-bzip2", "application/x-xz", "application/pdf",
+}
+
+
+@dataclass
+class ZipEntry:
+    arcname: str
+    path: str | None  # 文件夹为 None
+    size: int
+    modified: datetime | None
+
+
+def _compress_type(mime_type: str | None) -> int:
+    mime_type = mime_type or ""
+    if mime_type.startswith(_STORED_MIME_PREFIXES) or mime_type in _STORED_MIME_TYPES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _safe_name(name: str) -> str:
+    """
+    文件名未做校验，作为条目名前只保留单个路径段：去掉 NUL，分隔符替换为 _，
+    "."、".." 等整段替换为 _，解压时不会写到目标目录之外
+    """
+    name = name.replace("\x00", "").replace("/", "_").replace("\\", "_").strip()
+    if not name.strip("."):
+        return "_"
+    return name
+
+
+def _unique(name: str, taken: set[str]) -> str:
+    """同一文件夹下重名时追加序号：a.wav -> a (1).wav"""
+    if name not in taken:
+        taken.add(name)
+        return name
+    stem, ext = os.path.splitext(name)
+    n = 1
+    while f"{stem} ({n}){ext}" in taken:
+        n += 1
+    name = f"{stem} ({n}){ext}"
+    taken.add(name)
+    return name
+
+
+def build_entries(root: File, nodes: list[File]) -> list[tuple[ZipEntry, int]]:
+    """
+    把子树节点(按 depth 排序，已做过权限和审核过滤)转换为压缩包条目
+    父文件夹不可见的节点一并跳过；返回 [(条目, 压缩方式)]
+    """
+    root_name = _safe_name(root.name)
+    paths = {root.id: root_name}
+    taken: dict[str, set[str]] = {root.id: set()}
+    entries = [(ZipEntry(root_name + "/", None, 0, root.updated_at), zipfile.ZIP_STORED)]
+    for node in nodes:
+        parent_path = paths.get(node.parent_id)
+        if parent_path is None:
+            continue
+        arcname = f"{parent_path}/{_unique(_safe_name(node.name), taken[node.parent_id])}"
+        if node.is_folder:
+            paths[node.id] = arcname
+            taken[node.id] = set()
+            entries.append((ZipEntry(arcname + "/", None, 0, node.updated_at), zipfile.ZIP_STORED))
+        else:
+            entries.append((
+                ZipEntry(arcname, node.storage_path, node.size, node.updated_at or node.created_at),
+                _compress_type(node.mime_type)
+            ))
+    return entries
+
+
+class _Sink:
+    """只写、不可 seek 的输出；zipfile 会因此改用数据描述符，整个归档无需回写"""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        if self._parts:
+            data = b"".join(self._parts)
+            self._parts.clear()
+            yield data
+
+
+def _zip_info(entry: ZipEntry, compress_type: int) -> zipfile.ZipInfo:
+    modified = entry.modified or datetime.now()
+    date_time = max(modified.timetuple()[:6], (1980, 1, 1, 0, 0, 0))
+    info = zipfile.ZipInfo(entry.arcname, date_time=date_time)
+    info.compress_type = compress_type
+    info.file_size = entry.size  # 预先给出大小，超过 4GB 的条目直接写 ZIP64 扩展
+    if entry.path is None:
+        info.external_attr = 0o40755 << 16 | 0x10
+    else:
+        info.external_attr = 0o644 << 16
+    return info
+
+
+def stream_zip(entries: Iterable[tuple[ZipEntry, int]]) -> Iterator[bytes]:
+    """
+    边读边生成 ZIP(必要时自动使用 ZIP64)，不落临时文件
+    每次只缓冲一个读块，内存占用与文件夹大小无关(中央目录每个条目几十字节除外)
+    同步生成器，由 StreamingResponse 在线程池中迭代
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as zf:
+        for entry, compress_type in entries:
+            info = _zip_info(entry, compress_type)
+            if entry.path is None:
+                zf.writestr(info, b"")
+                yield from sink.drain()
+                continue
+            try:
+                src = open(entry.path, "rb")
+            except OSError:
+                logger.warning("Skipping missing file %s in folder archive", entry.path)
+                continue
+            with src, zf.open(info, "w", force_zip64=entry.size > zipfile.ZIP64_LIMIT) as dst:
+                while True:
+                    block = src.read(settings.CHUNK_IO_BLOCK_SIZE)
+                    if not block:
+                        break
+                    dst.write(block)
+                    yield from sink.drain()
+            yield from sink.drain()
+    yield from sink.drain()
@@ -0,0 +1,38 @@
+from starlette.responses import FileResponse
+
+
+def make_etag(digest: str) -> str:
+    """由内容哈希生成强 ETag"""
+    return f'"{digest}"'
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀，支持列表和 *"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class RangeFileResponse(FileResponse):
+    """
+    Starlette 的多段 Range 响应把 multipart/byteranges 写进了 Content-Range，
+    这里把它改回 Content-Type，单段和完整响应不受影响
+    """
+
+    async def _handle_multiple_ranges(self, send, ranges, file_size, send_header_only):
+        async def fixed_send(message):
+            if message["type"] == "http.response.start":
+                headers = []
+                for key, value in message["headers"]:
+                    if key == b"content-type":
+                        continue
+                    if key == b"content-range" and value.startswith(b"multipart/"):
+                        key = b"content-type"
+                    headers.append((key, value))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await super()._handle_multiple_ranges(fixed_send, ranges, file_size, send_header_only)
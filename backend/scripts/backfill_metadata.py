@@ -0,0 +1,48 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from app.database import SessionLocal, engine
+from app.database.models import Base, File, TrackMetadata
+from app.services.metadata import extract_tags, save_metadata, is_audio_candidate
+
+
+def backfill_metadata(workers: int, batch_size: int):
+    """为尚未解析标签的已有音频文件批量补全曲目信息，标签解析在多个进程中并行执行"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    done = 0
+    last_id = ""
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                files = db.query(File).outerjoin(
+                    TrackMetadata, TrackMetadata.file_id == File.id
+                ).filter(
+                    File.is_folder == False,
+                    TrackMetadata.file_id.is_(None),
+                    File.id > last_id
+                ).order_by(File.id).limit(batch_size).all()
+                if not files:
+                    break
+                last_id = files[-1].id
+
+                files = [
+                    f for f in files
+                    if is_audio_candidate(f.name, f.mime_type) and os.path.exists(f.storage_path)
+                ]
+                for file, tags in zip(files, pool.map(extract_tags, [f.storage_path for f in files])):
+                    if save_metadata(db, file, tags) is not None:
+                        done += 1
+                db.commit()
+                print(f"已处理到 {last_id}，累计 {done} 个文件")
+    finally:
+        db.close()
+    print(f"✅ 标签补全完成，共 {done} 个文件")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    backfill_metadata(args.workers, args.batch_size)
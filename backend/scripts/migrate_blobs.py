@@ -0,0 +1,45 @@
+import hashlib
+import os
+from app.database import SessionLocal
+from app.database.models import Base, File
+from app.database import engine
+from app.services.blob_store import store_blob, get_incoming_path
+
+
+def _digest(path: str) -> tuple[str, str]:
+    md5, sha256 = hashlib.md5(), hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(block)
+            sha256.update(block)
+    return md5.hexdigest(), sha256.hexdigest()
+
+
+def migrate_blobs():
+    """把尚未去重的旧文件迁移到 Blob 存储，重复内容只保留一份"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    migrated = 0
+    try:
+        files = db.query(File).filter(File.is_folder == False, File.sha256.is_(None)).all()
+        for file in files:
+            if not os.path.exists(file.storage_path):
+                print(f"跳过缺失文件: {file.id} {file.storage_path}")
+                continue
+            md5, sha256 = _digest(file.storage_path)
+            # 先移到 BLOB_ROOT 下，store_blob 负责去重或重命名
+            staging_path = get_incoming_path()
+            os.replace(file.storage_path, staging_path)
+            blob = store_blob(db, staging_path, sha256, md5, file.size)
+            file.md5 = md5
+            file.sha256 = sha256
+            file.storage_path = blob.storage_path
+            db.commit()
+            migrated += 1
+    finally:
+        db.close()
+    print(f"✅ 已迁移 {migrated} 个文件")
+
+
+if __name__ == "__main__":
+    migrate_blobs()
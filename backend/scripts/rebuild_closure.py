@@ -0,0 +1,33 @@
+from app.database import SessionLocal, engine
+from app.database.models import Base, File, FileClosure
+
+
+def rebuild_closure():
+    """根据 parent_id 重建文件树闭包表（用于已有数据）"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        parents = dict(db.query(File.id, File.parent_id).all())
+        db.query(FileClosure).delete()
+
+        rows = []
+        for file_id in parents:
+            # 沿 parent_id 向上走，同时防止脏数据中的环
+            node, depth, seen = file_id, 0, set()
+            while node in parents and node not in seen:
+                seen.add(node)
+                rows.append({"ancestor_id": node, "descendant_id": file_id, "depth": depth})
+                node, depth = parents[node], depth + 1
+            if len(rows) >= 5000:
+                db.execute(FileClosure.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.execute(FileClosure.__table__.insert(), rows)
+        db.commit()
+    finally:
+        db.close()
+    print("✅ 闭包表重建完成")
+
+
+if __name__ == "__main__":
+    rebuild_closure()
@@ -0,0 +1,31 @@
+from app.database import SessionLocal, engine
+from app.database.models import Base, File, TrackMetadata
+from app.services.search_index import index_file
+
+
+def rebuild_search_index(batch_size: int = 1000):
+    """为已有文件重建检索索引"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    done = 0
+    last_id = ""
+    try:
+        while True:
+            rows = db.query(File, TrackMetadata).outerjoin(
+                TrackMetadata, TrackMetadata.file_id == File.id
+            ).filter(File.id > last_id).order_by(File.id).limit(batch_size).all()
+            if not rows:
+                break
+            for file, track in rows:
+                index_file(db, file, track)
+            db.commit()
+            last_id = rows[-1][0].id
+            done += len(rows)
+            print(f"已索引 {done} 个文件")
+    finally:
+        db.close()
+    print("✅ 检索索引重建完成")
+
+
+if __name__ == "__main__":
+    rebuild_search_index()
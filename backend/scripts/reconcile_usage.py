@@ -0,0 +1,20 @@
+from app.database import SessionLocal, engine
+from app.database.models import Base
+from app.services.storage import reconcile_usage
+
+
+def main():
+    """立即对账一次（首次部署时也用它根据已有文件初始化计数器）"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        drift = reconcile_usage(db)
+    finally:
+        db.close()
+    for kind, owner_id, used, actual in drift:
+        print(f"{kind}/{owner_id}: {used} -> {actual}")
+    print(f"✅ 已用空间对账完成，修正 {len(drift)} 项")
+
+
+if __name__ == "__main__":
+    main()
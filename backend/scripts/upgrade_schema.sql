@@ -0,0 +1,112 @@
+USE cms_db;
+
+-- 已有数据库的增量结构变更（新库由 Base.metadata.create_all 直接建表）
+
+-- 服务端计算的内容哈希
+ALTER TABLE files ADD COLUMN sha256 CHAR(64) NULL;
+
+-- 去重内容存储
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    md5 CHAR(32) NOT NULL,
+    size BIGINT NOT NULL,
+    storage_path VARCHAR(512) NOT NULL,
+    ref_count INT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_blobs_md5 (md5)
+) ENGINE=InnoDB;
+ALTER TABLE files ADD INDEX ix_files_sha256 (sha256);
+ALTER TABLE files ADD FOREIGN KEY (sha256) REFERENCES blobs(sha256);
+
+-- 曲目信息
+CREATE TABLE IF NOT EXISTS track_metadata (
+    file_id CHAR(36) PRIMARY KEY,
+    title VARCHAR(255),
+    artist VARCHAR(255),
+    album_artist VARCHAR(255),
+    album VARCHAR(255),
+    genre VARCHAR(100),
+    track_number INT,
+    disc_number INT,
+    year INT,
+    duration DOUBLE,
+    bitrate INT,
+    sample_rate INT,
+    channels INT,
+    extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE,
+    INDEX ix_track_metadata_artist (artist),
+    INDEX ix_track_metadata_album (album),
+    INDEX ix_track_metadata_genre (genre),
+    INDEX ix_track_album_order (album, disc_number, track_number, file_id)
+) ENGINE=InnoDB;
+
+-- 检索索引
+CREATE TABLE IF NOT EXISTS search_documents (
+    file_id CHAR(36) PRIMARY KEY,
+    content TEXT NOT NULL,
+    FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+CREATE TABLE IF NOT EXISTS search_trigrams (
+    trigram VARBINARY(12) NOT NULL,
+    file_id CHAR(36) NOT NULL,
+    PRIMARY KEY (trigram, file_id),
+    INDEX ix_search_trigrams_file_id (file_id),
+    FOREIGN KEY (file_id) REFERENCES files(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- 文件树闭包表，建表后执行 scripts/rebuild_closure.py
+CREATE TABLE IF NOT EXISTS file_closure (
+    ancestor_id CHAR(36) NOT NULL,
+    descendant_id CHAR(36) NOT NULL,
+    depth INT NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id),
+    INDEX ix_file_closure_descendant (descendant_id, depth),
+    FOREIGN KEY (ancestor_id) REFERENCES files(id) ON DELETE CASCADE,
+    FOREIGN KEY (descendant_id) REFERENCES files(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- 文件夹内容版本号
+CREATE TABLE IF NOT EXISTS folder_versions (
+    folder_id CHAR(36) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+-- 刷新令牌(仅存摘要)
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token_hash BINARY(32) PRIMARY KEY,
+    family_id CHAR(32) NOT NULL,
+    user_id INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    revoked BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX ix_refresh_tokens_family_id (family_id),
+    INDEX ix_refresh_tokens_user_id (user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- 按归属统计的已用空间，建表后执行 scripts/reconcile_usage.py 初始化
+CREATE TABLE IF NOT EXISTS storage_usage (
+    owner_type ENUM('public', 'group', 'user') NOT NULL,
+    owner_id INT NOT NULL,
+    used BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner_type, owner_id)
+) ENGINE=InnoDB;
+
+-- 分片上传会话(预留配额)
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    id CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    identifier CHAR(32) NOT NULL,
+    filename VARCHAR(255) NOT NULL,
+    space_type ENUM('public', 'group', 'user') NOT NULL,
+    owner_id INT NOT NULL,
+    parent_id CHAR(36),
+    total_size BIGINT NOT NULL,
+    chunk_size BIGINT NOT NULL,
+    total_chunks INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME NOT NULL,
+    INDEX ix_upload_sessions_user_id (user_id),
+    INDEX ix_upload_sessions_expires_at (expires_at),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB;
@@ -0,0 +1,381 @@
+"""
+API 热路径基准：进程内通过 httpx ASGITransport 驱动 FastAPI app，使用临时 SQLite 库和临时存储目录
+
+    python -m tests.benchmarks.api_bench                               # 默认参数，结果写入 bench-results.json
+    python -m tests.benchmarks.api_bench -c 1 10 50 --file-size 16M --ops 200
+    python -m tests.benchmarks.api_bench --save-baseline tests/benchmarks/baseline.json
+    python -m tests.benchmarks.api_bench --baseline tests/benchmarks/baseline.json --tolerance 0.2
+
+与基线比较时，吞吐下降或 p95 延迟上升超过 tolerance 记为退化，进程以状态码 1 退出
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+
+SCENARIOS = ("login", "upload_chunk", "merge", "list", "download")
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+def prepare_environment(root: str | None = None) -> str:
+    """在导入 app 之前把数据库和存储目录切换到临时目录"""
+    root = root or tempfile.mkdtemp(prefix="cms_bench_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{root}/cms.sqlite"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{root}/cms.sqlite"
+    for key in ("PUBLIC_ROOT", "GROUP_ROOT", "USER_ROOT", "CHUNKTEMP", "BLOB_ROOT", "PEAKS_ROOT", "COVER_ROOT"):
+        os.environ[key] = os.path.join(root, key.lower())
+    return root
+
+
+def parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper().removesuffix("B")
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+@dataclass
+class Result:
+    scenario: str
+    concurrency: int
+    ops: int
+    errors: int
+    duration: float  # 秒
+    throughput: float  # 次/秒
+    mb_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def measure(scenario: str, concurrency: int, ops: int, op) -> Result:
+    """并发执行 ops 次 op(i)，op 返回传输的字节数，失败时抛出异常"""
+    latencies, transferred, errors = [], 0, 0
+    queue = iter(range(ops))
+
+    async def worker():
+        nonlocal transferred, errors
+        for i in queue:
+            start = time.perf_counter()
+            try:
+                transferred += await op(i)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    ms = [value * 1000 for value in latencies]
+    return Result(
+        scenario=scenario,
+        concurrency=concurrency,
+        ops=ops,
+        errors=errors,
+        duration=round(duration, 4),
+        throughput=round(len(latencies) / duration, 2) if duration else 0.0,
+        mb_per_s=round(transferred / duration / 1024 ** 2, 2) if duration else 0.0,
+        p50_ms=round(_percentile(ms, 0.50), 3),
+        p95_ms=round(_percentile(ms, 0.95), 3),
+        p99_ms=round(_percentile(ms, 0.99), 3),
+        mean_ms=round(statistics.fmean(ms), 3) if ms else 0.0,
+        max_ms=round(ms[-1], 3) if ms else 0.0,
+    )
+
+
+class Bench:
+    """准备测试数据并为每个场景生成 op(i)"""
+
+    def __init__(self, client, file_size: int, chunk_size: int, list_size: int):
+        self.client = client
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+        self.list_size = list_size
+        self.headers: dict = {}
+        self.payload = os.urandom(file_size)
+
+    def setup_database(self):
+        from app.database import SessionLocal
+        from app.database.models import User
+        from app.utils.security import get_password_hash
+
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.username == BENCH_USER).first()
+            if not user:
+                user = User(
+                    username=BENCH_USER, email=f"{BENCH_USER}@example.com",
+                    password_hash=get_password_hash(BENCH_PASSWORD), role="member", is_active=True
+                )
+                db.add(user)
+            user.storage_quota = 1024 ** 5
+            db.commit()
+        finally:
+            db.close()
+
+    async def login(self):
+        r = await self.client.post("/auth/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+        r.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    def _unique_payload(self, tag: str) -> bytes:
+        prefix = hashlib.sha256(f"{tag}-{time.time_ns()}".encode()).digest()
+        return prefix + self.payload[len(prefix):] if len(self.payload) > len(prefix) else prefix[:len(self.payload)]
+
+    async def open_session(self, data: bytes, chunk_size: int, filename: str, parent_id: str | None = None) -> dict:
+        total_chunks = max(len(data) // chunk_size, 1)
+        r = await self.client.post("/files/upload/session", headers=self.headers, json={
+            "identifier": hashlib.md5(data).hexdigest(),
+            "filename": filename,
+            "total_size": len(data),
+            "chunk_size": chunk_size,
+            "total_chunks": total_chunks,
+            "space_type": "user",
+            "parent_id": parent_id,
+        })
+        r.raise_for_status()
+        return {**r.json(), "data": data}
+
+    async def put_chunk(self, session: dict, n: int) -> int:
+        chunk_size, total = session["chunk_size"], session["total_chunks"]
+        data = session["data"]
+        part = data[(n - 1) * chunk_size: n * chunk_size if n < total else None]
+        r = await self.client.post(
+            f"/files/upload/session/{session['session_id']}/chunk",
+            headers={"X-Upload-Token": session["upload_token"]},
+            files={"file": ("blob", part)}, data={"chunkNumber": n}
+        )
+        r.raise_for_status()
+        return len(part)
+
+    async def complete(self, session: dict) -> str:
+        r = await self.client.post(f"/files/upload/session/{session['session_id']}/complete", headers=self.headers)
+        r.raise_for_status()
+        job_id = r.json()["job_id"]
+        while True:
+            r = await self.client.get(f"/files/upload/merge/{job_id}", headers=self.headers)
+            job = r.json()
+            if job["status"] == "done":
+                return job["file"]["id"]
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            await asyncio.sleep(0.002)
+
+    async def upload(self, data: bytes, filename: str, parent_id: str | None = None) -> str:
+        session = await self.open_session(data, self.chunk_size, filename, parent_id)
+        for n in range(1, session["total_chunks"] + 1):
+            await self.put_chunk(session, n)
+        return await self.complete(session)
+
+    async def scenario(self, name: str, ops: int):
+        """返回 op(i)；需要的数据在这里准备，不计入计时"""
+        if name == "login":
+            async def op(i):
+                r = await self.client.post("/auth/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+                r.raise_for_status()
+                return 0
+            return op
+
+        if name == "upload_chunk":
+            session = await self.open_session(
+                os.urandom(self.chunk_size) * ops, self.chunk_size, f"chunks-{time.time_ns()}.bin"
+            )
+            return lambda i: self.put_chunk(session, i + 1)
+
+        if name == "merge":
+            sessions = []
+            for i in range(ops):
+                session = await self.open_session(self._unique_payload(f"merge{i}"), self.chunk_size, f"merge-{i}.bin")
+                for n in range(1, session["total_chunks"] + 1):
+                    await self.put_chunk(session, n)
+                sessions.append(session)
+
+            async def op(i):
+                await self.complete(sessions[i])
+                return len(sessions[i]["data"])
+            return op
+
+        if name == "list":
+            r = await self.client.post("/files/create-folder", headers=self.headers, json={
+                "name": f"list-{time.time_ns()}", "is_folder": True, "owner_type": "user"
+            })
+            r.raise_for_status()
+            folder_id = r.json()["id"]
+            self._fill_folder(folder_id)
+
+            async def op(i):
+                r = await self.client.get(
+                    "/files/list", headers=self.headers,
+                    params={"parent_id": folder_id, "limit": 50, "cursor": ""}
+                )
+                r.raise_for_status()
+                return len(r.content)
+            return op
+
+        if name == "download":
+            file_id = await self.upload(self._unique_payload("download"), "download.bin")
+
+            async def op(i):
+                r = await self.client.get(f"/files/download/{file_id}", headers=self.headers)
+                r.raise_for_status()
+                return len(r.content)
+            return op
+
+        raise ValueError(f"Unknown scenario {name}")
+
+    def _fill_folder(self, folder_id: str):
+        """列表场景直接写库生成子项，避免把上传时间算进准备阶段"""
+        from uuid import uuid4
+        from app.database import SessionLocal
+        from app.database.models import File, User
+        from app.schemas.file import FileStatus
+        from app.services.hierarchy import add_node
+
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.username == BENCH_USER).one()
+            for i in range(self.list_size):
+                node = File(
+                    id=str(uuid4()), name=f"track-{i:05d}.wav", parent_id=folder_id, is_folder=False,
+                    owner_type="user", owner_id=user.id, storage_path="", size=self.file_size,
+                    mime_type="audio/x-wav", status=FileStatus.approved, created_by=user.id
+                )
+                db.add(node)
+                add_node(db, node.id, folder_id)
+            db.commit()
+        finally:
+            db.close()
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_suite(scenarios, concurrency: list[int], ops: int, file_size: int, chunk_size: int,
+                    list_size: int) -> list[Result]:
+    import httpx
+    from app.main import app
+    from app.database import async_engine
+    from app.services.merge_queue import merge_queue
+
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        bench = Bench(client, file_size, chunk_size, list_size)
+        bench.setup_database()
+        await bench.login()
+        for name in scenarios:
+            for level in concurrency:
+                op = await bench.scenario(name, ops)
+                result = await measure(name, level, ops, op)
+                print(
+                    f"{name:<13} c={level:<4} {result.throughput:>9.1f} op/s  "
+                    f"p50 {result.p50_ms:>8.2f} ms  p95 {result.p95_ms:>8.2f} ms  "
+                    f"{result.mb_per_s:>8.1f} MB/s  errors {result.errors}",
+                    flush=True
+                )
+                results.append(result)
+    merge_queue.shutdown()
+    await async_engine.dispose()
+    return results
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """按 (场景, 并发) 对比吞吐与 p95，返回退化描述"""
+    base = {(item["scenario"], item["concurrency"]): item for item in baseline}
+    regressions = []
+    for item in results:
+        old = base.get((item["scenario"], item["concurrency"]))
+        if not old:
+            continue
+        label = f"{item['scenario']} c={item['concurrency']}"
+        if old["throughput"] and item["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {old['throughput']} -> {item['throughput']} op/s")
+        if old["p95_ms"] and item["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {old['p95_ms']} -> {item['p95_ms']} ms")
+        if item["errors"] > old["errors"]:
+            regressions.append(f"{label}: errors {old['errors']} -> {item['errors']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="CMS API 基准")
+    parser.add_argument("-s", "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("-c", "--concurrency", nargs="+", type=int, default=[1, 10])
+    parser.add_argument("--ops", type=int, default=50, help="每个场景、每个并发级别的操作次数")
+    parser.add_argument("--file-size", type=parse_size, default=parse_size("4M"))
+    parser.add_argument("--chunk-size", type=parse_size, default=parse_size("1M"))
+    parser.add_argument("--list-size", type=int, default=500, help="列表场景文件夹中的子项数")
+    parser.add_argument("-o", "--output", default="bench-results.json")
+    parser.add_argument("--baseline", help="与该基线文件比较")
+    parser.add_argument("--save-baseline", help="同时把结果写为基线文件")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    root = prepare_environment()
+    results = asyncio.run(run_suite(
+        args.scenarios, args.concurrency, args.ops, args.file_size, args.chunk_size, args.list_size
+    ))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "storage_root": root,
+            "params": {
+                "ops": args.ops, "concurrency": args.concurrency, "file_size": args.file_size,
+                "chunk_size": args.chunk_size, "list_size": args.list_size,
+            },
+        },
+        "results": [asdict(result) for result in results],
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
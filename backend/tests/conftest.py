@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+
+# 在导入 app 之前切换到临时 SQLite 库和临时存储目录
+_root = tempfile.mkdtemp(prefix="cms_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_root}/cms.sqlite"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{_root}/cms.sqlite"
+for key in ("PUBLIC_ROOT", "GROUP_ROOT", "USER_ROOT", "CHUNKTEMP", "BLOB_ROOT", "PEAKS_ROOT", "COVER_ROOT"):
+    os.environ[key] = os.path.join(_root, key.lower())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import pytest
+from app.main import app
+from app.database import SessionLocal, async_engine
+from app.database.models import User
+from app.services.auth import create_access_token
+from app.utils.security import get_password_hash
+
+# 测试数据共用一个哈希，避免每个用户都跑一次 bcrypt
+_PASSWORD_HASH = get_password_hash("password123")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def storage_root():
+    return _root
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+    # 连接池绑定在当前测试的事件循环上
+    await async_engine.dispose()
+
+
+@pytest.fixture
+def make_user():
+    def _make(username: str, role: str = "member") -> User:
+        db = SessionLocal()
+        try:
+            user = User(
+                username=username,
+                email=f"{username}@example.com",
+                password_hash=_PASSWORD_HASH,
+                role=role,
+                is_active=True
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            return user
+        finally:
+            db.close()
+    return _make
+
+
+@pytest.fixture
+def auth_headers():
+    def _headers(username: str) -> dict:
+        return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+    return _headers
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import uuid
+import pytest
+from app.database import AsyncSessionLocal, SessionLocal
+from app.database.crud import get_user_by_username, update_user, get_user_storage_usage
+from app.database.models import File
+
+pytestmark = pytest.mark.anyio
+
+
+def _add_folder(user, count: int, payload: str) -> tuple[str, str]:
+    """直接写入一个文件夹和 count 个已审核文件，返回 (文件夹ID, 第一个文件ID)"""
+    db = SessionLocal()
+    try:
+        folder = File(id=str(uuid.uuid4()), name="folder", is_folder=True, owner_type="user",
+                      owner_id=user.id, storage_path="", size=0, status="approved", created_by=user.id)
+        db.add(folder)
+        files = [
+            File(id=str(uuid.uuid4()), name=f"track{i:03d}.wav", parent_id=folder.id, is_folder=False,
+                 owner_type="user", owner_id=user.id, storage_path=payload, size=os.path.getsize(payload),
+                 status="approved", created_by=user.id, sha256=f"{i:064x}")
+            for i in range(count)
+        ]
+        db.add_all(files)
+        db.commit()
+        return folder.id, files[0].id
+    finally:
+        db.close()
+
+
+async def test_crud_on_async_session(make_user):
+    make_user("crud_user")
+    async with AsyncSessionLocal() as db:
+        user = await get_user_by_username(db, "crud_user")
+        assert user is not None and user.role == "member"
+
+        user = await update_user(db, user.id, is_active=False, storage_quota=1024)
+        assert user.is_active is False and user.storage_quota == 1024
+        assert tuple(await get_user_storage_usage(db, user.id)) == (0, 1024)
+        assert await update_user(db, 999999, role="admin") is None
+
+
+async def test_folder_operations(client, make_user, auth_headers):
+    make_user("tree_user")
+    headers = auth_headers("tree_user")
+
+    r = await client.post("/files/create-folder", headers=headers,
+                          json={"name": "a", "owner_type": "user", "is_folder": True})
+    assert r.status_code == 200, r.text
+    a = r.json()
+    r = await client.post("/files/create-folder", headers=headers,
+                          json={"name": "b", "owner_type": "user", "is_folder": True, "parent_id": a["id"]})
+    b = r.json()
+
+    r = await client.patch(f"/files/{b['id']}/rename", headers=headers, json={"newName": "b2"})
+    assert r.status_code == 200 and r.json()["name"] == "b2"
+
+    # 不能移动到自己的子文件夹中
+    r = await client.post(f"/files/move/{a['id']}", headers=headers, json={"target_parent_id": b["id"]})
+    assert r.status_code == 400
+
+    r = await client.get(f"/files/{b['id']}/ancestors", headers=headers)
+    assert [node["name"] for node in r.json()] == ["a", "b2"]
+
+
+async def test_concurrent_list_and_download(client, make_user, auth_headers, storage_root):
+    """并发数超过同步连接池上限(5+10)时，请求不应相互阻塞或超时"""
+    user = make_user("bench_user")
+    headers = auth_headers("bench_user")
+    payload = os.path.join(storage_root, "payload.bin")
+    with open(payload, "wb") as f:
+        f.write(os.urandom(64 * 1024))
+    folder_id, file_id = _add_folder(user, 100, payload)
+
+    async def fetch(url: str):
+        r = await client.get(url, headers=headers)
+        assert r.status_code == 200, r.text
+        return r
+
+    pages = await asyncio.wait_for(asyncio.gather(*[
+        fetch(f"/files/list?parent_id={folder_id}&limit=20&cursor=") for _ in range(40)
+    ]), timeout=20)
+    assert all(len(page.json()) == 20 and page.headers["X-Next-Cursor"] for page in pages)
+
+    downloads = await asyncio.wait_for(asyncio.gather(*[
+        fetch(f"/files/download/{file_id}") for _ in range(40)
+    ]), timeout=20)
+    assert all(len(r.content) == 64 * 1024 for r in downloads)
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import update
+from app.database import SessionLocal
+from app.database.models import User
+
+pytestmark = pytest.mark.anyio
+
+
+def _set_role(user_id: int, role: str):
+    db = SessionLocal()
+    try:
+        db.execute(update(User).where(User.id == user_id).values(role=role))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def test_role_and_deactivation_invalidate_cached_user(client, make_user, auth_headers):
+    make_user("cache_admin", role="admin")
+    user = make_user("cache_member")
+    admin, headers = auth_headers("cache_admin"), auth_headers("cache_member")
+
+    assert (await client.get("/admin/chunk-gc", headers=headers)).status_code == 403
+
+    # 绕过管理接口直接改库：缓存中的快照仍然有效，说明请求确实走了缓存
+    _set_role(user.id, "admin")
+    assert (await client.get("/admin/chunk-gc", headers=headers)).status_code == 403
+
+    # 通过管理接口修改角色后立即生效
+    r = await client.post(f"/admin/update-user/{user.id}", headers=admin, json={"role": "admin"})
+    assert r.status_code == 200, r.text
+    assert (await client.get("/admin/chunk-gc", headers=headers)).status_code == 200
+
+    r = await client.post(f"/admin/update-user/{user.id}", headers=admin, json={"role": "member"})
+    assert (await client.get("/admin/chunk-gc", headers=headers)).status_code == 403
+
+    r = await client.post(f"/admin/update-user/{user.id}", headers=admin, json={"is_active": False})
+    assert r.status_code == 200
+    r = await client.get("/files/list", headers=headers)
+    assert r.status_code == 400 and r.json()["detail"] == "Inactive user"
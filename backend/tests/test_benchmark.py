@@ -0,0 +1,29 @@
+import pytest
+from tests.benchmarks.api_bench import Bench, SCENARIOS, compare, measure, parse_size
+
+pytestmark = pytest.mark.anyio
+
+
+def test_parse_size():
+    assert parse_size("4M") == 4 * 1024 ** 2
+    assert parse_size("512kb") == 512 * 1024
+    assert parse_size("1000") == 1000
+
+
+def test_compare_flags_regressions():
+    base = [{"scenario": "list", "concurrency": 10, "throughput": 100.0, "p95_ms": 10.0, "errors": 0}]
+    assert compare([{**base[0], "throughput": 90.0, "p95_ms": 11.0}], base, 0.15) == []
+    regressions = compare([{**base[0], "throughput": 80.0, "p95_ms": 12.0, "errors": 1}], base, 0.15)
+    assert len(regressions) == 3
+
+
+async def test_scenarios_run_without_errors(client):
+    # 每个场景只跑很少几次，保证基准脚本与接口保持同步
+    bench = Bench(client, file_size=64 * 1024, chunk_size=16 * 1024, list_size=20)
+    bench.setup_database()
+    await bench.login()
+    for name in SCENARIOS:
+        op = await bench.scenario(name, 4)
+        result = await measure(name, 2, 4, op)
+        assert result.errors == 0, name
+        assert result.throughput > 0
@@ -0,0 +1,35 @@
+import hashlib
+import os
+from app.database import SessionLocal
+from app.database.models import Blob
+from app.services.blob_store import get_blob_path, get_incoming_path, store_blob, sweep_unregistered
+
+
+def _staged(data: bytes) -> str:
+    path = get_incoming_path()
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_rolled_back_blob_is_swept():
+    kept, lost = os.urandom(100), os.urandom(200)
+    kept_sha, lost_sha = hashlib.sha256(kept).hexdigest(), hashlib.sha256(lost).hexdigest()
+    db = SessionLocal()
+    try:
+        store_blob(db, _staged(kept), kept_sha, hashlib.md5(kept).hexdigest(), len(kept))
+        db.commit()
+
+        # 登记事务回滚：文件已经重命名到正式路径，但没有记录
+        store_blob(db, _staged(lost), lost_sha, hashlib.md5(lost).hexdigest(), len(lost))
+        db.rollback()
+        assert db.get(Blob, lost_sha) is None
+        assert os.path.exists(get_blob_path(lost_sha))
+
+        # 宽限期内不回收，避免误删尚未提交的登记
+        assert sweep_unregistered(db, 3600) == (0, 0)
+        assert sweep_unregistered(db, -1) == (1, len(lost))
+        assert not os.path.exists(get_blob_path(lost_sha))
+        assert os.path.exists(get_blob_path(kept_sha))
+    finally:
+        db.close()
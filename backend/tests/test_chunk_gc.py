@@ -0,0 +1,112 @@
+import os
+import time
+import pytest
+from app.database import SessionLocal
+from app.database.models import User, UploadSession
+from app.schemas.file import UploadSessionCreate
+from app.services import upload_session
+from app.services import chunk_gc
+from app.services.chunk_gc import ChunkSweeper
+from app.services.merge_queue import merge_queue
+from app.services.chunk_store import get_chunk_dir
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _partial(root, name: str, size: int, age: float) -> str:
+    path = os.path.join(root, name)
+    os.makedirs(path)
+    chunk = os.path.join(path, "1")
+    with open(chunk, "wb") as f:
+        f.write(b"\0" * size)
+    stamp = time.time() - age
+    os.utime(chunk, (stamp, stamp))
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_sweeper_reclaims_expired_dirs(tmp_path):
+    root = str(tmp_path)
+    stale = _partial(root, "stale", 100, age=7200)
+    fresh = _partial(root, "fresh", 50, age=10)
+    sweeper = ChunkSweeper(root, interval=0, ttl=3600, min_free_bytes=0)
+
+    assert sweeper.run_once() == 1
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    assert sweeper.stats()["reclaimed_bytes"] == 100
+    assert sweeper.stats()["live_uploads"] == 1
+
+
+def test_disk_pressure_evicts_oldest_first(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    oldest = _partial(root, "a", 10, age=300)
+    middle = _partial(root, "b", 10, age=200)
+    newest = _partial(root, "c", 10, age=100)
+    sweeper = ChunkSweeper(root, interval=0, ttl=3600, min_free_bytes=1000)
+    # 每淘汰一个目录多出 600 字节空间
+    monkeypatch.setattr(sweeper, "_free_bytes", lambda: 600 * sweeper.reclaimed_uploads)
+
+    assert sweeper.run_once() == 2
+    assert not os.path.exists(oldest) and not os.path.exists(middle)
+    assert os.path.exists(newest)
+
+
+def test_disk_pressure_skips_merging_uploads(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    merging = _partial(root, "a", 10, age=300)
+    expired = _partial(root, "b", 10, age=7200)
+    idle = _partial(root, "c", 10, age=100)
+    sweeper = ChunkSweeper(root, interval=0, ttl=3600, min_free_bytes=1000)
+    monkeypatch.setattr(sweeper, "_free_bytes", lambda: 0)
+    active = set()
+    monkeypatch.setattr(merge_queue, "active_uploads", lambda: set(active))
+    # 扫描之后才入队的合并任务：删除前的复查必须能看到
+    real_scan = chunk_gc.scan
+
+    def scan_then_enqueue(*args):
+        partials = real_scan(*args)
+        active.update({"a", "b"})
+        return partials
+    monkeypatch.setattr(chunk_gc, "scan", scan_then_enqueue)
+
+    assert sweeper.run_once() == 1
+    assert os.path.exists(merging) and os.path.exists(expired)
+    assert not os.path.exists(idle)
+    stats = sweeper.stats()
+    assert stats["live_uploads"] == 2 and stats["live_bytes"] == 20
+    assert stats["skipped_active"] == 2
+
+
+def test_sweeper_releases_session_reservation(db, make_user, storage_root):
+    user = make_user("gc_user")
+    session = upload_session.create_session(db, user, UploadSessionCreate(
+        identifier="0" * 32, filename="a.bin", total_size=500,
+        chunk_size=1024, total_chunks=1, space_type="user"
+    ))
+    session_id = session.id
+    upload_session.prepare_files(session_id, session.total_chunks, session.total_size)
+    chunk_dir = get_chunk_dir(session_id)
+    stamp = time.time() - 7200
+    os.utime(os.path.join(chunk_dir, "bitmap"), (stamp, stamp))
+    os.utime(chunk_dir, (stamp, stamp))
+
+    staging_path = upload_session.get_staging_path(session_id)
+    os.utime(staging_path, (stamp, stamp))
+
+    sweeper = ChunkSweeper(
+        os.path.dirname(chunk_dir), interval=0, ttl=3600, min_free_bytes=0,
+        incoming_root=os.path.dirname(staging_path)
+    )
+    sweeper.run_once()
+
+    db.rollback()
+    assert db.get(UploadSession, session_id) is None
+    assert db.get(User, user.id).used_storage == 0
+    assert not os.path.exists(chunk_dir)
+    assert not os.path.exists(staging_path)
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import anyio
+import pytest
+from app.services.chunk_store import get_chunk_dir, list_chunks
+from app.services.merge_queue import merge_queue
+
+pytestmark = pytest.mark.anyio
+
+
+def _form(identifier: str, declared: int, parent_id: str) -> dict:
+    return {
+        "identifier": identifier, "chunkNumber": 1, "chunkSize": declared, "currentChunkSize": declared,
+        "totalSize": declared, "totalChunks": 1, "filename": "a.bin", "relativePath": "a.bin",
+        "space_type": "user", "parent_id": parent_id,
+    }
+
+
+async def test_chunk_size_mismatch_leaves_nothing(client, make_user, auth_headers):
+    make_user("chunk_size_user")
+    headers = auth_headers("chunk_size_user")
+    r = await client.post("/files/create-folder", headers=headers,
+                          json={"name": "uploads", "owner_type": "user", "is_folder": True})
+    parent_id = r.json()["id"]
+    data = os.urandom(1000)
+    identifier = hashlib.md5(data).hexdigest()
+
+    for declared in (999, 1001):
+        r = await client.post("/files/upload/chunk", headers=headers,
+                              files={"file": ("blob", data)}, data=_form(identifier, declared, parent_id))
+        assert r.status_code == 400
+        assert "Chunk size mismatch" in r.json()["detail"]
+    # 截断或超长的分片不会留下分片文件或临时文件
+    chunk_dir = get_chunk_dir(identifier)
+    assert list_chunks(chunk_dir) == []
+    assert os.listdir(chunk_dir) == []
+
+
+async def test_merge_status_is_private(client, make_user, auth_headers):
+    make_user("merge_owner")
+    make_user("merge_other")
+    owner, other = auth_headers("merge_owner"), auth_headers("merge_other")
+    r = await client.post("/files/upload/merge", headers=owner, data={
+        "identifier": "f" * 32, "filename": "a.bin", "space_type": "user", "parent_id": ""
+    })
+    assert r.status_code == 202
+    job_id = r.json()["job_id"]
+
+    assert (await client.get(f"/files/upload/merge/{job_id}", headers=owner)).status_code == 200
+    assert (await client.get(f"/files/upload/merge/{job_id}", headers=other)).status_code == 404
+    assert (await client.get("/files/upload/merge/missing", headers=owner)).status_code == 404
+
+
+async def test_follow_up_failure_keeps_merge_done(client, make_user, auth_headers, monkeypatch):
+    make_user("merge_follow_up")
+    headers = auth_headers("merge_follow_up")
+    r = await client.post("/files/create-folder", headers=headers,
+                          json={"name": "uploads", "owner_type": "user", "is_folder": True})
+    parent_id = r.json()["id"]
+    data = os.urandom(1000)
+    identifier = hashlib.md5(data).hexdigest()
+    r = await client.post("/files/upload/chunk", headers=headers,
+                          files={"file": ("blob", data)}, data=_form(identifier, len(data), parent_id))
+    assert r.status_code == 200
+
+    def shut_down(db_file):
+        raise RuntimeError("cannot schedule new futures after shutdown")
+    monkeypatch.setattr(merge_queue, "_after_merge", shut_down)
+
+    r = await client.post("/files/upload/merge", headers=headers, data={
+        "identifier": identifier, "filename": "a.bin", "space_type": "user", "parent_id": parent_id
+    })
+    job_id = r.json()["job_id"]
+    for _ in range(500):
+        job = (await client.get(f"/files/upload/merge/{job_id}", headers=headers)).json()
+        if job["status"] in ("done", "failed"):
+            break
+        await anyio.sleep(0.01)
+    # 文件已提交，后续处理失败不影响任务结果
+    assert job["status"] == "done", job
+    assert job["file"]["name"] == "a.bin"
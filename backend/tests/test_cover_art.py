@@ -0,0 +1,90 @@
+import hashlib
+import io
+import time
+import wave
+from uuid import uuid4
+import pytest
+from mutagen.id3 import APIC
+from mutagen.wave import WAVE
+from PIL import Image
+from app.database import SessionLocal
+from app.database.models import Blob, File
+from app.schemas.file import FileStatus
+from app.services import cover_art
+
+pytestmark = pytest.mark.anyio
+
+
+def _tagged_wav(path, cover: bytes | None):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(b"\0\0" * 800)
+    if cover:
+        audio = WAVE(str(path))
+        audio.add_tags()
+        audio.tags.add(APIC(encoding=3, mime="image/png", type=3, desc="cover", data=cover))
+        audio.save()
+
+
+def _png(size: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (size, size), (200, 30, 30)).save(out, "PNG")
+    return out.getvalue()
+
+
+def test_same_cover_is_stored_once(tmp_path):
+    cover = _png(1200)
+    refs = []
+    for name in ("a.wav", "b.wav"):
+        path = tmp_path / name
+        _tagged_wav(path, cover)
+        # 不同音频内容
+        path.write_bytes(path.read_bytes() + name.encode())
+        sha256 = uuid4().hex * 2
+        cover_art.generate_cover(sha256, str(path))
+        refs.append(cover_art.lookup(sha256))
+    assert refs[0] == refs[1] == hashlib.sha256(cover).hexdigest()
+    with Image.open(cover_art.get_cover_path(refs[0])) as thumb:
+        assert thumb.format == "JPEG"
+        assert max(thumb.size) <= 512
+
+    bare = tmp_path / "bare.wav"
+    _tagged_wav(bare, None)
+    sha256 = uuid4().hex * 2
+    cover_art.generate_cover(sha256, str(bare))
+    assert cover_art.lookup(sha256) == ""
+
+
+async def test_cover_endpoint_etag(client, make_user, auth_headers, tmp_path):
+    user = make_user("cover_user")
+    path = tmp_path / "track.wav"
+    _tagged_wav(path, _png(64))
+    sha256 = hashlib.sha256(path.read_bytes()).hexdigest()
+    file_id = str(uuid4())
+    db = SessionLocal()
+    try:
+        db.add(Blob(sha256=sha256, md5="0" * 32, size=path.stat().st_size, storage_path=str(path), ref_count=1))
+        db.add(File(
+            id=file_id, name="track.wav", is_folder=False, owner_type="user", owner_id=user.id,
+            storage_path=str(path), size=path.stat().st_size, mime_type="audio/x-wav",
+            status=FileStatus.approved, created_by=user.id, sha256=sha256
+        ))
+        db.commit()
+    finally:
+        db.close()
+    headers = auth_headers("cover_user")
+
+    # 首次请求排队提取
+    r = await client.get(f"/files/{file_id}/cover", headers=headers)
+    for _ in range(100):
+        if r.status_code == 200:
+            break
+        time.sleep(0.02)
+        r = await client.get(f"/files/{file_id}/cover", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/jpeg"
+
+    r = await client.get(f"/files/{file_id}/cover", headers={**headers, "If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
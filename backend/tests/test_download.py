@@ -0,0 +1,89 @@
+import hashlib
+import os
+from uuid import uuid4
+import pytest
+from app.database import SessionLocal
+from app.database.models import File
+from app.schemas.file import FileStatus
+
+pytestmark = pytest.mark.anyio
+
+DATA = os.urandom(1000)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+ETAG = f'"{SHA256}"'
+
+
+@pytest.fixture
+def download(make_user, auth_headers, tmp_path):
+    """返回 (下载地址, 请求头)"""
+    username = f"range_{uuid4().hex[:8]}"
+    user = make_user(username)
+    path = tmp_path / "track.flac"
+    path.write_bytes(DATA)
+    db = SessionLocal()
+    try:
+        node = File(
+            id=str(uuid4()), name="track.flac", is_folder=False, owner_type="user", owner_id=user.id,
+            storage_path=str(path), size=len(DATA), mime_type="audio/flac", sha256=SHA256,
+            status=FileStatus.approved, created_by=user.id
+        )
+        db.add(node)
+        db.commit()
+        return f"/files/download/{node.id}", auth_headers(username)
+    finally:
+        db.close()
+
+
+async def test_full_and_single_range(client, download):
+    url, headers = download
+    r = await client.get(url, headers=headers)
+    assert r.status_code == 200
+    assert r.content == DATA
+    assert r.headers["etag"] == ETAG
+    assert r.headers["accept-ranges"] == "bytes"
+
+    r = await client.get(url, headers={**headers, "Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == f"bytes 10-19/{len(DATA)}"
+    assert r.content == DATA[10:20]
+
+    r = await client.get(url, headers={**headers, "Range": "bytes=-10"})
+    assert r.status_code == 206 and r.content == DATA[-10:]
+
+    r = await client.get(url, headers={**headers, "Range": f"bytes={len(DATA)}-"})
+    assert r.status_code == 416
+
+    r = await client.head(url, headers=headers)
+    assert r.status_code == 200 and r.content == b""
+    assert r.headers["content-length"] == str(len(DATA))
+
+
+async def test_multiple_ranges_use_multipart_content_type(client, download):
+    # RangeFileResponse 覆盖了 Starlette 的私有方法，升级时由这里发现行为变化
+    url, headers = download
+    r = await client.get(url, headers={**headers, "Range": "bytes=0-4,100-104"})
+    assert r.status_code == 206
+    content_type = r.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    assert "content-range" not in r.headers
+    boundary = content_type.split("boundary=")[1]
+    parts = [part for part in r.content.split(f"--{boundary}".encode()) if b"Content-Range" in part]
+    assert len(parts) == 2
+    assert f"bytes 0-4/{len(DATA)}".encode() in parts[0] and parts[0].rstrip(b"\r\n").endswith(DATA[0:5])
+    assert f"bytes 100-104/{len(DATA)}".encode() in parts[1] and parts[1].rstrip(b"\r\n").endswith(DATA[100:105])
+
+
+async def test_conditional_requests(client, download):
+    url, headers = download
+    for value in (ETAG, f"W/{ETAG}", f'"other", {ETAG}', "*"):
+        r = await client.get(url, headers={**headers, "If-None-Match": value})
+        assert r.status_code == 304, value
+        assert r.headers["etag"] == ETAG and r.content == b""
+    r = await client.get(url, headers={**headers, "If-None-Match": '"other"'})
+    assert r.status_code == 200
+
+    # If-Range 匹配时返回区间，不匹配(内容已变)时返回完整内容
+    r = await client.get(url, headers={**headers, "Range": "bytes=0-9", "If-Range": ETAG})
+    assert r.status_code == 206 and r.content == DATA[:10]
+    r = await client.get(url, headers={**headers, "Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert r.status_code == 200 and r.content == DATA
@@ -0,0 +1,193 @@
+import hashlib
+import os
+from uuid import uuid4
+import pytest
+from app.database import SessionLocal
+from app.database.models import Blob, File, FileClosure, SearchDocument, User
+from app.schemas.file import FileStatus
+from app.services.hierarchy import add_node
+from app.services.search_index import index_file
+from app.services.storage import charge_storage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def tree(make_user, tmp_path):
+    """Library/{A/, B/, a.flac, b.flac}，a.flac 与 b.flac 内容相同"""
+    user = make_user(f"batch_{uuid4().hex[:8]}")
+    data = os.urandom(1000)
+    sha256 = hashlib.sha256(data).hexdigest()
+    blob_path = tmp_path / sha256
+    blob_path.write_bytes(data)
+
+    db = SessionLocal()
+    try:
+        db.add(Blob(sha256=sha256, md5=hashlib.md5(data).hexdigest(), size=len(data),
+                    storage_path=str(blob_path), ref_count=2))
+        ids = {}
+
+        def add(name, parent=None, folder=False):
+            node = File(
+                id=str(uuid4()), name=name, parent_id=ids.get(parent), is_folder=folder,
+                owner_type="user", owner_id=user.id,
+                storage_path="" if folder else str(blob_path), size=0 if folder else len(data),
+                sha256=None if folder else sha256, status=FileStatus.approved, created_by=user.id
+            )
+            db.add(node)
+            add_node(db, node.id, node.parent_id)
+            index_file(db, node)
+            if not folder:
+                charge_storage(db, user.id, len(data), "user")
+            ids[name] = node.id
+
+        add("Library", folder=True)
+        add("A", "Library", folder=True)
+        add("B", "Library", folder=True)
+        add("a.flac", "Library")
+        add("b.flac", "Library")
+        db.commit()
+    finally:
+        db.close()
+    return user, ids, blob_path
+
+
+async def test_batch_move_rename_delete(client, auth_headers, tree):
+    user, ids, blob_path = tree
+    r = await client.post("/files/batch", headers=auth_headers(user.username), json={"operations": [
+        {"op": "move", "file_id": ids["a.flac"], "target_parent_id": ids["A"]},
+        {"op": "rename", "file_id": ids["b.flac"], "new_name": "c.flac"},
+        {"op": "move", "file_id": ids["A"], "target_parent_id": ids["B"]},
+        {"op": "move", "file_id": ids["B"], "target_parent_id": ids["A"]},
+        {"op": "delete", "file_id": ids["B"]},
+        {"op": "delete", "file_id": ids["a.flac"]},
+        {"op": "rename", "file_id": "missing", "new_name": "x"},
+    ]})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["applied"] is True
+    assert [item["status_code"] for item in body["results"]] == [200, 200, 200, 400, 200, 404, 404]
+
+    db = SessionLocal()
+    try:
+        assert db.get(File, ids["b.flac"]).name == "c.flac"
+        for name in ("A", "B", "a.flac"):
+            assert db.get(File, ids[name]) is None
+            assert not db.query(FileClosure).filter(FileClosure.descendant_id == ids[name]).count()
+            assert db.get(SearchDocument, ids[name]) is None
+        assert db.get(User, user.id).used_storage == 1000
+        assert db.get(Blob, blob_path.name).ref_count == 1
+    finally:
+        db.close()
+    assert blob_path.exists()
+
+
+async def test_batch_atomic_rolls_back(client, auth_headers, make_user, tree):
+    user, ids, blob_path = tree
+    make_user("batch_other")
+    headers = auth_headers(user.username)
+
+    r = await client.post("/files/batch", headers=auth_headers("batch_other"), json={"operations": [
+        {"op": "delete", "file_id": ids["Library"]},
+    ]})
+    assert r.json()["results"][0]["status_code"] == 403
+
+    r = await client.post("/files/batch", headers=headers, json={"atomic": True, "operations": [
+        {"op": "delete", "file_id": ids["Library"]},
+        {"op": "rename", "file_id": "missing", "new_name": "x"},
+    ]})
+    assert r.json()["applied"] is False
+    db = SessionLocal()
+    try:
+        assert db.get(File, ids["Library"]) is not None
+    finally:
+        db.close()
+
+    r = await client.post("/files/batch", headers=headers, json={"operations": [
+        {"op": "delete", "file_id": ids["Library"]},
+    ]})
+    assert r.json()["succeeded"] == 1
+    db = SessionLocal()
+    try:
+        assert db.get(User, user.id).used_storage == 0
+        assert db.get(Blob, blob_path.name) is None
+    finally:
+        db.close()
+    assert not blob_path.exists()
+
+
+async def test_public_files_require_uploader_or_admin(client, auth_headers, make_user):
+    admin = make_user(f"batch_admin_{uuid4().hex[:8]}", role="admin")
+    uploader = make_user(f"batch_uploader_{uuid4().hex[:8]}", role="public")
+    make_user("batch_public")
+    db = SessionLocal()
+    try:
+        ids = {}
+        for name, parent, creator, folder in (
+            ("Public", None, admin, True),
+            ("Inbox", "Public", admin, True),
+            ("mine.flac", "Inbox", uploader, False),
+        ):
+            node = File(
+                id=str(uuid4()), name=name, parent_id=ids.get(parent), is_folder=folder,
+                owner_type="public", owner_id=creator.id, storage_path="", size=0,
+                status=FileStatus.approved, created_by=creator.id
+            )
+            db.add(node)
+            add_node(db, node.id, node.parent_id)
+            ids[name] = node.id
+        db.commit()
+    finally:
+        db.close()
+
+    # 公共文件所有人可读，但不能被其他普通用户删除、重命名或移动
+    r = await client.post("/files/batch", headers=auth_headers("batch_public"), json={"operations": [
+        {"op": "delete", "file_id": ids["Public"]},
+        {"op": "delete", "file_id": ids["mine.flac"]},
+        {"op": "rename", "file_id": ids["Inbox"], "new_name": "x"},
+        {"op": "move", "file_id": ids["mine.flac"], "target_parent_id": ids["Public"]},
+    ]})
+    assert [item["status_code"] for item in r.json()["results"]] == [403, 403, 403, 403]
+
+    # 上传者可以修改自己的公共文件，但不能删除公共空间的顶层文件夹
+    r = await client.post("/files/batch", headers=auth_headers(uploader.username), json={"operations": [
+        {"op": "rename", "file_id": ids["mine.flac"], "new_name": "renamed.flac"},
+        {"op": "delete", "file_id": ids["Public"]},
+    ]})
+    assert [item["status_code"] for item in r.json()["results"]] == [200, 403]
+
+    db = SessionLocal()
+    try:
+        assert db.get(File, ids["Public"]) is not None
+        assert db.get(File, ids["mine.flac"]).name == "renamed.flac"
+    finally:
+        db.close()
+
+    r = await client.post("/files/batch", headers=auth_headers(admin.username), json={"operations": [
+        {"op": "delete", "file_id": ids["Public"]},
+    ]})
+    assert r.json()["succeeded"] == 1
+
+
+async def test_delete_includes_nodes_moved_in_earlier(client, auth_headers, tree):
+    user, ids, blob_path = tree
+    r = await client.post("/files/batch", headers=auth_headers(user.username), json={"operations": [
+        {"op": "move", "file_id": ids["a.flac"], "target_parent_id": ids["A"]},
+        {"op": "move", "file_id": ids["b.flac"], "target_parent_id": ids["B"]},
+        {"op": "move", "file_id": ids["b.flac"], "target_parent_id": ids["Library"]},
+        {"op": "delete", "file_id": ids["A"]},
+        {"op": "delete", "file_id": ids["B"]},
+    ]})
+    assert r.status_code == 200, r.text
+    assert r.json()["succeeded"] == 5
+
+    db = SessionLocal()
+    try:
+        # 移入 A 的 a.flac 随 A 一起删除；移出 B 的 b.flac 保留
+        assert db.get(File, ids["a.flac"]) is None
+        assert not db.query(FileClosure).filter(FileClosure.descendant_id == ids["a.flac"]).count()
+        assert db.get(File, ids["b.flac"]).parent_id == ids["Library"]
+        assert db.get(User, user.id).used_storage == 1000
+        assert db.get(Blob, blob_path.name).ref_count == 1
+    finally:
+        db.close()
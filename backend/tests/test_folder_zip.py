@@ -0,0 +1,88 @@
+import io
+import os
+import zipfile
+from uuid import uuid4
+import pytest
+from app.database import SessionLocal
+from app.database.models import File
+from app.schemas.file import FileStatus
+from app.services.hierarchy import add_node
+
+pytestmark = pytest.mark.anyio
+
+
+def _add(db, user, name, parent_id=None, path="", data=None, mime_type=None, status=FileStatus.approved):
+    if data is not None:
+        with open(path, "wb") as f:
+            f.write(data)
+    node = File(
+        id=str(uuid4()), name=name, parent_id=parent_id, is_folder=data is None,
+        owner_type="user", owner_id=user.id, storage_path=path, size=len(data or b""),
+        mime_type=mime_type, status=status, created_by=user.id
+    )
+    db.add(node)
+    add_node(db, node.id, parent_id)
+    db.commit()
+    return node.id
+
+
+async def test_download_folder_streams_zip(client, make_user, auth_headers, tmp_path):
+    user = make_user("zip_user")
+    db = SessionLocal()
+    try:
+        album = _add(db, user, "Album")
+        disc = _add(db, user, "Disc 1", album)
+        _add(db, user, "Empty", album)
+        track = os.urandom(50_000)
+        _add(db, user, "01.flac", disc, str(tmp_path / "a"), track, "audio/flac")
+        _add(db, user, "notes.txt", album, str(tmp_path / "b"), b"liner notes " * 100, "text/plain")
+        _add(db, user, "notes.txt", album, str(tmp_path / "c"), b"second", "text/plain")
+        _add(db, user, "draft.txt", album, str(tmp_path / "d"), b"x", "text/plain", FileStatus.pending)
+    finally:
+        db.close()
+
+    r = await client.get(f"/files/download-folder/{album}", headers=auth_headers("zip_user"))
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+        assert zf.testzip() is None
+        names = set(zf.namelist())
+        assert names == {
+            "Album/", "Album/Disc 1/", "Album/Empty/", "Album/Disc 1/01.flac",
+            "Album/notes.txt", "Album/notes (1).txt"
+        }
+        assert zf.read("Album/Disc 1/01.flac") == track
+        assert zf.getinfo("Album/Disc 1/01.flac").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("Album/notes.txt").compress_type == zipfile.ZIP_DEFLATED
+
+
+async def test_download_folder_requires_permission(client, make_user, auth_headers):
+    owner = make_user("zip_owner")
+    make_user("zip_other")
+    db = SessionLocal()
+    try:
+        folder = _add(db, owner, "Private")
+    finally:
+        db.close()
+    r = await client.get(f"/files/download-folder/{folder}", headers=auth_headers("zip_other"))
+    assert r.status_code == 403
+
+
+async def test_download_folder_sanitizes_entry_names(client, make_user, auth_headers, tmp_path):
+    user = make_user("zip_traversal_user")
+    db = SessionLocal()
+    try:
+        root = _add(db, user, "../../etc")
+        sub = _add(db, user, "..", root)
+        _add(db, user, "a/b\\c.txt", sub, str(tmp_path / "a"), b"x", "text/plain")
+        _add(db, user, "/abs\x00.txt", root, str(tmp_path / "b"), b"y", "text/plain")
+    finally:
+        db.close()
+
+    r = await client.get(f"/files/download-folder/{root}", headers=auth_headers("zip_traversal_user"))
+    with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+        names = zf.namelist()
+    assert set(names) == {".._.._etc/", ".._.._etc/_/", ".._.._etc/_/a_b_c.txt", ".._.._etc/_abs.txt"}
+    for name in names:
+        assert not name.startswith("/") and ".." not in name.split("/")
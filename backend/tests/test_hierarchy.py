@@ -0,0 +1,83 @@
+from uuid import uuid4
+import pytest
+from app.database import SessionLocal
+from app.database.models import File, FileClosure
+from app.schemas.file import FileStatus
+from app.services.hierarchy import add_node, move_subtree, is_descendant
+
+pytestmark = pytest.mark.anyio
+
+
+def _closure(db, ids: dict) -> set[tuple[str, str, int]]:
+    names = {node_id: name for name, node_id in ids.items()}
+    rows = db.query(FileClosure).filter(FileClosure.descendant_id.in_(list(names))).all()
+    return {(names[row.ancestor_id], names[row.descendant_id], row.depth) for row in rows}
+
+
+def _tree(user) -> dict:
+    """r/{a/{b/{c}}, d/}"""
+    db = SessionLocal()
+    try:
+        ids = {}
+        for name, parent in (("r", None), ("a", "r"), ("b", "a"), ("c", "b"), ("d", "r")):
+            node = File(
+                id=str(uuid4()), name=name, parent_id=ids.get(parent), is_folder=True,
+                owner_type="user", owner_id=user.id, storage_path="", size=0,
+                status=FileStatus.approved, created_by=user.id
+            )
+            db.add(node)
+            add_node(db, node.id, node.parent_id)
+            ids[name] = node.id
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+def _self_rows(*names):
+    return {(name, name, 0) for name in names}
+
+
+def test_closure_after_create_and_move(make_user):
+    ids = _tree(make_user("closure_user"))
+    db = SessionLocal()
+    try:
+        assert _closure(db, ids) == _self_rows("r", "a", "b", "c", "d") | {
+            ("r", "a", 1), ("r", "b", 2), ("r", "c", 3), ("r", "d", 1),
+            ("a", "b", 1), ("a", "c", 2), ("b", "c", 1),
+        }
+
+        # b 连同子树挂到 d 下：与 a 的路径删除，经 d 的路径生成
+        move_subtree(db, ids["b"], ids["d"])
+        db.commit()
+        assert _closure(db, ids) == _self_rows("r", "a", "b", "c", "d") | {
+            ("r", "a", 1), ("r", "b", 2), ("r", "c", 3), ("r", "d", 1),
+            ("d", "b", 1), ("d", "c", 2), ("b", "c", 1),
+        }
+        assert is_descendant(db, ids["d"], ids["c"])
+        assert not is_descendant(db, ids["a"], ids["c"])
+    finally:
+        db.close()
+
+
+async def test_move_into_descendant_and_delete(client, make_user, auth_headers):
+    user = make_user("closure_move_user")
+    headers = auth_headers("closure_move_user")
+    ids = _tree(user)
+
+    r = await client.post(f"/files/move/{ids['a']}", headers=headers, json={"target_parent_id": ids["c"]})
+    assert r.status_code == 400
+    r = await client.post(f"/files/move/{ids['a']}", headers=headers, json={"target_parent_id": ids["a"]})
+    assert r.status_code == 400
+
+    r = await client.post("/files/batch", headers=headers, json={"operations": [
+        {"op": "delete", "file_id": ids["a"]},
+    ]})
+    assert r.json()["succeeded"] == 1
+    db = SessionLocal()
+    try:
+        # 删除后子树相关的路径全部移除，其余路径不变
+        assert _closure(db, ids) == _self_rows("r", "d") | {("r", "d", 1)}
+        assert not db.query(FileClosure).filter(FileClosure.ancestor_id.in_([ids["a"], ids["b"]])).count()
+    finally:
+        db.close()
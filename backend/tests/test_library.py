@@ -0,0 +1,74 @@
+from uuid import uuid4
+import pytest
+from sqlalchemy import select, text
+from app.database import SessionLocal, engine
+from app.database.models import File, TrackMetadata
+from app.routers.library import _after
+from app.schemas.file import FileStatus
+from app.utils.pagination import encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+
+def _add_tracks(user, tags: list[tuple]) -> None:
+    db = SessionLocal()
+    try:
+        for album, disc, track in tags:
+            node = File(
+                id=str(uuid4()), name=f"{album}-{disc}-{track}.flac", is_folder=False, owner_type="user",
+                owner_id=user.id, storage_path="", size=1, status=FileStatus.approved, created_by=user.id
+            )
+            db.add(node)
+            db.flush()
+            db.add(TrackMetadata(file_id=node.id, album=album, disc_number=disc, track_number=track,
+                                 artist=f"library-{user.id}"))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def test_tracks_paginate_with_nulls(client, make_user, auth_headers):
+    user = make_user("library_user")
+    headers = auth_headers("library_user")
+    tags = [("B", 1, 2), (None, None, None), ("A", None, 1), ("A", 1, None), ("B", 1, 1), ("A", 1, 1), (None, 1, 3)]
+    _add_tracks(user, tags)
+
+    seen, cursor = [], None
+    while True:
+        params = {"artist": f"library-{user.id}", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        r = await client.get("/library/tracks", headers=headers, params=params)
+        assert r.status_code == 200, r.text
+        body = r.json()
+        seen += [(item["album"], item["disc_number"], item["track_number"]) for item in body["items"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    # NULL 排在前面，每一行恰好出现一次
+    key = lambda tag: tuple((value is not None, value) for value in tag)
+    assert seen == sorted(tags, key=key)
+
+
+@pytest.mark.parametrize("path, values", [
+    ("/library/tracks", []),
+    ("/library/tracks", ["A", 1]),
+    ("/library/tracks", ["A", "x", 1, "id"]),
+    ("/library/tracks", [1, 1, 1, 1]),
+    ("/library/albums", []),
+    ("/library/albums", [1]),
+])
+async def test_invalid_cursor_is_rejected(client, make_user, auth_headers, path, values):
+    username = f"cursor_{uuid4().hex[:8]}"
+    make_user(username)
+    r = await client.get(path, headers=auth_headers(username), params={"cursor": encode_cursor(values)})
+    assert r.status_code == 400
+
+
+def test_keyset_query_uses_album_order_index():
+    columns = (TrackMetadata.album, TrackMetadata.disc_number, TrackMetadata.track_number, TrackMetadata.file_id)
+    stmt = select(TrackMetadata.file_id).where(_after(columns, ["A", None, 1, "x"])).order_by(*columns)
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "ix_track_album_order" in plan
+    assert "TEMP B-TREE" not in plan
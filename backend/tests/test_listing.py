@@ -0,0 +1,86 @@
+import json
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_listing_cache_invalidation(client, make_user, auth_headers):
+    make_user("listing_user")
+    headers = auth_headers("listing_user")
+
+    async def create(name, parent_id=None):
+        r = await client.post("/files/create-folder", headers=headers, json={
+            "name": name, "owner_type": "user", "is_folder": True, "parent_id": parent_id
+        })
+        assert r.status_code == 200, r.text
+        return r.json()["id"]
+
+    async def listing(parent_id=None, etag=None):
+        params = {"limit": 50, "cursor": ""} if parent_id else {}
+        if parent_id:
+            params["parent_id"] = parent_id
+        extra = {"If-None-Match": etag} if etag else {}
+        return await client.get("/files/list", headers={**headers, **extra}, params=params)
+
+    root_etag = (await listing()).headers["etag"]
+    folder = await create("cached")
+    # 新建顶层文件夹后根目录列表的版本号变化，旧 ETag 不再命中
+    r = await listing(etag=root_etag)
+    assert r.status_code == 200 and folder in {item["id"] for item in r.json()}
+
+    r = await listing(folder)
+    assert r.status_code == 200 and r.json() == []
+    etag = r.headers["etag"]
+    assert (await listing(folder, etag)).status_code == 304
+
+    child = await create("child", folder)
+    r = await listing(folder, etag)
+    assert r.status_code == 200
+    assert [item["name"] for item in r.json()] == ["child"]
+    etag = r.headers["etag"]
+
+    r = await client.patch(f"/files/{child}/rename", headers=headers, json={"newName": "renamed"})
+    assert r.status_code == 200
+    r = await listing(folder, etag)
+    assert r.status_code == 200
+    assert [item["name"] for item in r.json()] == ["renamed"]
+    etag = r.headers["etag"]
+
+    r = await client.post("/files/batch", headers=headers, json={"operations": [{"op": "delete", "file_id": child}]})
+    assert r.json()["succeeded"] == 1
+    r = await listing(folder, etag)
+    assert r.status_code == 200 and r.json() == []
+
+
+async def test_keyset_pages_match_streamed_listing(client, make_user, auth_headers):
+    make_user("paging_user")
+    headers = auth_headers("paging_user")
+    r = await client.post("/files/create-folder", headers=headers,
+                          json={"name": "paged", "owner_type": "user", "is_folder": True})
+    parent_id = r.json()["id"]
+    for name in ("e", "b", "d", "a", "c"):
+        r = await client.post("/files/create-folder", headers=headers, json={
+            "name": name, "owner_type": "user", "is_folder": True, "parent_id": parent_id
+        })
+        assert r.status_code == 200
+
+    r = await client.get("/files/list", headers=headers, params={"parent_id": parent_id})
+    streamed = [item["name"] for item in r.json()]
+    assert streamed == ["a", "b", "c", "d", "e"]
+
+    for order in ("asc", "desc"):
+        names, cursor = [], ""
+        while True:
+            r = await client.get("/files/list", headers=headers, params={
+                "parent_id": parent_id, "limit": 2, "cursor": cursor, "order": order, "format": "ndjson"
+            })
+            assert r.status_code == 200
+            names += [json.loads(line)["name"] for line in r.text.splitlines()]
+            cursor = r.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert names == (streamed if order == "asc" else streamed[::-1])
+
+    r = await client.get("/files/list", headers=headers,
+                         params={"parent_id": parent_id, "limit": 2, "cursor": "garbage"})
+    assert r.status_code == 400
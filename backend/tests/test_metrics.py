@@ -0,0 +1,50 @@
+import re
+import pytest
+from app.services.metrics import HttpMetrics
+
+pytestmark = pytest.mark.anyio
+
+
+def _sample(text: str, name: str, **labels) -> float | None:
+    for line in text.splitlines():
+        if not line.startswith(name + "{") and line.split(" ")[0] != name:
+            continue
+        found = dict(re.findall(r'(\w+)="([^"]*)"', line.split(" ")[0]))
+        if all(found.get(k) == v for k, v in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = HttpMetrics(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        metrics.started()
+        metrics.finished("GET", "/x", 200, seconds, 0, 10)
+    text = "\n".join(metrics.render())
+    assert _sample(text, "cms_http_request_duration_seconds_bucket", le="0.1") == 1
+    assert _sample(text, "cms_http_request_duration_seconds_bucket", le="1.0") == 2
+    assert _sample(text, "cms_http_request_duration_seconds_bucket", le="+Inf") == 3
+    assert _sample(text, "cms_http_request_duration_seconds_count") == 3
+    assert _sample(text, "cms_http_response_bytes_total", route="/x") == 30
+    assert _sample(text, "cms_http_requests_in_flight") == 0
+
+
+async def test_metrics_endpoint_reports_routes_and_gauges(client, make_user, auth_headers):
+    make_user("metrics_user")
+    headers = auth_headers("metrics_user")
+    await client.get("/files/list", headers=headers)
+    await client.get("/files/download/missing-id", headers=headers)
+    await client.get("/no/such/path")
+
+    r = await client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    text = r.text
+    assert _sample(text, "cms_http_requests_total", route="/files/list", status="200") >= 1
+    assert _sample(text, "cms_http_requests_total", route="/files/download/{file_id}", status="404") >= 1
+    assert _sample(text, "cms_http_requests_total", route="<unmatched>", status="404") >= 1
+    assert _sample(text, "cms_http_response_bytes_total", route="/files/list") > 0
+    assert _sample(text, "cms_merge_queue_pending") == 0
+    assert _sample(text, "cms_chunk_store_live_uploads") is not None
+    assert _sample(text, "cms_moderation_moves_pending") is not None
+    assert _sample(text, "cms_db_pool_checked_out", engine="sync") is not None
@@ -0,0 +1,72 @@
+import os
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+import pytest
+from app.database import SessionLocal
+from app.database.models import File
+from app.schemas.file import FileStatus
+
+pytestmark = pytest.mark.anyio
+
+
+def _pending(db, user, name, created_at, storage_path=""):
+    node = File(
+        id=str(uuid4()), name=name, is_folder=False, owner_type="public", owner_id=user.id,
+        storage_path=storage_path, size=1, status=FileStatus.pending, created_by=user.id,
+        created_at=created_at
+    )
+    db.add(node)
+    return node.id
+
+
+async def test_pending_queue_pages_and_batch_approve(client, make_user, auth_headers, tmp_path):
+    admin = make_user("mod_admin", role="admin")
+    headers = auth_headers("mod_admin")
+    legacy = tmp_path / "temp" / "song.wav"
+    legacy.parent.mkdir()
+    legacy.write_bytes(b"data")
+
+    start = datetime(2001, 1, 1)
+    db = SessionLocal()
+    try:
+        ids = [_pending(db, admin, f"f{i}", start + timedelta(seconds=i)) for i in range(5)]
+        ids.append(_pending(db, admin, "legacy", start + timedelta(seconds=10), str(legacy)))
+        db.commit()
+    finally:
+        db.close()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        r = await client.get("/moderation/pending-files", headers=headers, params=params)
+        assert r.status_code == 200, r.text
+        seen += [item["id"] for item in r.json()["items"]]
+        cursor = r.json()["next_cursor"]
+        if not cursor:
+            break
+    assert [file_id for file_id in seen if file_id in ids] == ids
+
+    r = await client.post("/moderation/batch", headers=headers, json={
+        "action": "approve", "file_ids": ids[3:] + ["missing"]
+    })
+    assert r.status_code == 200, r.text
+    assert sorted(r.json()["updated"]) == sorted(ids[3:])
+    assert r.json()["skipped"] == ["missing"]
+    assert r.json()["relocations"] == 1
+
+    r = await client.post("/moderation/batch", headers=headers, json={"action": "reject", "file_ids": ids[:3]})
+    assert len(r.json()["updated"]) == 3
+
+    moved = tmp_path / "approved" / "song.wav"
+    for _ in range(100):
+        if moved.exists() and not legacy.exists():
+            break
+        time.sleep(0.02)
+    db = SessionLocal()
+    try:
+        assert db.get(File, ids[-1]).storage_path == str(moved)
+        assert {db.get(File, i).status for i in ids[:3]} == {FileStatus.rejected}
+    finally:
+        db.close()
+    assert moved.read_bytes() == b"data"
@@ -0,0 +1,50 @@
+import logging
+import pytest
+from app.config import settings
+from app.database import SessionLocal
+from app.database.models import User
+from app.database.profiling import QueryStats, statement_shape
+
+pytestmark = pytest.mark.anyio
+
+
+def test_statement_shape_collapses_in_lists():
+    a = statement_shape("SELECT * FROM files\n WHERE id IN (?, ?, ?)")
+    b = statement_shape("SELECT * FROM files WHERE id IN (?)")
+    assert a == b == "SELECT * FROM files WHERE id IN (?)"
+
+
+def test_repeated_selects_are_flagged():
+    stats = QueryStats()
+    for _ in range(5):
+        stats.record("SELECT name FROM files WHERE id = ?", 0.001)
+        stats.record("UPDATE files SET size = ? WHERE id = ?", 0.001)
+    assert stats.repeated(5) == [("SELECT name FROM files WHERE id = ?", 5)]
+    assert stats.count == 10
+
+
+async def test_debug_header_reports_request_queries(client, make_user, auth_headers, monkeypatch):
+    make_user("profiling_user")
+    monkeypatch.setattr(settings, "QUERY_DEBUG_HEADER", True)
+    r = await client.get("/files/list", headers=auth_headers("profiling_user"))
+    assert r.status_code == 200
+    fields = dict(part.split("=") for part in r.headers["x-query-stats"].split("; "))
+    assert int(fields["count"]) > 0
+    assert float(fields["time_ms"]) >= 0
+
+    monkeypatch.setattr(settings, "QUERY_DEBUG_HEADER", False)
+    r = await client.get("/files/list", headers=auth_headers("profiling_user"))
+    assert "x-query-stats" not in r.headers
+
+
+def test_slow_query_log_redacts_parameters(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+    db = SessionLocal()
+    try:
+        with caplog.at_level(logging.WARNING, logger="app.database.profiling"):
+            db.query(User).filter(User.username == "secret-value").all()
+    finally:
+        db.close()
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("Slow query" in m and "redacted" in m for m in messages)
+    assert not any("secret-value" in m for m in messages)
@@ -0,0 +1,52 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def _login(client, username):
+    r = await client.post("/auth/login", data={"username": username, "password": "password123"})
+    assert r.status_code == 200, r.text
+    return r.json()["refresh_token"]
+
+
+async def _refresh(client, token):
+    return await client.post("/auth/refresh", json={"refresh_token": token})
+
+
+async def test_refresh_rotates_token(client, make_user):
+    make_user("rt_rotate")
+    first = await _login(client, "rt_rotate")
+
+    r = await _refresh(client, first)
+    assert r.status_code == 200, r.text
+    second = r.json()["refresh_token"]
+    assert second and second != first
+    assert r.json()["access_token"]
+
+    r = await _refresh(client, second)
+    assert r.status_code == 200
+    assert r.json()["refresh_token"] != second
+
+
+async def test_reuse_revokes_whole_family(client, make_user):
+    make_user("rt_reuse")
+    first = await _login(client, "rt_reuse")
+    other = await _login(client, "rt_reuse")
+    second = (await _refresh(client, first)).json()["refresh_token"]
+
+    # 旧令牌被重放：视为泄露，整条链作废
+    r = await _refresh(client, first)
+    assert r.status_code == 401
+    assert (await _refresh(client, second)).status_code == 401
+
+    # 另一次登录属于不同的令牌族，不受影响
+    assert (await _refresh(client, other)).status_code == 200
+
+
+async def test_logout_revokes_refresh_token(client, make_user):
+    make_user("rt_logout")
+    token = await _login(client, "rt_logout")
+    r = await client.post("/auth/logout", json={"refresh_token": token})
+    assert r.status_code == 200
+    assert (await _refresh(client, token)).status_code == 401
+    assert (await _refresh(client, "not-a-token")).status_code == 401
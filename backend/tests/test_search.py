@@ -0,0 +1,56 @@
+from uuid import uuid4
+import pytest
+from app.database import SessionLocal
+from app.database.models import File, TrackMetadata
+from app.schemas.file import FileStatus
+from app.services.search_index import index_file
+
+pytestmark = pytest.mark.anyio
+
+
+def _add(db, name, owner_type, owner, status=FileStatus.approved, track=None) -> str:
+    node = File(
+        id=str(uuid4()), name=name, is_folder=False, owner_type=owner_type,
+        owner_id=1 if owner_type == "group" else owner.id, storage_path="", size=1,
+        status=status, created_by=owner.id
+    )
+    db.add(node)
+    db.flush()
+    if track:
+        track = TrackMetadata(file_id=node.id, **track)
+        db.add(track)
+    index_file(db, node, track)
+    return node.id
+
+
+async def test_search_filters_by_permission(client, make_user, auth_headers):
+    token = uuid4().hex[:10]
+    alice = make_user(f"search_a_{token}")
+    bob = make_user(f"search_b_{token}")
+    viewer = make_user(f"search_p_{token}", role="public")
+    db = SessionLocal()
+    try:
+        ids = {
+            "alice": _add(db, f"{token} alice.flac", "user", alice),
+            "bob": _add(db, f"{token} bob.flac", "user", bob),
+            "group": _add(db, f"{token} group.flac", "group", alice),
+            "public": _add(db, "untitled.flac", "public", alice, track={"artist": f"Artist {token.upper()}"}),
+            "pending": _add(db, f"{token} pending.flac", "public", bob, status=FileStatus.pending),
+        }
+        db.commit()
+    finally:
+        db.close()
+
+    async def search(user, q=token):
+        r = await client.get("/files/search", headers=auth_headers(user.username), params={"q": q})
+        assert r.status_code == 200, r.text
+        return {item["id"] for item in r.json()}
+
+    # 标签也参与匹配(大小写不敏感)；他人的个人文件和未审核文件不可见
+    assert await search(bob) == {ids["bob"], ids["group"], ids["public"]}
+    assert await search(alice) == {ids["alice"], ids["group"], ids["public"]}
+    # public 角色看不到社团文件
+    assert await search(viewer) == {ids["public"]}
+    # 少于 3 个字符走三元组前缀扫描，同样经过权限过滤
+    short = await search(bob, token[:2])
+    assert ids["bob"] in short and ids["alice"] not in short and ids["pending"] not in short
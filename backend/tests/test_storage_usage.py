@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+from app.database import SessionLocal
+from app.database.models import StorageQuota, StorageUsage, User
+from app.services.storage import GROUP_OWNER_ID, charge_storage, release_storage, reconcile_usage
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.close()
+
+
+def _group_used(db) -> int:
+    db.expire_all()
+    return db.query(StorageUsage.used).filter(
+        StorageUsage.owner_type == 'group',
+        StorageUsage.owner_id == GROUP_OWNER_ID
+    ).scalar() or 0
+
+
+def test_charge_enforces_group_quota(db, make_user):
+    user = make_user("usage_user")
+    quota = StorageQuota(quota_type='group', quota_limit=_group_used(db) + 1000)
+    db.add(quota)
+    db.commit()
+    try:
+        start = _group_used(db)
+        charge_storage(db, user.id, 600, 'group')
+        db.commit()
+        with pytest.raises(HTTPException) as exc:
+            charge_storage(db, user.id, 600, 'group')
+        assert exc.value.status_code == 400
+        db.rollback()
+        assert _group_used(db) == start + 600
+        assert db.get(User, user.id).used_storage == 600
+
+        release_storage(db, user.id, 600, 'group', GROUP_OWNER_ID)
+        db.commit()
+        assert _group_used(db) == start
+    finally:
+        db.delete(quota)
+        db.commit()
+
+
+def test_reconcile_repairs_drift(db, make_user):
+    user = make_user("drift_user")
+    reconcile_usage(db)
+    db.execute(update(User).where(User.id == user.id).values(used_storage=12345))
+    db.commit()
+
+    drift = reconcile_usage(db)
+    assert ("uploader", user.id, 12345, 0) in drift
+    db.expire_all()
+    assert db.get(User, user.id).used_storage == 0
+    assert reconcile_usage(db) == []
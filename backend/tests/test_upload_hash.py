@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import os
+import pytest
+from app.database import SessionLocal
+from app.database.models import File
+from app.schemas.file import FileStatus
+from app.services.chunk_store import get_chunk_dir
+
+pytestmark = pytest.mark.anyio
+
+CHUNK = 64 * 1024
+
+
+async def _folder(client, headers) -> str:
+    r = await client.post("/files/create-folder", headers=headers,
+                          json={"name": "uploads", "owner_type": "user", "is_folder": True})
+    return r.json()["id"]
+
+
+def _chunk_form(identifier: str, n: int, part: bytes, total: int, parent_id: str) -> dict:
+    return {
+        "identifier": identifier, "chunkNumber": n, "chunkSize": CHUNK, "currentChunkSize": len(part),
+        "totalSize": total, "totalChunks": 2, "filename": "a.bin", "relativePath": "a.bin",
+        "space_type": "user", "parent_id": parent_id,
+    }
+
+
+async def _post_chunk(client, headers, identifier, n, part, total, parent_id):
+    return await client.post(
+        "/files/upload/chunk", headers=headers,
+        files={"file": ("blob", part)}, data=_chunk_form(identifier, n, part, total, parent_id)
+    )
+
+
+async def _merge(client, headers, identifier, parent_id) -> dict:
+    r = await client.post("/files/upload/merge", headers=headers, data={
+        "identifier": identifier, "filename": "a.bin", "space_type": "user", "parent_id": parent_id
+    })
+    assert r.status_code == 202, r.text
+    job_id = r.json()["job_id"]
+    for _ in range(500):
+        job = (await client.get(f"/files/upload/merge/{job_id}", headers=headers)).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("merge did not finish")
+
+
+async def test_rewritten_chunk_is_rejected(client, make_user, auth_headers):
+    make_user("hash_user")
+    headers = auth_headers("hash_user")
+    parent_id = await _folder(client, headers)
+    data = os.urandom(2 * CHUNK + 10)
+    identifier = hashlib.md5(data).hexdigest()
+    parts = (data[:CHUNK], data[CHUNK:])
+
+    for n, part in enumerate(parts, 1):
+        r = await _post_chunk(client, headers, identifier, n, part, len(data), parent_id)
+        assert r.status_code == 200, r.text
+
+    # 分片 1 已计入增量哈希，替换内容必须被拒绝；相同内容的重传仍然成功
+    forged = os.urandom(CHUNK)
+    r = await _post_chunk(client, headers, identifier, 1, forged, len(data), parent_id)
+    assert r.status_code == 409
+    r = await _post_chunk(client, headers, identifier, 1, parts[0], len(data), parent_id)
+    assert r.status_code == 200
+
+    job = await _merge(client, headers, identifier, parent_id)
+    assert job["status"] == "done", job
+    db = SessionLocal()
+    try:
+        db_file = db.get(File, job["file"]["id"])
+        with open(db_file.storage_path, "rb") as f:
+            stored = f.read()
+        # Blob 以内容的 sha256 为键，与实际存储的字节一致
+        assert stored == data
+        assert db_file.sha256 == hashlib.sha256(stored).hexdigest()
+        assert os.path.basename(db_file.storage_path) == db_file.sha256
+    finally:
+        db.close()
+
+
+async def test_checksum_mismatch_fails_merge(client, make_user, auth_headers):
+    make_user("mismatch_user")
+    headers = auth_headers("mismatch_user")
+    parent_id = await _folder(client, headers)
+    data = os.urandom(2 * CHUNK)
+    identifier = hashlib.md5(os.urandom(16)).hexdigest()  # 声明的 MD5 与内容不符
+
+    for n, part in enumerate((data[:CHUNK], data[CHUNK:]), 1):
+        await _post_chunk(client, headers, identifier, n, part, len(data), parent_id)
+    job = await _merge(client, headers, identifier, parent_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Checksum mismatch"
+    assert not os.path.exists(get_chunk_dir(identifier))
+
+
+async def _start_session(client, headers, identifier, size, parent_id) -> dict:
+    r = await client.post("/files/upload/session", headers=headers, json={
+        "identifier": identifier, "filename": "copy.bin", "total_size": size,
+        "chunk_size": CHUNK, "total_chunks": -(-size // CHUNK), "space_type": "user", "parent_id": parent_id
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _copies(sha256: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(File).filter(File.sha256 == sha256).count()
+    finally:
+        db.close()
+
+
+async def test_instant_upload_hit_and_miss(client, make_user, auth_headers):
+    make_user("dedup_owner")
+    make_user("dedup_user")
+    owner, other = auth_headers("dedup_owner"), auth_headers("dedup_user")
+    data = os.urandom(2 * CHUNK)
+    identifier = hashlib.md5(data).hexdigest()
+    sha256 = hashlib.sha256(data).hexdigest()
+    parent_id = await _folder(client, owner)
+    for n, part in enumerate((data[:CHUNK], data[CHUNK:]), 1):
+        await _post_chunk(client, owner, identifier, n, part, len(data), parent_id)
+    job = await _merge(client, owner, identifier, parent_id)
+    assert job["status"] == "done"
+
+    # GET 检查只读：可以秒传也不会创建文件记录
+    query = _chunk_form(identifier, 1, data[:CHUNK], len(data), parent_id)
+    r = await client.get("/files/upload/chunk", headers=owner, params=query)
+    assert r.json()["skipUpload"] is True and "file_id" not in r.json()
+    assert _copies(sha256) == 1
+
+    # 只凭 MD5 不能复制其他用户的私有文件
+    other_parent = await _folder(client, other)
+    r = await client.get("/files/upload/chunk", headers=other, params=query)
+    assert r.json()["skipUpload"] is False
+    assert (await _start_session(client, other, identifier, len(data), other_parent))["skip_upload"] is False
+    assert _copies(sha256) == 1
+
+    # 大小不同即视为不同内容
+    r = await client.get("/files/upload/chunk", headers=owner, params={**query, "totalSize": len(data) + 1})
+    assert r.json()["skipUpload"] is False
+
+    out = await _start_session(client, owner, identifier, len(data), parent_id)
+    assert out["skip_upload"] is True and out["file"]["id"] != job["file"]["id"]
+    assert _copies(sha256) == 2
+
+    # 未通过审核的内容不能秒传
+    db = SessionLocal()
+    try:
+        db.query(File).filter(File.sha256 == sha256).update({File.status: FileStatus.pending})
+        db.commit()
+    finally:
+        db.close()
+    r = await client.get("/files/upload/chunk", headers=owner, params=query)
+    assert r.json()["skipUpload"] is False
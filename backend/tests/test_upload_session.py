@@ -0,0 +1,170 @@
+import errno
+import hashlib
+import os
+import pytest
+from fastapi import HTTPException
+from app.database import SessionLocal
+from app.database.models import User
+from app.services import chunk_bitmap, upload_session
+from app.services.file_service import complete_upload_session
+
+pytestmark = pytest.mark.anyio
+
+CHUNK = 64 * 1024
+
+
+def _used(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.get(User, user_id).used_storage
+    finally:
+        db.close()
+
+
+def test_bitmap_ranges(tmp_path):
+    path = str(tmp_path / "bitmap")
+    chunk_bitmap.create(path, 10)
+    for n in (1, 2, 3, 5, 10):
+        chunk_bitmap.mark(path, n)
+    bitmap = chunk_bitmap.load(path)
+    assert chunk_bitmap.to_ranges(bitmap, 10) == [[1, 3], [5, 5], [10, 10]]
+    assert not chunk_bitmap.is_complete(bitmap, 10)
+    for n in (4, 6, 7, 8, 9):
+        chunk_bitmap.mark(path, n)
+    assert chunk_bitmap.is_complete(chunk_bitmap.load(path), 10)
+
+
+async def test_session_reserves_and_releases_quota(client, make_user, auth_headers, storage_root):
+    user = make_user("session_user")
+    headers = auth_headers("session_user")
+    data = os.urandom(2 * CHUNK + 100)
+    body = {
+        "identifier": hashlib.md5(data).hexdigest(),
+        "filename": "a.bin",
+        "total_size": len(data),
+        "chunk_size": CHUNK,
+        "total_chunks": 2,
+        "space_type": "user",
+    }
+    r = await client.post("/files/upload/session", headers=headers, json=body)
+    assert r.status_code == 200, r.text
+    session_id = r.json()["session_id"]
+    token = {"X-Upload-Token": r.json()["upload_token"]}
+    assert _used(user.id) == len(data)
+
+    r = await client.post(
+        f"/files/upload/session/{session_id}/chunk", headers=token,
+        files={"file": ("blob", data[CHUNK:])}, data={"chunkNumber": 2}
+    )
+    assert r.status_code == 200, r.text
+    r = await client.get(f"/files/upload/session/{session_id}", headers=token)
+    assert r.json()["uploaded"] == [[2, 2]]
+
+    r = await client.get(f"/files/upload/session/{session_id}", headers={"X-Upload-Token": "invalid"})
+    assert r.status_code == 401
+
+    r = await client.delete(f"/files/upload/session/{session_id}", headers=headers)
+    assert r.status_code == 204
+    assert _used(user.id) == 0
+    assert not os.path.exists(os.path.join(storage_root, "chunktemp", session_id))
+
+
+async def test_chunks_written_in_place(client, make_user, auth_headers, storage_root):
+    make_user("inplace_user")
+    headers = auth_headers("inplace_user")
+    data = os.urandom(3 * CHUNK + 7)
+    r = await client.post("/files/upload/session", headers=headers, json={
+        "identifier": hashlib.md5(data).hexdigest(),
+        "filename": "b.bin",
+        "total_size": len(data),
+        "chunk_size": CHUNK,
+        "total_chunks": 3,
+        "space_type": "user",
+    })
+    session_id = r.json()["session_id"]
+    token = {"X-Upload-Token": r.json()["upload_token"]}
+    staging_path = upload_session.get_staging_path(session_id)
+    assert os.path.getsize(staging_path) == len(data)
+
+    # 乱序上传，最后一个分片包含余数
+    for n, part in ((3, data[2 * CHUNK:]), (1, data[:CHUNK]), (2, data[CHUNK:2 * CHUNK])):
+        r = await client.post(
+            f"/files/upload/session/{session_id}/chunk", headers=token,
+            files={"file": ("blob", part)}, data={"chunkNumber": n}
+        )
+        assert r.status_code == 200, r.text
+    assert os.listdir(os.path.join(storage_root, "chunktemp", session_id)) == ["bitmap"]
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == "inplace_user").first()
+        db_file = complete_upload_session(db, session_id, user)
+        assert db_file.sha256 == hashlib.sha256(data).hexdigest()
+        with open(db_file.storage_path, "rb") as f:
+            assert f.read() == data
+    finally:
+        db.close()
+    assert not os.path.exists(staging_path)
+
+
+async def test_received_chunk_cannot_be_rewritten(client, make_user, auth_headers):
+    make_user("rewrite_user")
+    headers = auth_headers("rewrite_user")
+    data = os.urandom(2 * CHUNK)
+    r = await client.post("/files/upload/session", headers=headers, json={
+        "identifier": hashlib.md5(data).hexdigest(),
+        "filename": "c.bin",
+        "total_size": len(data),
+        "chunk_size": CHUNK,
+        "total_chunks": 2,
+        "space_type": "user",
+    })
+    session_id = r.json()["session_id"]
+    token = {"X-Upload-Token": r.json()["upload_token"]}
+    url = f"/files/upload/session/{session_id}/chunk"
+
+    for n, part in ((1, data[:CHUNK]), (2, data[CHUNK:])):
+        r = await client.post(url, headers=token, files={"file": ("blob", part)}, data={"chunkNumber": n})
+        assert r.status_code == 200, r.text
+    # 分片 1 已计入哈希，覆盖会让 Blob 内容与 sha256 不符
+    r = await client.post(url, headers=token, files={"file": ("blob", os.urandom(CHUNK))}, data={"chunkNumber": 1})
+    assert r.status_code == 409
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == "rewrite_user").first()
+        # 仍有分片在写入时不能完成
+        with upload_session.chunk_write(session_id, 2):
+            with pytest.raises(HTTPException) as exc:
+                complete_upload_session(db, session_id, user)
+            assert exc.value.status_code == 409
+
+        # 完成期间的分片写入被拒绝
+        with upload_session.completing(session_id):
+            r = await client.post(url, headers=token, files={"file": ("blob", data[:CHUNK])}, data={"chunkNumber": 1})
+            assert r.status_code == 409
+
+        db_file = complete_upload_session(db, session_id, user)
+        with open(db_file.storage_path, "rb") as f:
+            assert hashlib.sha256(f.read()).hexdigest() == db_file.sha256 == hashlib.sha256(data).hexdigest()
+    finally:
+        db.close()
+
+
+async def test_preallocation_failure_releases_reservation(client, make_user, auth_headers, monkeypatch):
+    user = make_user("enospc_user")
+
+    def full_disk(path, size):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(upload_session, "preallocate", full_disk)
+    r = await client.post("/files/upload/session", headers=auth_headers("enospc_user"), json={
+        "identifier": "0" * 32,
+        "filename": "d.bin",
+        "total_size": CHUNK,
+        "chunk_size": CHUNK,
+        "total_chunks": 1,
+        "space_type": "user",
+    })
+    assert r.status_code == 507
+    assert _used(user.id) == 0
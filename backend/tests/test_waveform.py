@@ -0,0 +1,83 @@
+import hashlib
+import math
+import os
+import wave
+from uuid import uuid4
+import anyio
+import numpy as np
+import pytest
+from app.database import SessionLocal
+from app.database.models import File
+from app.schemas.file import FileStatus
+from app.services import waveform
+
+
+def _write_wav(path, samples: np.ndarray, sample_rate: int = 8000):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(samples.astype("<i2").tobytes())
+
+
+def test_peaks_levels_match_audio(tmp_path):
+    frames = 10000
+    # 半幅正弦，RMS 约为 -9 dBFS
+    samples = np.round(16383 * np.sin(np.arange(frames) * 2 * math.pi / 100))
+    wav = tmp_path / "tone.wav"
+    _write_wav(wav, samples)
+    peaks = tmp_path / "tone.peaks"
+    peaks.write_bytes(waveform.compute_peaks(str(wav)))
+
+    for resolution in waveform.RESOLUTIONS:
+        sample_rate, total, rms_dbfs, body = waveform.read_peaks(str(peaks), resolution)
+        assert (sample_rate, total) == (8000, frames)
+        assert abs(rms_dbfs - 20 * math.log10(0.5 / math.sqrt(2))) < 0.1
+        triples = np.frombuffer(body, dtype="<i2").reshape(-1, 3)
+        assert len(triples) == math.ceil(frames / resolution)
+        assert triples[:, 0].min() <= -16380 and triples[:, 1].max() >= 16380
+
+    assert waveform.read_peaks(str(peaks), 123) is None
+
+
+def test_non_wav_is_rejected(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"ID3" + b"\0" * 64)
+    with pytest.raises(waveform.UnsupportedAudio):
+        waveform.compute_peaks(str(path))
+
+
+@pytest.mark.anyio
+async def test_unsupported_wav_is_marked_unavailable(client, make_user, auth_headers, tmp_path):
+    username = f"peaks_{uuid4().hex[:8]}"
+    user = make_user(username)
+    data = b"ID3" + os.urandom(1000)
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = tmp_path / "fake.wav"
+    path.write_bytes(data)
+    db = SessionLocal()
+    try:
+        node = File(
+            id=str(uuid4()), name="fake.wav", is_folder=False, owner_type="user", owner_id=user.id,
+            storage_path=str(path), size=len(data), mime_type="audio/wav", sha256=sha256,
+            status=FileStatus.approved, created_by=user.id
+        )
+        db.add(node)
+        db.commit()
+        url = f"/files/{node.id}/peaks"
+    finally:
+        db.close()
+    headers = auth_headers(username)
+
+    r = await client.get(url, headers=headers)
+    assert r.status_code == 404 and r.json()["detail"] == "Waveform is being generated"
+    peaks_path = waveform.get_peaks_path(sha256)
+    for _ in range(500):
+        if os.path.exists(peaks_path):
+            break
+        await anyio.sleep(0.01)
+
+    # 生成一次后留下标记，不再重新排队
+    r = await client.get(url, headers=headers)
+    assert r.status_code == 404 and r.json()["detail"] == "Waveform not available for this file"
+    assert os.path.getsize(peaks_path) == 0
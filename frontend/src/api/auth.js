@@ -28,7 +28,13 @@ export default {
         })
         return response.data
     },
-    logout: () => {
-        return axios.post(`${API_URL}/auth/logout`)
+    refresh: async (refreshToken) => {
+        const response = await axios.post(`${API_URL}/auth/refresh`, {
+            refresh_token: refreshToken
+        })
+        return response.data
+    },
+    logout: (refreshToken) => {
+        return axios.post(`${API_URL}/auth/logout`, refreshToken ? { refresh_token: refreshToken } : undefined)
     }
 }
\ No newline at end of file
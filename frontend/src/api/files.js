@@ -31,6 +31,14 @@ export default {
         })
     },
 
+    // 下载整个文件夹(ZIP)
+    downloadFolder: (folderId) => {
+        return axios.get(`${API_URL}/files/download-folder/${folderId}`, {
+            headers: createHeaders(),
+            responseType: 'blob'
+        })
+    },
+
     // 重命名文件
     renameFile: (fileId, newName) => {
         return axios.patch(`${API_URL}/files/${fileId}/rename`,
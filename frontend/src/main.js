@@ -1,15 +1,33 @@
 import { createApp } from 'vue'
 import { createPinia } from 'pinia'
+import axios from 'axios'
 
 import 'vue-simple-uploader/dist/style.css'
 
 import App from './App.vue'
 import router from './router'
 import uploader from 'vue-simple-uploader'
+import { useAuthStore } from './stores/auth'
 
 const app = createApp(App)
 
 app.use(createPinia())
 app.use(router)
 app.use(uploader)
+
+// 访问令牌过期时用刷新令牌换新，并重试原请求一次
+axios.interceptors.response.use(undefined, async (error) => {
+    const config = error.config
+    const authStore = useAuthStore()
+    if (error.response?.status !== 401 || !config || config._retried
+        || config.url.endsWith('/login') || config.url.endsWith('/auth/refresh')
+        || !authStore.refreshToken) {
+        throw error
+    }
+    config._retried = true
+    const token = await authStore.refresh()
+    config.headers.Authorization = `Bearer ${token}`
+    return axios(config)
+})
+
 app.mount('#app')
@@ -1,22 +1,57 @@
 import { defineStore } from 'pinia'
 import authApi from '../api/auth'
 
+// 并发请求同时遇到 401 时只刷新一次
+let refreshing = null
+
 export const useAuthStore = defineStore('auth', {
     state: () => ({
         user: null,
-        token: localStorage.getItem('token') || null
+        token: localStorage.getItem('token') || null,
+        refreshToken: localStorage.getItem('refreshToken') || null
     }),
     actions: {
-        async login(credentials) {
-            const { access_token } = await authApi.login(credentials)
+        setTokens({ access_token, refresh_token }) {
             this.token = access_token
             localStorage.setItem('token', access_token)
+            if (refresh_token) {
+                this.refreshToken = refresh_token
+                localStorage.setItem('refreshToken', refresh_token)
+            }
         },
-        logout() {
+        async login(credentials) {
+            this.setTokens(await authApi.login(credentials))
+        },
+        async refresh() {
+            if (!this.refreshToken) {
+                throw new Error('No refresh token')
+            }
+            if (!refreshing) {
+                // 刷新令牌只能使用一次，服务端返回新的令牌
+                refreshing = authApi.refresh(this.refreshToken)
+                    .then((tokens) => this.setTokens(tokens))
+                    .catch((error) => {
+                        this.clear()
+                        throw error
+                    })
+                    .finally(() => {
+                        refreshing = null
+                    })
+            }
+            await refreshing
+            return this.token
+        },
+        clear() {
             this.user = null
             this.token = null
+            this.refreshToken = null
             localStorage.removeItem('token')
-            authApi.logout()
+            localStorage.removeItem('refreshToken')
+        },
+        logout() {
+            const refreshToken = this.refreshToken
+            this.clear()
+            authApi.logout(refreshToken)
         }
     }
-})
\ No newline at end of file
+})
@@ -45,13 +45,16 @@ export const useFilesStore = defineStore('files', {
     async downloadFile(file) {
       this.currentOperation = 'downloading'
       try {
-        const response = await filesApi.downloadFile(file.id)
+        // 文件夹由服务端打包为 ZIP
+        const response = file.is_folder
+          ? await filesApi.downloadFolder(file.id)
+          : await filesApi.downloadFile(file.id)
 
         // 创建下载链接
         const url = window.URL.createObjectURL(new Blob([response.data]))
         const link = document.createElement('a')
         link.href = url
-        link.setAttribute('download', file.name)
+        link.setAttribute('download', file.is_folder ? `${file.name}.zip` : file.name)
         document.body.appendChild(link)
         link.click()
 